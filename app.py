@@ -1,13 +1,18 @@
 import streamlit as st
-from backend.azure_client import chat_with_azure, RATE_LIMIT_MESSAGE  # Assuming this is correctly implemented
+from backend.azure_client import chat_with_azure, chat_with_azure_stream, RATE_LIMIT_MESSAGE  # Assuming this is correctly implemented
 from backend.visualizer import generate_visualization
 import matplotlib.pyplot as plt
-from backend.rag import rag_context
+from backend.rag import rag_retrieve, MERGE_GLOBAL, MERGE_PER_DB
+from backend.answer_cache import answer_cache, make_scope_key
+from backend.history import history_manager
+from backend import settings
 from backend.path_resolver import resource_path
-from backend.ocr import run_rag_pipeline
+from backend.ocr import STAGES, STAGE_EXTRACT, STAGE_OCR, STAGE_CHUNK, STAGE_EMBED, STAGE_PERSIST
+from backend.ingest_jobs import ingest_jobs, ACTIVE_STATUSES, JOB_RUNNING, JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED
+from backend.ingest_cache import read_manifest, MANIFEST_NAME
 import altair as alt
-import tempfile
 import os
+import re
 from backend.logger import logger
 from backend.get_ip import get_client_ip
 import datetime
@@ -22,6 +27,97 @@ if "max_tokens" not in st.session_state:
     st.session_state.max_tokens = 400
 if "k" not in st.session_state:
     st.session_state.k = 2
+if "global_merge" not in st.session_state:
+    st.session_state.global_merge = settings.RAG_MERGE_MODE == MERGE_GLOBAL
+if "top_k" not in st.session_state:
+    st.session_state.top_k = settings.RAG_GLOBAL_TOP_K
+if "per_db_cap" not in st.session_state:
+    st.session_state.per_db_cap = settings.RAG_PER_DB_CAP or 0
+if "min_score" not in st.session_state:
+    st.session_state.min_score = settings.RAG_MIN_SCORE
+if "watched_ingest_jobs" not in st.session_state:
+    st.session_state.watched_ingest_jobs = set()
+
+STAGE_LABELS = {
+    STAGE_EXTRACT: "Reading pages",
+    STAGE_OCR: "Rasterizing + OCR",
+    STAGE_CHUNK: "Chunking",
+    STAGE_EMBED: "Embedding",
+    STAGE_PERSIST: "Saving",
+}
+
+def _polling_needed(jobs) -> bool:
+    """Jobs still queued/running, or watched by this session and not yet reported as finished."""
+    watched = st.session_state.watched_ingest_jobs & {job["id"] for job in jobs}
+    return bool(watched) or any(job["status"] in ACTIVE_STATUSES for job in jobs)
+
+
+def _render_ingestion_jobs(jobs) -> bool:
+    """Draws the jobs panel; True once a job watched by this session has finished."""
+    if not jobs:
+        return False
+    st.caption("Ingestion jobs")
+    finished_watched = False
+    for job in jobs:
+        files = ", ".join(job["files"])
+        if job["status"] in ACTIVE_STATUSES:
+            stage = job["stage"] or STAGE_EXTRACT
+            fraction = job["stage_done"] / job["stage_total"] if job["stage_total"] else 0.0
+            if job["status"] == JOB_RUNNING and stage in STAGES:
+                label = f"{files}: {STAGE_LABELS[stage]} ({STAGES.index(stage) + 1}/{len(STAGES)})"
+            else:
+                label = f"{files}: waiting"
+            st.progress(min(fraction, 1.0), text=label)
+            if job["cancel_requested"]:
+                st.caption("Cancelling...")
+            elif st.button("Cancel", key=f"cancel_{job['id']}", use_container_width=True):
+                ingest_jobs.cancel(job["id"])
+        else:
+            if job["status"] == JOB_COMPLETED:
+                st.success(f"{files}: embeddings loaded")
+            elif job["status"] == JOB_CANCELLED:
+                st.info(f"{files}: cancelled")
+            elif job["status"] == JOB_FAILED:
+                st.error(f"{files}: failed ({job['error']})")
+            if job["id"] in st.session_state.watched_ingest_jobs:
+                st.session_state.watched_ingest_jobs.discard(job["id"])
+                finished_watched = True
+    return finished_watched
+
+
+@st.fragment(run_every=settings.INGEST_POLL_SEC)
+def _live_ingestion_status():
+    """Reruns on its own while the rest of the page stays idle, until no job needs watching."""
+    jobs = ingest_jobs.list_jobs(limit=5)
+    finished_watched = _render_ingestion_jobs(jobs)
+    if finished_watched or not _polling_needed(jobs):
+        # Refresh the whole page: new vector DBs show up in the selection and the panel stops polling
+        st.rerun()
+
+
+def ingestion_status():
+    """Sidebar panel with the latest ingestion jobs; polls only while a job is active or watched."""
+    jobs = ingest_jobs.list_jobs(limit=5)
+    if _polling_needed(jobs):
+        _live_ingestion_status()
+    else:
+        _render_ingestion_jobs(jobs)
+def same_file_stores(root, names):
+    """
+    Groups of vector DBs built from files with the same name (a re-exported document
+    that shares no page with the stored one gets a DB of its own), newest first.
+    """
+    groups = {}
+    for name in names:
+        manifest = read_manifest(os.path.join(root, name)) or {}
+        source = os.path.splitext(manifest.get("source") or name)[0]
+        groups.setdefault(re.sub(r'[^\w\-]', '_', source), []).append(name)
+
+    def modified(name):
+        path = os.path.join(root, name, MANIFEST_NAME)
+        return os.path.getmtime(path) if os.path.isfile(path) else 0.0
+
+    return [sorted(group, key=modified, reverse=True) for group in groups.values() if len(group) > 1]
 def main():
     st.set_page_config(
     page_title="HR Navigator",
@@ -43,6 +139,17 @@ def main():
         "Max Tokens", 10, 1000, st.session_state.max_tokens, key="max_tokens_slider"
         )
         st.session_state.k = st.slider("Number of matches per document", 1, 10, st.session_state.k,key="k_slider")
+        st.session_state.global_merge = st.toggle(
+        "Rank matches across all documents (global top-k)", st.session_state.global_merge, key="global_merge_toggle"
+        )
+        if st.session_state.global_merge:
+            st.session_state.top_k = st.slider("Total number of matches", 1, 30, st.session_state.top_k, key="top_k_slider")
+            st.session_state.per_db_cap = st.slider(
+            "Max matches per document (0 = no cap)", 0, 10, st.session_state.per_db_cap, key="per_db_cap_slider"
+            )
+            st.session_state.min_score = st.slider(
+            "Minimum relevance score", 0.0, 1.0, st.session_state.min_score, key="min_score_slider"
+            )
         st.subheader("**1. Upload Files**")
         uploaded_files = st.file_uploader(
             "Choose documents (PDF) to process:", 
@@ -55,28 +162,21 @@ def main():
         st.subheader("**2. Load Files**")
         if st.button("Load", key="generate", use_container_width=True):
             if uploaded_files: # Assuming uploaded_files is st.file_uploader result
-                st.info(f"Generating and saving embeddings for {len(uploaded_files)} file(s)...")
-                with tempfile.TemporaryDirectory() as temp_dir:
-                    # Save each uploaded file to the temporary directory
-                    for uploaded_file in uploaded_files:
-                        file_path = os.path.join(temp_dir, uploaded_file.name)
-                        # Write the content of the in-memory file to a disk file
-                        with open(file_path, "wb") as f:
-                            f.write(uploaded_file.getbuffer())   
-                        # Now, call the original function with the path to the temporary directory
-                    try:
-                            # 1. GENERATE the new embeddings and get the unique path
-                        with st.spinner("Generating Embeddings..."):                        
-                            latest_embedding= run_rag_pipeline(temp_dir)
-                            st.success(f"New embeddings loaded successfully")
-                    except Exception as e:
-                            st.error(f"Failed to generate and load NEW embeddings: {e}")
-
+                # Spool the uploads and ingest them in the background; the sidebar polls the job
+                job_id = ingest_jobs.submit([(f.name, f.getvalue()) for f in uploaded_files])
+                st.session_state.watched_ingest_jobs.add(job_id)
+                st.info(f"Queued {len(uploaded_files)} file(s) for embedding generation.")
             else:
                 st.warning("Please upload files first.")
+        ingestion_status()
         vector_db_path = resource_path('dependencies/vector_db')        
         options = [name for name in os.listdir(vector_db_path) if os.path.isdir(os.path.join(vector_db_path, name))]
-        vb_selection = st.pills("List of DataBases", options, default=options,selection_mode="multi")
+        # Only the newest DB of files sharing a name is selected by default
+        duplicates = same_file_stores(vector_db_path, options)
+        older = {name for group in duplicates for name in group[1:]}
+        for group in duplicates:
+            st.warning(f"{', '.join(group)} were built from files with the same name; only the newest, {group[0]}, is selected.")
+        vb_selection = st.pills("List of DataBases", options, default=[name for name in options if name not in older],selection_mode="multi")
         
 
     # --- Main chat interface ---
@@ -211,10 +311,19 @@ def main():
                         st.warning("Please enter a message.")
                     else:
                         original_user_msg = user_input.strip()
+                        retrieval = None
 
                         try:
-                                rag_context_str = rag_context(original_user_msg,vb_selection,st.session_state.k)
-                                full_query = f"{rag_context_str}\n\n{original_user_msg}"
+                                retrieval = rag_retrieve(
+                                    original_user_msg,
+                                    vb_selection,
+                                    st.session_state.k,
+                                    merge_mode=MERGE_GLOBAL if st.session_state.global_merge else MERGE_PER_DB,
+                                    top_k=st.session_state.top_k,
+                                    per_db_cap=st.session_state.per_db_cap or None,
+                                    min_score=st.session_state.min_score
+                                )
+                                full_query = f"{retrieval['context']}\n\n{original_user_msg}"
                         except Exception as e:
                                 st.error(f"Error generating RAG context: {e}")
                                 full_query = original_user_msg
@@ -224,16 +333,55 @@ def main():
                         with st.spinner("Calling Azure OpenAI..."):
                             try:
                                 chat_history = [msg for msg in st.session_state.messages if msg["role"] != "system"]
-                                api_messages = [st.session_state.messages[0]] + chat_history[:-1] + [{"role": "user", "content": full_query}]
+                                # Recent turns within HISTORY_TOKEN_BUDGET plus a rolling summary of the older ones
+                                api_messages = history_manager.build_messages(
+                                    st.session_state, st.session_state.messages[0], chat_history[:-1],
+                                    {"role": "user", "content": full_query}
+                                )
+
+                                # Answer cache: hits return immediately and never reach the queue/rate limiter
+                                cache_args = None
+                                response = None
+                                if settings.ANSWER_CACHE_ENABLED and retrieval is not None:
+                                    cache_args = {
+                                        "question": original_user_msg,
+                                        "scope_key": make_scope_key(
+                                            vb_selection, api_messages[:-1],
+                                            st.session_state.temperature, st.session_state.max_tokens
+                                        ),
+                                        "chunk_ids": retrieval["chunk_ids"],
+                                        "db_fingerprint": retrieval["db_fingerprint"],
+                                        "query_embedding": retrieval["query_embedding"] or None
+                                    }
+                                    response = answer_cache.lookup(**cache_args)
 
-                                response = chat_with_azure(api_messages, st.session_state.temperature, st.session_state.max_tokens)
+                                streamed = response is None and settings.CHAT_STREAMING
+                                if streamed:
+                                    # Deltas are rendered as they arrive; write_stream returns the full reply
+                                    response = st.write_stream(
+                                        chat_with_azure_stream(api_messages, st.session_state.temperature, st.session_state.max_tokens)
+                                    )
+                                    if cache_args is not None and response not in (RATE_LIMIT_MESSAGE, settings.FALLBACK_MESSAGE):
+                                        answer_cache.store(answer=response, **cache_args)
+                                elif response is None:
+                                    response = chat_with_azure(api_messages, st.session_state.temperature, st.session_state.max_tokens)
+                                    if cache_args is not None and response not in (RATE_LIMIT_MESSAGE, settings.FALLBACK_MESSAGE):
+                                        answer_cache.store(answer=response, **cache_args)
 
-                                if response == RATE_LIMIT_MESSAGE:
-                                    st.error(RATE_LIMIT_MESSAGE)
+                                # Busy (rate limit) or unavailable (circuit open): nothing to keep in the history
+                                if response in (RATE_LIMIT_MESSAGE, settings.FALLBACK_MESSAGE):
+                                    if not streamed:
+                                        # A streamed reply has already shown the message
+                                        st.error(response)
                                     # Remove the last user message since we failed to get a response
                                     st.session_state.messages.pop()
                                 else:
                                     st.session_state.messages.append({"role": "assistant", "content": response})
+                                    # Fold turns that left the window into the summary, off the critical path
+                                    history_manager.schedule_summary(
+                                        st.session_state,
+                                        [msg for msg in st.session_state.messages if msg["role"] != "system"]
+                                    )
 
                                 st.rerun()
                             except Exception as e:
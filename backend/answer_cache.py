@@ -0,0 +1,195 @@
+# backend/answer_cache.py
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, Optional, Sequence
+import numpy as np
+from backend.logger import logger
+from backend.query_cache import normalize_query
+from backend import settings
+
+
+def _sha256(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def make_scope_key(vb_selection: Sequence[str], history: Sequence[Dict[str, Any]], temperature: float, max_tokens: int) -> str:
+    """
+    Everything besides the question that determines an answer: the selected DBs,
+    the prior conversation (system prompt + earlier turns) and generation settings.
+    Answers are only reused within the same scope.
+    """
+    return _sha256({
+        "dbs": sorted(vb_selection),
+        "history": [[m.get("role"), m.get("content")] for m in history],
+        "temperature": round(float(temperature), 3),
+        "max_tokens": int(max_tokens)
+    })
+
+
+class AnswerCache:
+    """
+    Persistent (SQLite) cache of assistant answers in front of chat_with_azure.
+
+    - Exact tier: normalized question + scope + retrieved chunk IDs.
+    - Similarity tier: cosine similarity of query embeddings within the same scope.
+    Entries expire after ttl_seconds, the least recently used are evicted above
+    max_entries, and entries built on an older version of the selected vector DBs
+    (different db_fingerprint) are deleted on lookup.
+    """
+    def __init__(self, path: str, max_entries: int, ttl_seconds: float, similarity_threshold: float):
+        self.path = path
+        self.max_entries = max(max_entries, 1)
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.lock = threading.Lock()
+        self.hits_exact = 0
+        self.hits_similar = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS answers (
+                key TEXT PRIMARY KEY,
+                scope_key TEXT NOT NULL,
+                db_fingerprint TEXT NOT NULL,
+                question TEXT NOT NULL,
+                embedding BLOB,
+                answer TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS answers_scope ON answers (scope_key, db_fingerprint)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS answers_access ON answers (last_access)")
+        self.conn.commit()
+
+    @staticmethod
+    def exact_key(question: str, scope_key: str, chunk_ids: Sequence[str]) -> str:
+        return _sha256({"q": normalize_query(question), "scope": scope_key, "chunks": sorted(chunk_ids)})
+
+    def lookup(
+        self,
+        question: str,
+        scope_key: str,
+        chunk_ids: Sequence[str],
+        db_fingerprint: str,
+        query_embedding: Optional[Sequence[float]] = None
+    ) -> Optional[str]:
+        """Returns a cached answer (exact match first, then most similar question) or None."""
+        now = time.time()
+        key = self.exact_key(question, scope_key, chunk_ids)
+        with self.lock:
+            # Drop expired entries and answers built on older versions of these DBs
+            self.conn.execute("DELETE FROM answers WHERE created < ?", (now - self.ttl_seconds,))
+            self.conn.execute(
+                "DELETE FROM answers WHERE scope_key = ? AND db_fingerprint != ?",
+                (scope_key, db_fingerprint)
+            )
+
+            row = self.conn.execute("SELECT answer FROM answers WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self.conn.execute("UPDATE answers SET last_access = ? WHERE key = ?", (now, key))
+                self.conn.commit()
+                self.hits_exact += 1
+                return row[0]
+
+            answer = None
+            if query_embedding is not None:
+                answer = self._lookup_similar(scope_key, db_fingerprint, query_embedding, now)
+            self.conn.commit()
+
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits_similar += 1
+            return answer
+
+    def _lookup_similar(self, scope_key: str, db_fingerprint: str, query_embedding: Sequence[float], now: float) -> Optional[str]:
+        rows = self.conn.execute(
+            "SELECT key, embedding, answer FROM answers WHERE scope_key = ? AND db_fingerprint = ? AND embedding IS NOT NULL",
+            (scope_key, db_fingerprint)
+        ).fetchall()
+        if not rows:
+            return None
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        matrix = np.vstack([np.frombuffer(r[1], dtype=np.float32) for r in rows])
+        matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        similarities = matrix @ query
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            return None
+
+        self.conn.execute("UPDATE answers SET last_access = ? WHERE key = ?", (now, rows[best][0]))
+        logger.info("Answer cache similarity hit ({:.3f}).", float(similarities[best]))
+        return rows[best][2]
+
+    def store(
+        self,
+        question: str,
+        scope_key: str,
+        chunk_ids: Sequence[str],
+        db_fingerprint: str,
+        answer: str,
+        query_embedding: Optional[Sequence[float]] = None
+    ) -> None:
+        now = time.time()
+        key = self.exact_key(question, scope_key, chunk_ids)
+        blob = np.asarray(query_embedding, dtype=np.float32).tobytes() if query_embedding is not None else None
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, scope_key, db_fingerprint, question, blob, answer, now, now)
+            )
+            # LRU eviction above the size limit
+            self.conn.execute(
+                "DELETE FROM answers WHERE key IN ("
+                "SELECT key FROM answers ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self.conn.commit()
+
+    def clear(self) -> None:
+        with self.lock:
+            self.conn.execute("DELETE FROM answers")
+            self.conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            size = self.conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+            return {
+                "size": size,
+                "hits_exact": self.hits_exact,
+                "hits_similar": self.hits_similar,
+                "misses": self.misses
+            }
+
+
+def _default_cache_path() -> str:
+    if settings.ANSWER_CACHE_PATH:
+        return settings.ANSWER_CACHE_PATH
+    try:
+        from backend.path_resolver import resource_path
+        return os.path.join(resource_path("dependencies"), "answer_cache.sqlite3")
+    except FileNotFoundError:
+        return os.path.join(os.path.abspath("."), "answer_cache.sqlite3")
+
+
+# Global singleton shared by all sessions
+answer_cache = AnswerCache(
+    path=_default_cache_path(),
+    max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.ANSWER_CACHE_TTL_SEC,
+    similarity_threshold=settings.ANSWER_CACHE_SIMILARITY
+)
+
+__all__ = ["answer_cache", "AnswerCache", "make_scope_key"]
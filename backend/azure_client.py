@@ -1,26 +1,41 @@
+import os
+import json
+import time
+import asyncio
+import aiohttp
 import requests
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-from typing import List, Dict, Union, Any
+from tenacity import retry, stop_any, stop_after_attempt, wait_exponential, retry_if_exception_type
+from typing import AsyncIterator, Callable, Iterator, List, Dict, Optional, Set, Tuple, Union, Any
 from urllib.parse import urljoin
 
 # IMPORTANT: Import core components for queue submission
-from backend.task_queue import chat_queue 
-from backend.rate_limiter import RATE_LIMIT_MESSAGE # Essential for handling the queue's response
+from backend.task_queue import chat_queue, PRIORITY_INTERACTIVE, PRIORITY_VISUALIZATION, PRIORITY_BACKGROUND
+from backend.rate_limiter import global_rate_limiter, RATE_LIMIT_MESSAGE, Reservation, TokenBucketLimiter # Essential for handling the queue's response
 from backend.logger import logger
 
 # NOTE: Assuming these exist in your environment
 from backend import settings 
-from backend.proxy_config import get_proxy_session 
+from backend.proxy_config import proxy_request_kwargs, invalidate_proxy_token, connection_stats
+from backend.token_counter import count_message_tokens, count_tokens
+from backend.circuit_breaker import azure_breaker
 
-# --- Internal synchronous retry function (called ONLY by ChatWorker) ---
+# Transient failures worth another attempt (HTTPError covers non-200 answers from Azure)
+_RETRYABLE = (
+    asyncio.TimeoutError, aiohttp.ClientConnectionError, aiohttp.ClientPayloadError,
+    aiohttp.ClientHttpProxyError, requests.HTTPError
+)
+
+_ROUTER_POLL_SEC = 0.25
+
+# --- Internal async retry functions (awaited ONLY by the ChatQueue dispatcher) ---
 
-def _build_azure_url() -> str:
+def _build_azure_url(backend: "AzureBackend") -> str:
     """Constructs the full Azure OpenAI API endpoint URL."""
     base_url = urljoin(
-        settings.AZURE_OPENAI_ENDPOINT,
-        f"openai/deployments/{settings.AZURE_OPENAI_DEPLOYMENT}/chat/completions"
+        backend.endpoint,
+        f"openai/deployments/{backend.deployment}/chat/completions"
     )
-    return f"{base_url}?api-version={settings.AZURE_OPENAI_API_VERSION}"
+    return f"{base_url}?api-version={backend.api_version}"
 
 def _format_messages(messages: List[Dict[str, str]]) -> List[Dict[str, Any]]:
     """Formats messages for the specific Azure API payload structure."""
@@ -30,61 +45,447 @@ def _format_messages(messages: List[Dict[str, str]]) -> List[Dict[str, Any]]:
         for m in messages
     ]
 
-def _do_azure_call(session: requests.Session, messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> str:
-    """Performs the actual synchronous HTTP call to the Azure API."""
-    url = _build_azure_url()
-    headers = {
+def _log_usage(usage: Dict[str, int], estimated: bool = False) -> int:
+    """Logs token usage and returns the total."""
+    prompt_tokens = usage.get("prompt_tokens", 0)
+    completion_tokens = usage.get("completion_tokens", 0)
+    total_tokens = usage.get("total_tokens", prompt_tokens + completion_tokens)
+
+    logger.info(
+        "TOKENS | prompt={} | completion={} | total={}" + (" | estimated" if estimated else ""),
+        prompt_tokens, completion_tokens, total_tokens
+    )
+    return total_tokens
+
+def _headers(backend: "AzureBackend") -> Dict[str, str]:
+    return {
         "Content-Type": "application/json",
-        "api-key": settings.AZURE_OPENAI_KEY
+        "api-key": backend.key
     }
 
+class AzureHTTPError(requests.HTTPError):
+    """A non-200 answer from Azure (or the proxy); status is the HTTP status code."""
+    def __init__(self, message: str, status: int):
+        super().__init__(message)
+        self.status = status
+
+class AzureRateLimited(AzureHTTPError):
+    """A 429 from Azure; retry_after is the wait it asked for (seconds), if any."""
+    def __init__(self, message: str, retry_after: Optional[float]):
+        super().__init__(message, 429)
+        self.retry_after = retry_after
+
+class RateLimitExhausted(Exception):
+    """No backend had request/token capacity before the task's deadline."""
+
+
+class AzureBackend:
+    """One deployment + key: its own rate limiter, latency EWMA and ejection state."""
+    def __init__(self, name: str, endpoint: str, deployment: str, key: str, api_version: str, limiter: TokenBucketLimiter):
+        self.name = name
+        self.endpoint = endpoint
+        self.deployment = deployment
+        self.key = key
+        self.api_version = api_version
+        self.limiter = limiter
+        self.ewma_ms: Optional[float] = None
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def observe_latency(self, elapsed_ms: float) -> None:
+        alpha = settings.AZURE_BACKEND_EWMA_ALPHA
+        self.ewma_ms = elapsed_ms if self.ewma_ms is None else alpha * elapsed_ms + (1 - alpha) * self.ewma_ms
+
+    def is_ejected(self, now: float) -> bool:
+        return now < self.ejected_until
+
+    def score(self) -> float:
+        """Lower is better: expected latency, inflated as the remaining quota runs out. Untried backends go first."""
+        return (self.ewma_ms or 0.0) / max(self.limiter.headroom(), 0.05)
+
+
+class AzureRouter:
+    """
+    Spreads requests over several Azure deployments/keys. Each request goes to
+    the healthy backend with the best score (latency EWMA weighted by remaining
+    quota) that has capacity now; if none has, it waits, in arrival order, up to
+    the task's deadline. A backend that answers 429 is ejected for its
+    retry-after, one that fails AZURE_BACKEND_EJECT_AFTER times in a row (5xx,
+    timeouts, connection errors) for AZURE_BACKEND_EJECT_SEC.
+    """
+    def __init__(self, backends: List[AzureBackend]):
+        if not backends:
+            raise ValueError("At least one Azure OpenAI backend must be configured.")
+        self.backends = backends
+        # Created on first use, on the dispatcher's loop
+        self.waiters: Optional[asyncio.Lock] = None
+        self.counts = {"failovers": 0, "waited": 0, "refused": 0}
+
+    def _candidates(self, exclude: Set[str]) -> List[AzureBackend]:
+        now = time.monotonic()
+        remaining = [b for b in self.backends if b.name not in exclude]
+        healthy = [b for b in remaining if not b.is_ejected(now)]
+        # All ejected: try the one that comes back first rather than failing outright
+        candidates = healthy or sorted(remaining, key=lambda b: b.ejected_until)[:1]
+        return sorted(candidates, key=lambda b: b.score())
+
+    async def acquire(self, tokens: int, max_wait: float, exclude: Set[str]) -> Optional[Tuple[AzureBackend, Reservation]]:
+        if self.waiters is None:
+            self.waiters = asyncio.Lock()
+        deadline = time.monotonic() + max_wait
+        try:
+            await asyncio.wait_for(self.waiters.acquire(), timeout=max(max_wait, 0.001))
+        except asyncio.TimeoutError:
+            self.counts["refused"] += 1
+            return None
+        try:
+            waited = False
+            while True:
+                candidates = self._candidates(exclude)
+                if not candidates:
+                    return None
+                waits = []
+                for backend in candidates:
+                    reservation, wait = backend.limiter.try_acquire(tokens)
+                    if reservation is not None:
+                        backend.requests += 1
+                        self.counts["waited"] += int(waited)
+                        return backend, reservation
+                    waits.append(wait)
+                if min(waits) > deadline - time.monotonic():
+                    self.counts["refused"] += 1
+                    return None
+                waited = True
+                await asyncio.sleep(min(min(waits), _ROUTER_POLL_SEC))
+        finally:
+            self.waiters.release()
+
+    def record_success(self, backend: AzureBackend) -> None:
+        backend.consecutive_failures = 0
+
+    def record_failure(self, backend: AzureBackend, exc: BaseException) -> None:
+        backend.failures += 1
+        backend.consecutive_failures += 1
+        eject_for = 0.0
+        if isinstance(exc, AzureRateLimited):
+            eject_for = exc.retry_after or settings.AZURE_BACKEND_EJECT_SEC
+        elif backend.consecutive_failures >= settings.AZURE_BACKEND_EJECT_AFTER:
+            eject_for = settings.AZURE_BACKEND_EJECT_SEC
+        if eject_for:
+            backend.ejected_until = max(backend.ejected_until, time.monotonic() + eject_for)
+            logger.warning("ROUTER | ejected backend {} for {:.1f}s after: {}", backend.name, eject_for, exc)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        backends = [
+            {
+                "name": b.name,
+                "deployment": b.deployment,
+                "ewma_ms": b.ewma_ms,
+                "headroom": b.limiter.headroom(),
+                "ejected_for_sec": max(b.ejected_until - now, 0.0),
+                "requests": b.requests,
+                "failures": b.failures,
+                "limiter": b.limiter.stats()
+            }
+            for b in self.backends
+        ]
+        return {**self.counts, "backends": backends}
+
+
+def _load_backends() -> List[AzureBackend]:
+    """AZURE_OPENAI_BACKENDS if set, otherwise the single AZURE_OPENAI_* deployment (on the global limiter)."""
+    if not settings.AZURE_OPENAI_BACKENDS:
+        return [
+            AzureBackend(
+                name="default",
+                endpoint=settings.AZURE_OPENAI_ENDPOINT,
+                deployment=settings.AZURE_OPENAI_DEPLOYMENT,
+                key=settings.AZURE_OPENAI_KEY,
+                api_version=settings.AZURE_OPENAI_API_VERSION,
+                limiter=global_rate_limiter
+            )
+        ]
+    backends = []
+    for i, config in enumerate(json.loads(settings.AZURE_OPENAI_BACKENDS)):
+        backends.append(
+            AzureBackend(
+                name=config.get("name") or f"backend{i}",
+                endpoint=config["endpoint"],
+                deployment=config["deployment"],
+                key=config.get("key") or os.getenv(config.get("key_env", ""), ""),
+                api_version=config.get("api_version", settings.AZURE_OPENAI_API_VERSION),
+                limiter=TokenBucketLimiter(
+                    requests_per_minute=int(config.get("rpm", settings.MAX_REQUESTS_PER_MINUTE)),
+                    tokens_per_minute=int(config.get("tpm", settings.MAX_TOKENS_PER_MINUTE))
+                )
+            )
+        )
+    return backends
+
+
+# Global router shared by the dispatcher
+azure_router = AzureRouter(_load_backends())
+
+
+async def _raise_for_status(
+    resp: aiohttp.ClientResponse,
+    backend: AzureBackend,
+    reservation: Optional[Reservation],
+    started: float
+) -> None:
+    elapsed_ms = (time.monotonic() - started) * 1000
+    logger.debug("HTTP | {} | status={} | {:.0f} ms | pool={}", backend.name, resp.status, elapsed_ms, connection_stats())
+    if resp.status == 200:
+        backend.observe_latency(elapsed_ms)
+    retry_after = reservation.observe(resp.headers, throttled=resp.status == 429) if reservation else None
+    if resp.status == 407:
+        invalidate_proxy_token()
+    if resp.status == 429:
+        raise AzureRateLimited(f"Azure error 429: {await resp.text()}", retry_after)
+    if resp.status != 200:
+        # Raise HTTPError, allowing tenacity to catch it and retry
+        raise AzureHTTPError(f"Azure error {resp.status}: {await resp.text()}", resp.status)
+
+async def _do_azure_call(
+    session: aiohttp.ClientSession,
+    backend: AzureBackend,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    max_tokens: int,
+    reservation: Optional[Reservation] = None
+) -> str:
+    """Performs the actual HTTP call to the Azure API on the dispatcher's event loop."""
     payload = {
         "messages": _format_messages(messages),
         "temperature": temperature,
         "max_tokens": max_tokens
     }
 
-    resp = session.post(url, headers=headers, json=payload, timeout=settings.REQUEST_TIMEOUT)
+    started = time.monotonic()
+    async with session.post(_build_azure_url(backend), headers=_headers(backend), json=payload, **(await proxy_request_kwargs())) as resp:
+        await _raise_for_status(resp, backend, reservation, started)
+        data = await resp.json(content_type=None)
 
-    if resp.status_code == 200:
-        data = resp.json()
-        usage = data.get("usage", {})
-        prompt_tokens = usage.get("prompt_tokens", 0)
-        completion_tokens = usage.get("completion_tokens", 0)
-        total_tokens = usage.get("total_tokens", prompt_tokens + completion_tokens)
+    total_tokens = _log_usage(data.get("usage", {}))
+    if reservation is not None:
+        reservation.settle(total_tokens)
 
-        logger.info(
-            "TOKENS | prompt={} | completion={} | total={}",
-            prompt_tokens, completion_tokens, total_tokens
-        )
-        
-        # Extract the assistant's reply
-        return data["choices"][0]["message"]["content"]
+    # Extract the assistant's reply
+    return data["choices"][0]["message"]["content"]
+
+class StreamInterrupted(Exception):
+    """
+    The stream broke after deltas were already delivered. Not retried: a second
+    attempt would repeat text the user has already seen. The cause is chained.
+    """
+
+async def _iter_sse_data(resp: aiohttp.ClientResponse) -> AsyncIterator[str]:
+    """Yields the data payload of each server-sent event until [DONE]."""
+    async for raw in resp.content:
+        line = raw.decode("utf-8").strip()
+        if not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return
+        yield data
+
+async def _do_azure_call_stream(
+    session: aiohttp.ClientSession,
+    backend: AzureBackend,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    max_tokens: int,
+    on_delta: Callable[[str], None],
+    reservation: Optional[Reservation] = None
+) -> str:
+    """Performs a streamed (SSE) call, passing each content delta to on_delta. Returns the full reply."""
+    payload = {
+        "messages": _format_messages(messages),
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "stream": True
+    }
+    if settings.AZURE_STREAM_INCLUDE_USAGE:
+        payload["stream_options"] = {"include_usage": True}
+
+    started = time.monotonic()
+    parts: List[str] = []
+    usage: Optional[Dict[str, int]] = None
+    async with session.post(_build_azure_url(backend), headers=_headers(backend), json=payload, **(await proxy_request_kwargs())) as resp:
+        await _raise_for_status(resp, backend, reservation, started)
+        try:
+            async for data in _iter_sse_data(resp):
+                chunk = json.loads(data)
+                if chunk.get("usage"):
+                    usage = chunk["usage"]
+                # The usage chunk (and Azure's content-filter preamble) has no choices
+                for choice in chunk.get("choices") or []:
+                    delta = (choice.get("delta") or {}).get("content")
+                    if delta:
+                        if not parts:
+                            logger.debug("HTTP | first delta after {:.0f} ms", (time.monotonic() - started) * 1000)
+                        parts.append(delta)
+                        on_delta(delta)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            if parts:
+                raise StreamInterrupted(str(e) or type(e).__name__) from e
+            raise
+    logger.debug("HTTP | {} | stream done | {:.0f} ms", backend.name, (time.monotonic() - started) * 1000)
+
+    reply = "".join(parts)
+    if usage is not None:
+        total_tokens = _log_usage(usage)
     else:
-        # Raise HTTPError, allowing tenacity to catch it and retry
-        raise requests.HTTPError(f"Azure error {resp.status_code}: {resp.text}")
+        total_tokens = _log_usage(
+            {"prompt_tokens": count_message_tokens(messages), "completion_tokens": count_tokens(reply)},
+            estimated=True
+        )
+    if reservation is not None:
+        reservation.settle(total_tokens)
+    return reply
+
+_exponential_backoff = wait_exponential(multiplier=1, min=settings.RETRY_MIN_SECONDS, max=settings.RETRY_MAX_SECONDS)
+
+def _wait_backoff(retry_state) -> float:
+    """Exponential backoff, but never shorter than the retry-after Azure sent with a 429."""
+    retry_after = getattr(retry_state.outcome.exception(), "retry_after", None) or 0.0
+    return max(_exponential_backoff(retry_state), retry_after)
+
+def is_outage_error(exc: BaseException) -> bool:
+    """Failures that indicate Azure or the proxy is down (counted by the circuit breaker), as opposed to bad requests or throttling."""
+    if isinstance(exc, AzureHTTPError):
+        return exc.status >= 500
+    return isinstance(exc, (asyncio.TimeoutError, aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, aiohttp.ClientHttpProxyError))
+
+def _failover_error(exc: BaseException) -> bool:
+    """Errors that make trying another backend worthwhile right away: throttling and outages."""
+    return isinstance(exc, AzureRateLimited) or is_outage_error(exc)
+
+def _on_transport_error(retry_state) -> None:
+    """Counts outage failures towards the circuit breaker; a rejected proxy CONNECT may also mean a stale Kerberos token."""
+    exc = retry_state.outcome.exception()
+    if is_outage_error(exc):
+        azure_breaker.record_failure()
+    if isinstance(exc, (aiohttp.ClientHttpProxyError, aiohttp.ClientProxyConnectionError)):
+        invalidate_proxy_token()
+
+def _stop_if_circuit_open(retry_state) -> bool:
+    """Stop retrying once the breaker has opened: the service is down, the request gets the fallback."""
+    return azure_breaker.is_open()
+
+def _stop_at_deadline(retry_state) -> bool:
+    """Stop retrying once the task's deadline has passed; nobody is waiting for the answer any more."""
+    deadline = retry_state.kwargs.get("deadline")
+    return deadline is not None and time.monotonic() >= deadline
+
+async def _routed_call(
+    session: aiohttp.ClientSession,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    max_tokens: int,
+    deadline: float,
+    on_delta: Optional[Callable[[str], None]] = None
+) -> str:
+    """
+    One attempt through the router: takes capacity on the best backend and, on a
+    429/5xx/transport failure, fails over to the next one at once (no backoff).
+    Raises the last failure once every backend has been tried, or
+    RateLimitExhausted if none has capacity before the deadline.
+    """
+    # Azure charges prompt + max_tokens against TPM on admission
+    estimate = count_message_tokens(messages) + max_tokens
+    tried: Set[str] = set()
+    last_error: Optional[BaseException] = None
+    while True:
+        grant = await azure_router.acquire(estimate, max(deadline - time.monotonic(), 0.0), exclude=tried)
+        if grant is None:
+            if last_error is not None:
+                raise last_error
+            raise RateLimitExhausted("No Azure backend had capacity before the request's deadline.")
+        backend, reservation = grant
+        try:
+            if on_delta is None:
+                reply = await _do_azure_call(session, backend, messages, temperature, max_tokens, reservation)
+            else:
+                reply = await _do_azure_call_stream(session, backend, messages, temperature, max_tokens, on_delta, reservation)
+        except Exception as e:
+            if not _failover_error(e):
+                raise
+            azure_router.record_failure(backend, e)
+            tried.add(backend.name)
+            last_error = e
+            if len(tried) < len(azure_router.backends):
+                azure_router.counts["failovers"] += 1
+                logger.warning("ROUTER | {} failed ({}); failing over", backend.name, e)
+            continue
+        finally:
+            # Failed, timed out or cancelled: refund the estimate (no-op once settled with the
+            # real usage). Whatever Azure did charge arrives via x-ratelimit-remaining-tokens.
+            reservation.settle(0)
+        azure_router.record_success(backend)
+        return reply
+
+@retry(
+    reraise=True,
+    stop=stop_any(stop_after_attempt(settings.RETRY_MAX_ATTEMPTS), _stop_if_circuit_open, _stop_at_deadline),
+    wait=_wait_backoff,
+    retry=retry_if_exception_type(_RETRYABLE),
+    after=_on_transport_error
+)
+async def _call_with_retry(
+    session: aiohttp.ClientSession,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    max_tokens: int,
+    deadline: float
+) -> str:
+    """
+    Awaitable API call with tenacity retry logic (backoff sleeps never block the loop).
+    This is awaited exclusively by the ChatQueue dispatcher, whose session keeps
+    warm proxy tunnels shared by all in-flight requests. An attempt only fails
+    (and backs off) once every backend has failed it.
+    """
+    return await _routed_call(session, messages, temperature, max_tokens, deadline=deadline)
 
 @retry(
     reraise=True,
-    stop=stop_after_attempt(settings.RETRY_MAX_ATTEMPTS),
-    wait=wait_exponential(multiplier=1, min=settings.RETRY_MIN_SECONDS, max=settings.RETRY_MAX_SECONDS),
-    retry=retry_if_exception_type((requests.Timeout, requests.ConnectionError, requests.HTTPError)) 
+    stop=stop_any(stop_after_attempt(settings.RETRY_MAX_ATTEMPTS), _stop_if_circuit_open, _stop_at_deadline),
+    wait=_wait_backoff,
+    retry=retry_if_exception_type(_RETRYABLE),
+    after=_on_transport_error
 )
-def _call_with_retry_sync(messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> str:
+async def _call_with_retry_stream(
+    session: aiohttp.ClientSession,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    max_tokens: int,
+    on_delta: Callable[[str], None],
+    deadline: float
+) -> str:
     """
-    Synchronous API call with tenacity retry logic. 
-    This is called exclusively by the ChatWorker thread.
+    Streamed counterpart of _call_with_retry, also awaited only by the dispatcher.
+    Same retry and failover policy, but only until the first delta has been delivered;
+    after that a failure raises StreamInterrupted, which is not retried.
     """
-    session = get_proxy_session()
-    return _do_azure_call(session, messages, temperature, max_tokens)
+    return await _routed_call(session, messages, temperature, max_tokens, deadline=deadline, on_delta=on_delta)
 
 
 # --- Public interface (called by app.py) ---
 
-def chat_with_azure(messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> str:
+def chat_with_azure(
+    messages: List[Dict[str, str]],
+    temperature: float,
+    max_tokens: int,
+    priority: int = PRIORITY_INTERACTIVE
+) -> str:
     """
     Submits a chat request to the global thread-safe queue and waits synchronously for the result.
-    The execution, rate limiting, and retries happen in the background worker thread.
+    The execution, rate limiting, and retries happen on the queue's background event loop.
+    Interactive chat is dispatched ahead of PRIORITY_VISUALIZATION and PRIORITY_BACKGROUND work.
     """
     logger.debug(f"Submitting chat request to queue. Message: {messages[-1]['content'][:30]}...")
     
@@ -92,9 +493,30 @@ def chat_with_azure(messages: List[Dict[str, str]], temperature: float, max_toke
     response = chat_queue.submit(
         messages=messages,
         temperature=temperature,
-        max_tokens=max_tokens
+        max_tokens=max_tokens,
+        priority=priority
     )
     # The response can be the chat reply (str) or RATE_LIMIT_MESSAGE (str)
     return response
 
-__all__ = ["chat_with_azure", "_call_with_retry_sync", "RATE_LIMIT_MESSAGE"]
+def chat_with_azure_stream(messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> Iterator[str]:
+    """
+    Streaming variant of chat_with_azure for st.write_stream: enqueues the request
+    and returns an iterator over the reply deltas as the dispatcher receives them.
+    A rate-limited request yields RATE_LIMIT_MESSAGE as its only delta.
+    """
+    logger.debug(f"Submitting streamed chat request to queue. Message: {messages[-1]['content'][:30]}...")
+    handle = chat_queue.enqueue(
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        stream=True
+    )
+    return iter(handle)
+
+__all__ = [
+    "chat_with_azure", "chat_with_azure_stream", "_call_with_retry", "_call_with_retry_stream",
+    "StreamInterrupted", "AzureHTTPError", "AzureRateLimited", "RateLimitExhausted", "is_outage_error",
+    "azure_router", "AzureRouter", "AzureBackend", "RATE_LIMIT_MESSAGE",
+    "PRIORITY_INTERACTIVE", "PRIORITY_VISUALIZATION", "PRIORITY_BACKGROUND"
+]
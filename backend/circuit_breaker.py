@@ -0,0 +1,116 @@
+# backend/circuit_breaker.py
+import time
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+from backend.logger import logger
+from backend import settings
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open circuit breaker.
+
+    closed:    requests flow; failures are counted over a sliding window and
+               fail_threshold of them within window_seconds open the circuit.
+    open:      requests are refused at once (callers answer with a fallback)
+               until cooldown_seconds have passed.
+    half_open: a single probe request is let through; its success closes the
+               circuit, its failure re-opens it for another cooldown.
+
+    allow_request() returns the state a request was admitted in (None when it
+    is refused); every admitted request must end with record_success(),
+    record_failure() or release(admitted_state).
+    """
+    def __init__(self, name: str, fail_threshold: int, window_seconds: float, cooldown_seconds: float):
+        self.name = name
+        self.fail_threshold = max(fail_threshold, 1)
+        self.window = window_seconds
+        self.cooldown = cooldown_seconds
+        self.state = STATE_CLOSED
+        self.failures = deque()
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.lock = threading.Lock()
+        self.transitions: Dict[str, int] = {}
+        self.short_circuited = 0
+
+    def _transition(self, state: str) -> None:
+        key = f"{self.state}->{state}"
+        self.transitions[key] = self.transitions.get(key, 0) + 1
+        logger.warning("CIRCUIT | {} | {}", self.name, key)
+        self.state = state
+        if state == STATE_OPEN:
+            self.opened_at = time.monotonic()
+        if state == STATE_CLOSED:
+            self.failures.clear()
+
+    def allow_request(self) -> Optional[str]:
+        with self.lock:
+            if self.state == STATE_OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self._transition(STATE_HALF_OPEN)
+            if self.state == STATE_CLOSED:
+                return STATE_CLOSED
+            if self.state == STATE_HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return STATE_HALF_OPEN
+            self.short_circuited += 1
+            return None
+
+    def is_open(self) -> bool:
+        with self.lock:
+            return self.state == STATE_OPEN
+
+    def record_success(self) -> None:
+        with self.lock:
+            if self.state == STATE_HALF_OPEN:
+                self.probe_in_flight = False
+                self._transition(STATE_CLOSED)
+
+    def record_failure(self) -> None:
+        now = time.monotonic()
+        with self.lock:
+            if self.state == STATE_HALF_OPEN:
+                self.probe_in_flight = False
+                self._transition(STATE_OPEN)
+                return
+            if self.state == STATE_OPEN:
+                return
+            self.failures.append(now)
+            while self.failures and self.failures[0] < now - self.window:
+                self.failures.popleft()
+            if len(self.failures) >= self.fail_threshold:
+                self._transition(STATE_OPEN)
+
+    def release(self, admitted_state: Optional[str]) -> None:
+        """
+        Ends a request; if it was the half-open probe and neither proved nor
+        disproved the service (e.g. it was cancelled), the next request may probe.
+        """
+        with self.lock:
+            if admitted_state == STATE_HALF_OPEN and self.state == STATE_HALF_OPEN:
+                self.probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "state": self.state,
+                "failures_in_window": len(self.failures),
+                "short_circuited": self.short_circuited,
+                "transitions": dict(self.transitions)
+            }
+
+
+# Global breaker around the Azure OpenAI dispatch path
+azure_breaker = CircuitBreaker(
+    name="azure",
+    fail_threshold=settings.CB_FAIL_THRESHOLD,
+    window_seconds=settings.CB_WINDOW_SEC,
+    cooldown_seconds=settings.CB_COOLDOWN_SEC
+)
+
+__all__ = ["azure_breaker", "CircuitBreaker", "STATE_CLOSED", "STATE_OPEN", "STATE_HALF_OPEN"]
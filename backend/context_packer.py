@@ -0,0 +1,135 @@
+# backend/context_packer.py
+from typing import Any, Dict, List, Optional, Tuple
+from langchain_core.documents import Document
+from backend.token_counter import count_tokens, truncate_to_tokens
+
+# Shortest text overlap (in characters) treated as a chunk-overlap duplicate when
+# chunks carry no start_index (stores ingested before start_index was recorded)
+MIN_TEXT_OVERLAP = 40
+
+# Below this many tokens of remaining budget a truncated passage is not worth adding
+MIN_PARTIAL_TOKENS = 32
+
+PASSAGE_SEPARATOR = "\n...\n"
+DB_SEPARATOR = "\n---\n"
+
+
+def db_header(db_name: str) -> str:
+    return f"According to data from {db_name} the relevant context is :\n"
+
+
+def _text_overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of left that is also a prefix of right."""
+    max_len = min(len(left), len(right))
+    for length in range(max_len, MIN_TEXT_OVERLAP - 1, -1):
+        if left.endswith(right[:length]):
+            return length
+    return 0
+
+
+class _Passage:
+    """A run of merged chunks from one (db, source, page), ranked by its best chunk."""
+    def __init__(self, doc: Document, rank: int):
+        self.text = doc.page_content
+        self.start: Optional[int] = doc.metadata.get("start_index")
+        self.end: Optional[int] = self.start + len(self.text) if self.start is not None else None
+        self.rank = rank
+        self.metadata = doc.metadata
+
+    def try_merge(self, doc: Document, rank: int) -> bool:
+        """Absorbs doc if it overlaps or touches this passage. Returns True when merged."""
+        text = doc.page_content
+        start = doc.metadata.get("start_index")
+
+        if start is not None and self.start is not None:
+            end = start + len(text)
+            if start > self.end or end < self.start:
+                return False
+            if start < self.start:
+                self.text = text + self.text[end - self.start:] if end < self.end else text
+            elif end > self.end:
+                self.text = self.text + text[self.end - start:]
+            self.start, self.end = min(self.start, start), max(self.end, end)
+        else:
+            if text in self.text:
+                pass
+            elif self.text in text:
+                self.text = text
+            else:
+                tail_overlap = _text_overlap(self.text, text)
+                head_overlap = 0 if tail_overlap else _text_overlap(text, self.text)
+                if tail_overlap:
+                    self.text = self.text + text[tail_overlap:]
+                elif head_overlap:
+                    self.text = text + self.text[head_overlap:]
+                else:
+                    return False
+
+        self.rank = min(self.rank, rank)
+        return True
+
+
+def _merge_group(passages: List[_Passage], doc: Document, rank: int) -> None:
+    """Adds doc to its group, merging it into (and collapsing) every passage it overlaps."""
+    merged: Optional[_Passage] = None
+    for passage in list(passages):
+        if merged is None:
+            if passage.try_merge(doc, rank):
+                merged = passage
+        elif merged.try_merge(Document(page_content=passage.text, metadata={"start_index": passage.start}), passage.rank):
+            passages.remove(passage)
+    if merged is None:
+        passages.append(_Passage(doc, rank))
+
+
+def merge_chunks(documents: List[Document]) -> List[Tuple[str, _Passage]]:
+    """
+    Merges adjacent/overlapping chunks that come from the same DB, source and page.
+    Returns (db_name, passage) pairs ordered by the rank of each passage's best chunk.
+    """
+    groups: Dict[Tuple[str, Any, Any], List[_Passage]] = {}
+    for rank, doc in enumerate(documents):
+        metadata = doc.metadata or {}
+        key = (metadata.get("db_name", ""), metadata.get("source"), metadata.get("page"))
+        _merge_group(groups.setdefault(key, []), doc, rank)
+
+    flat = [(key[0], passage) for key, passages in groups.items() for passage in passages]
+    flat.sort(key=lambda item: item[1].rank)
+    return flat
+
+
+def pack_context(documents: List[Document], token_budget: int) -> str:
+    """
+    Builds the prompt context from ranked chunks: merges overlapping chunks, keeps
+    passages in rank order until the token budget is spent (truncating the last
+    one if worthwhile), then renders one header per DB with its passages below it.
+    """
+    if not documents:
+        return ""
+
+    selected: Dict[str, List[str]] = {}
+    used = 0
+    for db_name, passage in merge_chunks(documents):
+        cost = count_tokens(passage.text) + count_tokens(PASSAGE_SEPARATOR)
+        if db_name not in selected:
+            cost += count_tokens(db_header(db_name)) + count_tokens(DB_SEPARATOR)
+
+        remaining = token_budget - used
+        if cost <= remaining:
+            selected.setdefault(db_name, []).append(passage.text)
+            used += cost
+            continue
+
+        # Fit a truncated version of this passage if enough budget is left
+        overhead = cost - count_tokens(passage.text)
+        if remaining - overhead >= MIN_PARTIAL_TOKENS:
+            selected.setdefault(db_name, []).append(truncate_to_tokens(passage.text, remaining - overhead))
+        break
+
+    return DB_SEPARATOR.join(
+        db_header(db_name) + PASSAGE_SEPARATOR.join(passages)
+        for db_name, passages in selected.items()
+    )
+
+
+__all__ = ["pack_context", "merge_chunks", "db_header"]
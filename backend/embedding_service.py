@@ -0,0 +1,148 @@
+# backend/embedding_service.py
+import time
+import queue
+import itertools
+import threading
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+from langchain_core.embeddings import Embeddings
+from backend.logger import logger
+from backend import settings
+
+# Queries are served before document batches so chat latency is not stuck
+# behind an ingestion job embedding thousands of chunks.
+PRIORITY_QUERY = 0
+PRIORITY_DOCUMENTS = 1
+
+
+class _EmbedRequest:
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.future: "Future[List[List[float]]]" = Future()
+
+
+class EmbeddingService(Embeddings):
+    """
+    One process-wide embedding model behind a request queue.
+    Worker threads coalesce concurrent embed_query/embed_documents calls from all
+    sessions (and ingestion) into dynamic batches of up to max_batch texts, waiting
+    at most max_wait_ms for a batch to fill. Implements the LangChain Embeddings
+    interface so it can be handed to Chroma and FlatVectorStore directly.
+    """
+    def __init__(self, model_path: str, max_batch: int, max_wait_ms: float, workers: int, torch_threads: int = 0):
+        self.model_path = model_path
+        self.max_batch = max(max_batch, 1)
+        self.max_wait = max(max_wait_ms, 0) / 1000.0
+        self.torch_threads = torch_threads
+        self.requests: "queue.PriorityQueue[Tuple[int, int, _EmbedRequest]]" = queue.PriorityQueue()
+        self.sequence = itertools.count()
+        self.model = None
+        self.model_lock = threading.Lock()
+        self.batches = 0
+        self.texts_embedded = 0
+        self.workers = [
+            threading.Thread(target=self._run, name=f"embed-worker-{i}", daemon=True)
+            for i in range(max(workers, 1))
+        ]
+        for w in self.workers:
+            w.start()
+
+    def _get_model(self):
+        if self.model is None:
+            with self.model_lock:
+                if self.model is None:
+                    from langchain_community.embeddings import SentenceTransformerEmbeddings
+                    if self.torch_threads > 0:
+                        import torch
+                        torch.set_num_threads(self.torch_threads)
+                    logger.info("Loading embedding model from '{}'.", self.model_path)
+                    self.model = SentenceTransformerEmbeddings(model_name=self.model_path)
+        return self.model
+
+    def _submit(self, texts: List[str], priority: int) -> "Future[List[List[float]]]":
+        request = _EmbedRequest(texts)
+        self.requests.put((priority, next(self.sequence), request))
+        return request.future
+
+    def _collect_batch(self) -> List[_EmbedRequest]:
+        """Blocks for one request, then keeps adding requests until the batch is full or max_wait passes."""
+        _, _, first = self.requests.get()
+        batch = [first]
+        size = len(first.texts)
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                _, _, request = self.requests.get(timeout=remaining) if remaining > 0 else self.requests.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.texts)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect_batch()
+            texts = [text for request in batch for text in request.texts]
+            try:
+                vectors = self._get_model().embed_documents(texts)
+            except Exception as e:
+                logger.error("Embedding batch of {} texts failed: {}", len(texts), e)
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.texts_embedded += len(texts)
+            offset = 0
+            for request in batch:
+                request.future.set_result(vectors[offset:offset + len(request.texts)])
+                offset += len(request.texts)
+
+    # --- LangChain Embeddings interface ---
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._submit([text], PRIORITY_QUERY).result()[0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        texts = list(texts)
+        futures = [
+            self._submit(texts[i:i + self.max_batch], PRIORITY_DOCUMENTS)
+            for i in range(0, len(texts), self.max_batch)
+        ]
+        vectors: List[List[float]] = []
+        for future in futures:
+            vectors.extend(future.result())
+        return vectors
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "texts_embedded": self.texts_embedded,
+            "avg_batch_size": (self.texts_embedded / self.batches) if self.batches else 0.0,
+            "pending_requests": self.requests.qsize()
+        }
+
+
+_service: Optional[EmbeddingService] = None
+_service_lock = threading.Lock()
+
+
+def get_embedding_service() -> EmbeddingService:
+    """Returns the process-wide embedding service (the model itself loads on first use)."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                from backend.path_resolver import resource_path
+                _service = EmbeddingService(
+                    model_path=resource_path("dependencies/embeddinggemma-300m"),
+                    max_batch=settings.EMBED_MAX_BATCH,
+                    max_wait_ms=settings.EMBED_MAX_WAIT_MS,
+                    workers=settings.EMBED_WORKERS,
+                    torch_threads=settings.EMBED_TORCH_THREADS
+                )
+    return _service
+
+
+__all__ = ["EmbeddingService", "get_embedding_service"]
@@ -0,0 +1,526 @@
+# backend/flat_index.py
+import os
+import json
+import uuid
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+# A flat store directory contains:
+#   flat_index.json           manifest (dim, count, current generation)
+#   vectors.<gen>.f32         contiguous float32 matrix (count x dim), memory-mapped
+#   norms.<gen>.f32           squared L2 norm of every row, memory-mapped
+#   docs.<gen>.jsonl          one {"id", "text", "metadata"} record per row, memory-mapped
+#   offsets.<gen>.u64         byte offset of every record in docs.<gen>.jsonl (count + 1)
+#   codes.<gen>.i8|f16        optional quantized copy of the vectors (int8 or float16)
+#   scales.<gen>.f32          per-vector scale for int8 codes
+# With quantization enabled, searches scan only the compact codes and re-rank a
+# shortlist against the float32 rows, so the full-precision matrix is paged in
+# for a handful of rows instead of staying resident.
+# Every write produces a new generation and swaps the manifest last, so readers
+# (and Windows, which cannot replace a mapped file) never see a half-written index.
+# Each store reads through one immutable snapshot of mapped files per call, and
+# the previous generation is removed only by the write after that.
+MANIFEST_NAME = "flat_index.json"
+FORMAT_VERSION = 1
+
+QUANTIZATION_NONE = "none"
+QUANTIZATION_FLOAT16 = "float16"
+QUANTIZATION_INT8 = "int8"
+_CODE_FILES = {QUANTIZATION_FLOAT16: ("f16", np.float16), QUANTIZATION_INT8: ("i8", np.int8)}
+
+# Rows scanned per block when decoding quantized codes (bounds temporary memory)
+_SCAN_BLOCK_ROWS = 16384
+
+
+def is_flat_store(persist_directory: str) -> bool:
+    """True if the directory holds a flat (memory-mapped) vector index."""
+    return os.path.isfile(os.path.join(persist_directory, MANIFEST_NAME))
+
+
+def _gen_path(persist_directory: str, stem: str, generation: int, ext: str) -> str:
+    return os.path.join(persist_directory, f"{stem}.{generation}.{ext}")
+
+
+def quantize(vectors: np.ndarray, quantization: str) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+    """
+    Returns (codes, scales) for the requested quantization.
+    int8 uses a symmetric per-vector scale (max |x| / 127); float16 needs no scale.
+    """
+    if quantization == QUANTIZATION_FLOAT16:
+        return vectors.astype(np.float16), None
+    if quantization == QUANTIZATION_INT8:
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    if quantization != QUANTIZATION_NONE:
+        raise ValueError(f"Unknown quantization '{quantization}'")
+    return None, None
+
+
+class _Snapshot:
+    """
+    One generation of a flat store: its maps and row count, never modified after
+    loading. The store swaps its snapshot in a single assignment on every write,
+    and each read works on the one snapshot it took, so it never pairs the row
+    count of one generation with the files of another.
+    """
+    def __init__(self, persist_directory: str, manifest: Dict[str, Any]):
+        self.persist_directory = persist_directory
+        self.manifest = manifest
+        self.dim = int(manifest["dim"])
+        self.count = int(manifest["count"])
+        self.generation = int(manifest["generation"])
+        self.quantization = manifest.get("quantization", QUANTIZATION_NONE)
+        self.codes: Optional[np.ndarray] = None
+        self.scales: Optional[np.ndarray] = None
+        self._id_to_row: Optional[Dict[str, int]] = None
+
+        if self.count == 0:
+            # np.memmap cannot map empty files
+            self.vectors = np.zeros((0, self.dim), dtype=np.float32)
+            self.norms = np.zeros((0,), dtype=np.float32)
+            self.offsets = np.zeros((1,), dtype=np.uint64)
+            self.docs = np.zeros((0,), dtype=np.uint8)
+            return
+
+        # Read-only maps also work on read-only bundle directories (PyInstaller)
+        self.vectors = np.memmap(
+            _gen_path(persist_directory, "vectors", self.generation, "f32"),
+            dtype=np.float32, mode="r", shape=(self.count, self.dim)
+        )
+        self.norms = np.memmap(
+            _gen_path(persist_directory, "norms", self.generation, "f32"),
+            dtype=np.float32, mode="r", shape=(self.count,)
+        )
+        self.offsets = np.memmap(
+            _gen_path(persist_directory, "offsets", self.generation, "u64"),
+            dtype=np.uint64, mode="r", shape=(self.count + 1,)
+        )
+        # Mapped rather than opened per read: the mapping outlives the removal of an old generation
+        self.docs = np.memmap(_gen_path(persist_directory, "docs", self.generation, "jsonl"), dtype=np.uint8, mode="r")
+        if self.quantization in _CODE_FILES:
+            ext, dtype = _CODE_FILES[self.quantization]
+            self.codes = np.memmap(
+                _gen_path(persist_directory, "codes", self.generation, ext),
+                dtype=dtype, mode="r", shape=(self.count, self.dim)
+            )
+        if self.quantization == QUANTIZATION_INT8:
+            self.scales = np.memmap(
+                _gen_path(persist_directory, "scales", self.generation, "f32"),
+                dtype=np.float32, mode="r", shape=(self.count,)
+            )
+
+    def read_records(self, rows: Iterable[int]) -> List[Dict[str, Any]]:
+        records = []
+        for row in rows:
+            start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+            records.append(json.loads(self.docs[start:end].tobytes()))
+        return records
+
+    def row_index(self) -> Dict[str, int]:
+        if self._id_to_row is None:
+            records = self.read_records(range(self.count))
+            self._id_to_row = {r["id"]: i for i, r in enumerate(records)}
+        return self._id_to_row
+
+    def get(self, ids: Optional[List[str]], include: List[str]) -> Dict[str, Any]:
+        rows = list(range(self.count))
+        if ids is not None:
+            id_to_row = self.row_index()
+            rows = [id_to_row[doc_id] for doc_id in ids if doc_id in id_to_row]
+        records = self.read_records(rows)
+
+        result: Dict[str, Any] = {"ids": [r["id"] for r in records]}
+        if "documents" in include:
+            result["documents"] = [r["text"] for r in records]
+        if "metadatas" in include:
+            result["metadatas"] = [r["metadata"] for r in records]
+        if "embeddings" in include:
+            result["embeddings"] = np.asarray(self.vectors[rows], dtype=np.float32).reshape(len(rows), self.dim)
+        return result
+
+    def squared_distances(self, query: np.ndarray) -> np.ndarray:
+        return self.norms + float(query @ query) - 2.0 * (self.vectors @ query)
+
+    def approximate_distances(self, query: np.ndarray) -> np.ndarray:
+        dots = np.empty((self.count,), dtype=np.float32)
+        for start in range(0, self.count, _SCAN_BLOCK_ROWS):
+            block = np.asarray(self.codes[start:start + _SCAN_BLOCK_ROWS], dtype=np.float32)
+            dots[start:start + block.shape[0]] = block @ query
+        if self.scales is not None:
+            dots *= self.scales
+        return self.norms + float(query @ query) - 2.0 * dots
+
+    def exact_distances(self, query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        return self.norms[rows] + float(query @ query) - 2.0 * (np.asarray(self.vectors[rows]) @ query)
+
+    def search_rows(self, query: np.ndarray, k: int, rerank_factor: int, exact: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        if self.count == 0 or k <= 0:
+            return np.zeros((0,), dtype=np.int64), np.zeros((0,), dtype=np.float32)
+
+        if exact or self.codes is None:
+            distances = self.squared_distances(query)
+            rows = _top_rows(distances, k)
+            return rows, distances[rows]
+
+        shortlist = _top_rows(self.approximate_distances(query), k * rerank_factor)
+        shortlist = np.sort(shortlist)  # sequential page access on the float32 map
+        exact_distances = self.exact_distances(query, shortlist)
+        order = _top_rows(exact_distances, k)
+        return shortlist[order], exact_distances[order]
+
+    def rows_to_documents(self, rows: Sequence[int]) -> List[Document]:
+        return [
+            Document(page_content=r["text"], metadata=r["metadata"], id=r["id"])
+            for r in self.read_records(rows)
+        ]
+
+
+def _top_rows(distances: np.ndarray, k: int) -> np.ndarray:
+    k = min(k, distances.shape[0])
+    if k <= 0:
+        return np.zeros((0,), dtype=np.int64)
+    rows = np.argpartition(distances, k - 1)[:k]
+    return rows[np.argsort(distances[rows])]
+
+
+class FlatVectorStore(VectorStore):
+    """
+    Brute-force vector store backed by a memory-mapped float32 matrix.
+    A search is a single matrix-vector product over mapped pages, and opening a
+    store only maps files (no deserialisation), so cold start is near-instant.
+    Reads need no lock: each one works on the snapshot current when it started.
+    """
+    def __init__(self, persist_directory: str, embedding_function: Optional[Embeddings] = None, rerank_factor: int = 4):
+        self.persist_directory = persist_directory
+        self.embedding_function = embedding_function
+        # Shortlist size (k * rerank_factor) re-ranked in full precision when quantized
+        self.rerank_factor = max(rerank_factor, 1)
+        # Serializes writers only
+        self.lock = threading.Lock()
+        self._snapshot: _Snapshot = self._load()
+
+    # --- Loading ---
+
+    def _load(self) -> _Snapshot:
+        with open(os.path.join(self.persist_directory, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported flat index format in '{self.persist_directory}': {manifest.get('format')}")
+        return _Snapshot(self.persist_directory, manifest)
+
+    # Attributes of the current generation
+    @property
+    def manifest(self) -> Dict[str, Any]:
+        return self._snapshot.manifest
+
+    @property
+    def dim(self) -> int:
+        return self._snapshot.dim
+
+    @property
+    def count(self) -> int:
+        return self._snapshot.count
+
+    @property
+    def generation(self) -> int:
+        return self._snapshot.generation
+
+    @property
+    def quantization(self) -> str:
+        return self._snapshot.quantization
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._snapshot.vectors
+
+    @property
+    def codes(self) -> Optional[np.ndarray]:
+        return self._snapshot.codes
+
+    @property
+    def scales(self) -> Optional[np.ndarray]:
+        return self._snapshot.scales
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self.embedding_function
+
+    def persist(self) -> None:
+        """Kept for API parity with Chroma; every write is already durable."""
+        return None
+
+    # --- Writing ---
+
+    @staticmethod
+    def write(
+        persist_directory: str,
+        ids: Sequence[str],
+        texts: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]],
+        vectors: np.ndarray,
+        previous_generation: int = 0,
+        quantization: str = QUANTIZATION_NONE
+    ) -> int:
+        """Writes a complete new generation of the index and returns its number."""
+        os.makedirs(persist_directory, exist_ok=True)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[0] != len(texts):
+            raise ValueError("vectors must be a (len(texts), dim) matrix")
+
+        generation = previous_generation + 1
+        count, dim = vectors.shape
+
+        vectors.tofile(_gen_path(persist_directory, "vectors", generation, "f32"))
+        np.einsum("ij,ij->i", vectors, vectors).astype(np.float32).tofile(
+            _gen_path(persist_directory, "norms", generation, "f32")
+        )
+
+        offsets = np.zeros((count + 1,), dtype=np.uint64)
+        with open(_gen_path(persist_directory, "docs", generation, "jsonl"), "wb") as f:
+            for i, (doc_id, text, metadata) in enumerate(zip(ids, texts, metadatas)):
+                line = json.dumps({"id": doc_id, "text": text, "metadata": metadata or {}}, ensure_ascii=False)
+                f.write(line.encode("utf-8") + b"\n")
+                offsets[i + 1] = f.tell()
+        offsets.tofile(_gen_path(persist_directory, "offsets", generation, "u64"))
+
+        codes, scales = quantize(vectors, quantization)
+        if codes is not None:
+            codes.tofile(_gen_path(persist_directory, "codes", generation, _CODE_FILES[quantization][0]))
+        if scales is not None:
+            scales.tofile(_gen_path(persist_directory, "scales", generation, "f32"))
+
+        manifest = {
+            "format": FORMAT_VERSION,
+            "dim": int(dim),
+            "count": int(count),
+            "generation": generation,
+            "quantization": quantization
+        }
+        tmp_manifest = os.path.join(persist_directory, MANIFEST_NAME + ".tmp")
+        with open(tmp_manifest, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_manifest, os.path.join(persist_directory, MANIFEST_NAME))
+
+        # The previous generation stays until the next write, for reads still using it
+        _remove_stale_generations(persist_directory, oldest_kept=previous_generation)
+        return generation
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        persist_directory: Optional[str] = None,
+        quantization: str = QUANTIZATION_NONE,
+        **kwargs: Any
+    ) -> "FlatVectorStore":
+        """Embeds texts and writes them as a new flat store (replacing any existing one)."""
+        if persist_directory is None:
+            raise ValueError("persist_directory is required for FlatVectorStore")
+        texts = list(texts)
+        metadatas = list(metadatas) if metadatas else [{} for _ in texts]
+        ids = list(ids) if ids else [uuid.uuid4().hex for _ in texts]
+        vectors = np.asarray(embedding.embed_documents(texts), dtype=np.float32).reshape(len(texts), -1)
+
+        previous = 0
+        if is_flat_store(persist_directory):
+            with open(os.path.join(persist_directory, MANIFEST_NAME), "r", encoding="utf-8") as f:
+                previous = int(json.load(f)["generation"])
+        cls.write(persist_directory, ids, texts, metadatas, vectors, previous_generation=previous, quantization=quantization)
+        return cls(persist_directory, embedding, **kwargs)
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> List[str]:
+        """Appends texts to the store (rewrites the index as a new generation)."""
+        if self.embedding_function is None:
+            raise ValueError("An embedding function is required to add texts")
+        texts = list(texts)
+        metadatas = list(metadatas) if metadatas else [{} for _ in texts]
+        ids = list(ids) if ids else [uuid.uuid4().hex for _ in texts]
+        new_vectors = np.asarray(self.embedding_function.embed_documents(texts), dtype=np.float32).reshape(len(texts), -1)
+
+        with self.lock:
+            snapshot = self._snapshot
+            existing = snapshot.get(None, ["documents", "metadatas", "embeddings"])
+            all_vectors = np.vstack([existing["embeddings"], new_vectors]) if snapshot.count else new_vectors
+            self.write(
+                self.persist_directory,
+                existing["ids"] + ids,
+                existing["documents"] + texts,
+                existing["metadatas"] + metadatas,
+                all_vectors,
+                previous_generation=snapshot.generation,
+                quantization=snapshot.quantization
+            )
+            self._snapshot = self._load()
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """Removes the given ids (rewrites the index as a new generation)."""
+        if not ids:
+            return False
+        drop = set(ids)
+        with self.lock:
+            snapshot = self._snapshot
+            existing = snapshot.get(None, ["documents", "metadatas", "embeddings"])
+            keep = [i for i, doc_id in enumerate(existing["ids"]) if doc_id not in drop]
+            self.write(
+                self.persist_directory,
+                [existing["ids"][i] for i in keep],
+                [existing["documents"][i] for i in keep],
+                [existing["metadatas"][i] for i in keep],
+                existing["embeddings"][keep].reshape(len(keep), snapshot.dim),
+                previous_generation=snapshot.generation,
+                quantization=snapshot.quantization
+            )
+            self._snapshot = self._load()
+        return True
+
+    # --- Reading ---
+
+    def get(self, ids: Optional[List[str]] = None, include: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Chroma-compatible bulk read: returns ids plus the requested documents/metadatas/embeddings."""
+        return self._snapshot.get(ids, include or ["documents", "metadatas"])
+
+    def squared_distances(self, query: np.ndarray) -> np.ndarray:
+        """Exact squared L2 distance from query to every row, via one matrix-vector product."""
+        return self._snapshot.squared_distances(query)
+
+    def approximate_distances(self, query: np.ndarray) -> np.ndarray:
+        """Squared L2 distances computed from the quantized codes (exact norms, approximate dot products)."""
+        return self._snapshot.approximate_distances(query)
+
+    def search_rows(self, query: np.ndarray, k: int, exact: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (rows, squared L2 distances) of the k nearest rows, best first.
+        Quantized stores scan the codes and re-rank a k * rerank_factor shortlist
+        in full precision, unless exact=True forces a float32 scan. Rows refer to
+        the current generation; resolve them with the same snapshot (see
+        search_flat_stores) when a write may happen in between.
+        """
+        return self._snapshot.search_rows(query, k, self.rerank_factor, exact=exact)
+
+    def rows_to_documents(self, rows: Sequence[int]) -> List[Document]:
+        return self._snapshot.rows_to_documents(rows)
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        """Returns (document, squared L2 distance) pairs, matching Chroma's default 'l2' space."""
+        query = np.asarray(embedding, dtype=np.float32)
+        snapshot = self._snapshot
+        rows, distances = snapshot.search_rows(query, k, self.rerank_factor)
+        return list(zip(snapshot.rows_to_documents(rows), [float(d) for d in distances]))
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_relevance_scores(embedding, k)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        if self.embedding_function is None:
+            raise ValueError("An embedding function is required to search by text")
+        return self.similarity_search_by_vector(self.embedding_function.embed_query(query), k)
+
+
+def search_flat_stores(stores: Sequence[Tuple[str, FlatVectorStore]], embedding: List[float], k: int) -> List[Tuple[str, Document, float]]:
+    """
+    Global top-k over many flat stores at once: one vectorized scan per mapped
+    matrix, then a single partial sort over the concatenated candidates (the
+    global top-k is always contained in the union of per-store top-k lists).
+    Returns (db_name, document, squared L2 distance) sorted best first.
+    """
+    query = np.asarray(embedding, dtype=np.float32)
+    snapshots = [(name, store._snapshot, store.rerank_factor) for name, store in stores]
+    per_store = [
+        (name, snapshot, *snapshot.search_rows(query, k, rerank_factor))
+        for name, snapshot, rerank_factor in snapshots if snapshot.count
+    ]
+    if not per_store or k <= 0:
+        return []
+
+    all_distances = np.concatenate([d for _, _, _, d in per_store])
+    bounds = np.cumsum([0] + [d.shape[0] for _, _, _, d in per_store])
+    best = _top_rows(all_distances, k)
+
+    results: List[Tuple[str, Document, float]] = []
+    for flat_row in best:
+        store_idx = int(np.searchsorted(bounds, flat_row, side="right") - 1)
+        name, snapshot, rows, _ = per_store[store_idx]
+        row = int(rows[flat_row - bounds[store_idx]])
+        doc = snapshot.rows_to_documents([row])[0]
+        results.append((name, doc, float(all_distances[flat_row])))
+    return results
+
+
+def quantization_report(store: FlatVectorStore, k: int = 10, n_queries: int = 100, seed: int = 0) -> Dict[str, Any]:
+    """
+    Measures what quantization buys and costs on a store: resident bytes of the
+    scanned matrix versus float32, and recall@k of the approximate scan alone and
+    after full-precision re-ranking, against exact float32 search. Queries are
+    sampled stored vectors with small Gaussian noise.
+    """
+    snapshot = store._snapshot
+    float32_bytes = snapshot.count * snapshot.dim * 4
+    report: Dict[str, Any] = {
+        "quantization": snapshot.quantization,
+        "count": snapshot.count,
+        "float32_bytes": float32_bytes,
+        "quantized_bytes": float32_bytes,
+        "bytes_saved": 0,
+        "recall_at_k_scan": 1.0,
+        "recall_at_k_reranked": 1.0,
+        "k": k
+    }
+    if snapshot.codes is None or snapshot.count == 0:
+        return report
+
+    quantized_bytes = snapshot.codes.size * snapshot.codes.dtype.itemsize
+    if snapshot.scales is not None:
+        quantized_bytes += snapshot.scales.size * 4
+    report["quantized_bytes"] = int(quantized_bytes)
+    report["bytes_saved"] = int(float32_bytes - quantized_bytes)
+
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(snapshot.count, size=min(n_queries, snapshot.count), replace=False)
+    scan_hits = rerank_hits = total = 0
+    for row in sample:
+        query = np.asarray(snapshot.vectors[row], dtype=np.float32)
+        query = query + rng.normal(scale=0.05 * float(np.abs(query).mean() or 1.0), size=query.shape).astype(np.float32)
+        truth = set(snapshot.search_rows(query, k, store.rerank_factor, exact=True)[0].tolist())
+        scan = set(_top_rows(snapshot.approximate_distances(query), k).tolist())
+        reranked = set(snapshot.search_rows(query, k, store.rerank_factor)[0].tolist())
+        scan_hits += len(truth & scan)
+        rerank_hits += len(truth & reranked)
+        total += len(truth)
+
+    report["recall_at_k_scan"] = scan_hits / total if total else 1.0
+    report["recall_at_k_reranked"] = rerank_hits / total if total else 1.0
+    return report
+
+
+def _remove_stale_generations(persist_directory: str, oldest_kept: int) -> None:
+    """Best-effort cleanup of files from generations before oldest_kept (may still be mapped on Windows)."""
+    for name in os.listdir(persist_directory):
+        parts = name.split(".")
+        if len(parts) == 3 and parts[0] in ("vectors", "norms", "docs", "offsets", "codes", "scales") and parts[1].isdigit():
+            if int(parts[1]) < oldest_kept:
+                try:
+                    os.remove(os.path.join(persist_directory, name))
+                except OSError:
+                    pass
+
+
+__all__ = [
+    "FlatVectorStore", "is_flat_store", "search_flat_stores", "quantize", "quantization_report",
+    "MANIFEST_NAME", "QUANTIZATION_NONE", "QUANTIZATION_FLOAT16", "QUANTIZATION_INT8"
+]
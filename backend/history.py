@@ -0,0 +1,164 @@
+# backend/history.py
+from typing import Any, Dict, List, MutableMapping, Sequence, Tuple
+from backend.logger import logger
+from backend import settings
+from backend.rate_limiter import RATE_LIMIT_MESSAGE
+from backend.task_queue import chat_queue, PRIORITY_BACKGROUND
+from backend.token_counter import count_message_tokens, truncate_to_tokens
+
+# Session-state keys
+SUMMARY_KEY = "history_summary"          # {"text": str, "covered": int}
+SUMMARY_JOB_KEY = "history_summary_job"  # {"handle": TaskHandle, "covered": int}
+
+_SUMMARY_INSTRUCTIONS = (
+    "You maintain a running summary of a conversation between a user and an HR document assistant. "
+    "Merge the new turns into the current summary. Keep facts, figures, names, documents referred to, "
+    "the user's preferences and any open questions; drop pleasantries. Answer with the updated summary only."
+)
+
+
+def _turn(message: Dict[str, Any]) -> Dict[str, str]:
+    """Only what is sent to the model (history entries may also carry a "figure")."""
+    return {"role": message["role"], "content": message["content"]}
+
+
+class HistoryManager:
+    """
+    Keeps the prompt size of a chat turn bounded however long the conversation gets.
+
+    The most recent turns are sent verbatim, newest first, for as long as they fit
+    in token_budget. Turns that fall out of that window are folded into a rolling
+    summary by a background-priority chat request; it is started after a reply has
+    been shown and collected on a later turn, so it never delays an answer. Until
+    it lands, the turns it will cover are still sent verbatim. Summary and pending
+    request live in the Streamlit session state.
+    """
+    def __init__(self, token_budget: int, summary_enabled: bool, summary_max_tokens: int, summary_input_tokens: int):
+        self.token_budget = token_budget
+        self.summary_enabled = summary_enabled
+        self.summary_max_tokens = summary_max_tokens
+        self.summary_input_tokens = summary_input_tokens
+
+    @staticmethod
+    def _fit(history: Sequence[Dict[str, Any]], budget: int) -> int:
+        """Index of the oldest message from which the rest of history fits in budget tokens."""
+        used = 0
+        start = len(history)
+        for i in range(len(history) - 1, -1, -1):
+            cost = count_message_tokens([history[i]], reply_priming=False)
+            if used + cost > budget:
+                break
+            used += cost
+            start = i
+        # Don't open the window with an answer whose question was cut off
+        if 0 < start < len(history) and history[start]["role"] == "assistant":
+            start += 1
+        return start
+
+    def _split(self, history: Sequence[Dict[str, Any]]) -> Tuple[Sequence[Dict[str, Any]], Sequence[Dict[str, Any]]]:
+        """(older turns, recent window within the token budget)."""
+        start = self._fit(history, self.token_budget)
+        return history[:start], history[start:]
+
+    def _collect(self, state: MutableMapping[str, Any]) -> None:
+        """Adopts a finished summary request; failed or refused ones are dropped and retried later."""
+        job = state.get(SUMMARY_JOB_KEY)
+        if job is None or not job["handle"].done:
+            return
+        del state[SUMMARY_JOB_KEY]
+        handle = job["handle"]
+        if handle.error is not None or handle.value in (None, RATE_LIMIT_MESSAGE, settings.FALLBACK_MESSAGE):
+            logger.warning("HISTORY | summary request failed: {}", handle.error or handle.value)
+            return
+        state[SUMMARY_KEY] = {"text": handle.value.strip(), "covered": job["covered"]}
+        logger.info("HISTORY | summary now covers {} message(s)", job["covered"])
+
+    def _summary(self, state: MutableMapping[str, Any], history: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+        summary = state.get(SUMMARY_KEY)
+        if summary is None or summary["covered"] > len(history):
+            # No summary yet, or the conversation was cleared
+            return {"text": "", "covered": 0}
+        return summary
+
+    def build_messages(
+        self,
+        state: MutableMapping[str, Any],
+        system_message: Dict[str, Any],
+        history: Sequence[Dict[str, Any]],
+        user_message: Dict[str, str]
+    ) -> List[Dict[str, str]]:
+        """
+        [system] + [summary of older turns] + recent turns + [user message].
+
+        The recent turns are those within the budget plus any older ones the summary
+        does not cover yet (it lags while its request runs), so no turn is left out;
+        the budget is exceeded only until the summary catches up. That backlog is
+        itself capped at summary_input_tokens (what one summary request folds in);
+        beyond it the omission is stated instead.
+        """
+        self._collect(state)
+        older, window = self._split(history)
+        messages = [_turn(system_message)]
+        summary = self._summary(state, history)
+        if self.summary_enabled:
+            if summary["text"]:
+                messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary['text']}"})
+            backlog = older[summary["covered"]:]
+            start = self._fit(backlog, self.summary_input_tokens)
+            if start:
+                messages.append({
+                    "role": "system",
+                    "content": f"({start} earlier message(s) are not shown; a summary of them is being prepared.)"
+                })
+            window = list(backlog[start:]) + list(window)
+        messages.extend(_turn(m) for m in window)
+        messages.append(user_message)
+        return messages
+
+    def schedule_summary(self, state: MutableMapping[str, Any], history: Sequence[Dict[str, Any]]) -> None:
+        """Starts folding turns that left the window into the summary (at most one request per session)."""
+        if not self.summary_enabled:
+            return
+        self._collect(state)
+        if SUMMARY_JOB_KEY in state:
+            return
+        older, _ = self._split(history)
+        summary = self._summary(state, history)
+        new_turns = list(older[summary["covered"]:])
+        if not new_turns:
+            return
+        # Oldest first, as many as one request folds in; the rest are picked up by the next one
+        used = 0
+        for end, message in enumerate(new_turns):
+            used += count_message_tokens([message], reply_priming=False)
+            if end and used > self.summary_input_tokens:
+                new_turns = new_turns[:end]
+                break
+
+        transcript = "\n\n".join(f"{m['role'].capitalize()}: {m['content']}" for m in new_turns)
+        messages = [
+            {"role": "system", "content": _SUMMARY_INSTRUCTIONS},
+            {
+                "role": "user",
+                "content": (
+                    f"Current summary:\n{summary['text'] or '(none)'}\n\n"
+                    f"New turns:\n{truncate_to_tokens(transcript, self.summary_input_tokens)}"
+                )
+            }
+        ]
+        handle = chat_queue.enqueue(
+            messages, temperature=0, max_tokens=self.summary_max_tokens, priority=PRIORITY_BACKGROUND
+        )
+        state[SUMMARY_JOB_KEY] = {"handle": handle, "covered": summary["covered"] + len(new_turns)}
+        logger.debug("HISTORY | summarizing {} message(s) in the background", len(new_turns))
+
+
+# Global singleton shared by all sessions (per-session data lives in session state)
+history_manager = HistoryManager(
+    token_budget=settings.HISTORY_TOKEN_BUDGET,
+    summary_enabled=settings.HISTORY_SUMMARY_ENABLED,
+    summary_max_tokens=settings.HISTORY_SUMMARY_MAX_TOKENS,
+    summary_input_tokens=settings.HISTORY_SUMMARY_INPUT_TOKENS
+)
+
+__all__ = ["history_manager", "HistoryManager", "SUMMARY_KEY", "SUMMARY_JOB_KEY"]
@@ -0,0 +1,251 @@
+# backend/ingest_cache.py
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from backend.logger import logger
+from backend import settings
+
+MANIFEST_NAME = "ingest_manifest.json"
+_HASH_CHUNK_BYTES = 1024 * 1024
+# Keys that point back up the page tree (hashing them would pull in every page)
+_SKIPPED_PDF_KEYS = {"/Parent", "/P", "/B", "/Annots", "/StructParents"}
+
+
+def file_hash(path: str) -> str:
+    """sha256 of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_CHUNK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _hash_pdf_object(obj: Any, digest: "hashlib._Hash", seen: set) -> None:
+    """Feeds a PDF object graph (decoded streams included) into digest, visiting each indirect object once."""
+    from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+    if isinstance(obj, IndirectObject):
+        ref = (obj.idnum, obj.generation)
+        if ref in seen:
+            digest.update(f"ref{ref}".encode())
+            return
+        seen.add(ref)
+        obj = obj.get_object()
+    if isinstance(obj, StreamObject):
+        digest.update(b"stream")
+        digest.update(obj.get_data())
+    if isinstance(obj, DictionaryObject):
+        digest.update(b"<<")
+        for key in sorted(obj.keys()):
+            if key in _SKIPPED_PDF_KEYS:
+                continue
+            digest.update(str(key).encode("utf-8"))
+            _hash_pdf_object(obj.get(key), digest, seen)
+        digest.update(b">>")
+    elif isinstance(obj, ArrayObject):
+        digest.update(b"[")
+        for item in obj:
+            _hash_pdf_object(item, digest, seen)
+        digest.update(b"]")
+    elif not isinstance(obj, StreamObject):
+        digest.update(repr(obj).encode("utf-8"))
+
+
+def pdf_page_hashes(pdf_path: str) -> List[str]:
+    """
+    Content hash of every page: the page dictionary with its content streams and
+    resources (fonts, images) decoded and hashed, so a page hashes the same in any
+    PDF that renders it identically, regardless of object numbering elsewhere.
+    """
+    from pypdf import PdfReader
+    reader = PdfReader(pdf_path)
+    hashes = []
+    for page in reader.pages:
+        digest = hashlib.sha256()
+        _hash_pdf_object(page, digest, set())
+        hashes.append(digest.hexdigest())
+    return hashes
+
+
+def read_manifest(persist_directory: str) -> Optional[Dict[str, Any]]:
+    """The ingest manifest of a vector DB, or None for stores built before incremental ingestion."""
+    try:
+        with open(os.path.join(persist_directory, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def write_manifest(persist_directory: str, manifest: Dict[str, Any]) -> None:
+    """Writes the manifest atomically; it is written last, so it only ever describes a finished ingest."""
+    path = os.path.join(persist_directory, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+
+class IngestCache:
+    """
+    Persistent (SQLite) content-addressed caches for ingestion:
+
+    - pages: extracted page text keyed by page content hash + extraction config,
+      so a page seen in any earlier upload is never rasterized or OCR'd again.
+    - embeddings: chunk vectors keyed by chunk text hash + embedding model.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.page_hits = 0
+        self.page_misses = 0
+        self.embedding_hits = 0
+        self.embedding_misses = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                key TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                extraction TEXT NOT NULL,
+                created REAL NOT NULL
+            )
+            """
+        )
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                created REAL NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+
+    # --- Pages ---
+
+    @staticmethod
+    def page_key(page_hash: str, config: str) -> str:
+        return hashlib.sha256(f"{page_hash}\0{config}".encode("utf-8")).hexdigest()
+
+    def get_pages(self, keys: Sequence[str]) -> Dict[str, Dict[str, str]]:
+        """Returns {key: {"text", "extraction"}} for the keys that are cached."""
+        found: Dict[str, Dict[str, str]] = {}
+        with self.lock:
+            for key in set(keys):
+                row = self.conn.execute("SELECT text, extraction FROM pages WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    found[key] = {"text": row[0], "extraction": row[1]}
+            self.page_hits += len(found)
+            self.page_misses += len(set(keys)) - len(found)
+        return found
+
+    def put_pages(self, entries: Dict[str, Dict[str, str]]) -> None:
+        now = time.time()
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?)",
+                [(key, e["text"], e["extraction"], now) for key, e in entries.items()]
+            )
+            self.conn.commit()
+
+    # --- Embeddings ---
+
+    @staticmethod
+    def embedding_key(text: str, model: str) -> str:
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_embeddings(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        with self.lock:
+            for key in set(keys):
+                row = self.conn.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    found[key] = np.frombuffer(row[0], dtype=np.float32).tolist()
+        return found
+
+    def put_embeddings(self, entries: Dict[str, Sequence[float]], model: str) -> None:
+        now = time.time()
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)",
+                [(key, model, np.asarray(v, dtype=np.float32).tobytes(), now) for key, v in entries.items()]
+            )
+            self.conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "pages": self.conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0],
+                "embeddings": self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0],
+                "page_hits": self.page_hits,
+                "page_misses": self.page_misses,
+                "embedding_hits": self.embedding_hits,
+                "embedding_misses": self.embedding_misses
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that only sends chunk texts it has never seen to the model;
+    vectors of previously embedded texts come from the IngestCache.
+    """
+    def __init__(self, inner: Embeddings, cache: IngestCache, model: str):
+        self.inner = inner
+        self.cache = cache
+        self.model = model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        texts = list(texts)
+        keys = [self.cache.embedding_key(t, self.model) for t in texts]
+        cached = self.cache.get_embeddings(keys)
+
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in cached:
+                missing.setdefault(key, text)
+        if missing:
+            vectors = self.inner.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            self.cache.put_embeddings(fresh, self.model)
+            cached.update(fresh)
+
+        self.cache.embedding_hits += len(texts) - len(missing)
+        self.cache.embedding_misses += len(missing)
+        logger.info("Embedding cache: {} of {} chunk(s) reused.", len(texts) - len(missing), len(texts))
+        return [list(cached[key]) for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.inner.embed_query(text)
+
+
+def _default_cache_path() -> str:
+    if settings.INGEST_CACHE_PATH:
+        return settings.INGEST_CACHE_PATH
+    try:
+        from backend.path_resolver import resource_path
+        return os.path.join(resource_path("dependencies"), "ingest_cache.sqlite3")
+    except FileNotFoundError:
+        return os.path.join(os.path.abspath("."), "ingest_cache.sqlite3")
+
+
+# Global singleton shared by all ingestion runs
+ingest_cache = IngestCache(_default_cache_path())
+
+__all__ = [
+    "ingest_cache", "IngestCache", "CachedEmbeddings", "MANIFEST_NAME",
+    "file_hash", "text_hash", "pdf_page_hashes", "read_manifest", "write_manifest"
+]
@@ -0,0 +1,196 @@
+# backend/ingest_jobs.py
+import os
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from backend.logger import logger
+from backend import settings
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+ACTIVE_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+_COLUMNS = [
+    "id", "status", "files", "stage", "stage_done", "stage_total", "detail",
+    "result", "error", "cancel_requested", "created", "updated"
+]
+
+
+class IngestJobManager:
+    """
+    Runs PDF ingestion (run_rag_pipeline) as background jobs.
+
+    Uploads are spooled to a persistent directory and every job is a row in a
+    SQLite table, so the Streamlit script thread only submits and polls. A bounded
+    thread pool runs the jobs; each reports its current stage and progress,
+    cancellation is cooperative (checked at every progress report), and jobs that
+    were queued or running when the process died are re-queued on start. Re-running
+    an interrupted job is cheap because ingestion is content-addressed.
+    """
+    def __init__(self, db_path: str, spool_root: str, workers: int):
+        self.db_path = db_path
+        self.spool_root = spool_root
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="ingest-worker")
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        os.makedirs(spool_root, exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                files TEXT NOT NULL,
+                stage TEXT,
+                stage_done INTEGER NOT NULL DEFAULT 0,
+                stage_total INTEGER NOT NULL DEFAULT 0,
+                detail TEXT,
+                result TEXT,
+                error TEXT,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS jobs_created ON jobs (created)")
+        self.conn.commit()
+        self.resume_interrupted()
+
+    # --- Table access ---
+
+    def _update(self, job_id: str, **fields: Any) -> None:
+        fields["updated"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self.lock:
+            self.conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+            self.conn.commit()
+
+    @staticmethod
+    def _row_to_job(row: Tuple) -> Dict[str, Any]:
+        job = dict(zip(_COLUMNS, row))
+        job["files"] = json.loads(job["files"])
+        job["result"] = json.loads(job["result"]) if job["result"] else []
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self.conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def list_jobs(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Most recent jobs first."""
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs ORDER BY created DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [self._row_to_job(r) for r in rows]
+
+    # --- Lifecycle ---
+
+    def submit(self, files: Sequence[Tuple[str, bytes]]) -> str:
+        """Spools (filename, content) pairs to disk and queues an ingestion job for them."""
+        job_id = uuid.uuid4().hex
+        spool_dir = os.path.join(self.spool_root, job_id)
+        os.makedirs(spool_dir)
+        names = []
+        for name, content in files:
+            name = os.path.basename(name)
+            with open(os.path.join(spool_dir, name), "wb") as f:
+                f.write(content)
+            names.append(name)
+
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO jobs (id, status, files, created, updated) VALUES (?, ?, ?, ?, ?)",
+                (job_id, JOB_QUEUED, json.dumps(names), now, now)
+            )
+            self.conn.commit()
+        logger.info("INGEST | queued job {} with {} file(s)", job_id, len(names))
+        self.executor.submit(self._run, job_id)
+        return job_id
+
+    def cancel(self, job_id: str) -> None:
+        """Requests cancellation; a running job stops at its next progress report."""
+        self._update(job_id, cancel_requested=1)
+
+    def is_cancel_requested(self, job_id: str) -> bool:
+        with self.lock:
+            row = self.conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def resume_interrupted(self) -> None:
+        """Re-queues jobs left queued/running by a previous process (crash or restart)."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created", ACTIVE_STATUSES
+            ).fetchall()
+        for (job_id,) in rows:
+            if not os.path.isdir(os.path.join(self.spool_root, job_id)):
+                self._update(job_id, status=JOB_FAILED, error="Spooled upload is missing; please upload again.")
+                continue
+            logger.info("INGEST | resuming interrupted job {}", job_id)
+            self._update(job_id, status=JOB_QUEUED)
+            self.executor.submit(self._run, job_id)
+
+    def _run(self, job_id: str) -> None:
+        # Imported here so the job table can be inspected without loading the OCR/embedding stack
+        from backend.ocr import run_rag_pipeline, IngestCancelled
+
+        spool_dir = os.path.join(self.spool_root, job_id)
+        if self.is_cancel_requested(job_id):
+            self._finish(job_id, spool_dir, status=JOB_CANCELLED)
+            return
+        self._update(job_id, status=JOB_RUNNING)
+
+        def progress(stage: str, done: int, total: int, detail: str) -> None:
+            self._update(job_id, stage=stage, stage_done=done, stage_total=total, detail=detail)
+
+        try:
+            paths = run_rag_pipeline(spool_dir, progress=progress, cancel=lambda: self.is_cancel_requested(job_id))
+        except IngestCancelled:
+            logger.info("INGEST | job {} cancelled", job_id)
+            self._finish(job_id, spool_dir, status=JOB_CANCELLED)
+        except Exception as e:
+            logger.error("INGEST | job {} failed: {}", job_id, e)
+            self._finish(job_id, spool_dir, status=JOB_FAILED, error=str(e))
+        else:
+            logger.info("INGEST | job {} completed: {}", job_id, paths)
+            self._finish(job_id, spool_dir, status=JOB_COMPLETED, result=json.dumps([os.path.basename(p) for p in paths]))
+
+    def _finish(self, job_id: str, spool_dir: str, **fields: Any) -> None:
+        self._update(job_id, **fields)
+        shutil.rmtree(spool_dir, ignore_errors=True)
+
+
+def _default_path(name: str) -> str:
+    try:
+        from backend.path_resolver import resource_path
+        return os.path.join(resource_path("dependencies"), name)
+    except FileNotFoundError:
+        return os.path.join(os.path.abspath("."), name)
+
+
+# Global singleton shared by all sessions
+ingest_jobs = IngestJobManager(
+    db_path=settings.INGEST_JOBS_PATH or _default_path("ingest_jobs.sqlite3"),
+    spool_root=settings.INGEST_SPOOL_DIR or _default_path("ingest_spool"),
+    workers=settings.INGEST_WORKERS
+)
+
+__all__ = [
+    "ingest_jobs", "IngestJobManager",
+    "JOB_QUEUED", "JOB_RUNNING", "JOB_COMPLETED", "JOB_FAILED", "JOB_CANCELLED", "ACTIVE_STATUSES"
+]
@@ -0,0 +1,120 @@
+# backend/ingest_pipeline.py
+import queue
+import threading
+from typing import Any, Callable, Iterable, List, Sequence
+
+# Marks the end of the stream on every queue
+_END = object()
+_POLL_SEC = 0.1
+
+Emit = Callable[[Any], None]
+
+
+class _Stopped(Exception):
+    """Internal: another stage failed, unwind this one."""
+
+
+class Stage:
+    """
+    One step of a streaming pipeline, run in its own thread.
+    process() handles one item and emit()s any number of items downstream.
+    """
+    name = "stage"
+
+    def process(self, item: Any, emit: Emit) -> None:
+        emit(item)
+
+    def idle(self, emit: Emit) -> None:
+        """Called when the input queue is empty, before blocking (e.g. to flush a partial batch)."""
+
+    def close(self, emit: Emit) -> None:
+        """Called once after the last item (flush anything still buffered)."""
+
+
+def run_pipeline(source: Iterable[Any], stages: Sequence[Stage], queue_size: int) -> None:
+    """
+    Runs source -> stages[0] -> ... -> stages[-1] with every step in its own thread,
+    joined by bounded queues. A full queue blocks the step feeding it, so a slow
+    stage (e.g. embedding) throttles the ones before it (e.g. OCR) instead of
+    letting work pile up in memory.
+
+    The first exception raised by the source or any stage stops every step and is
+    re-raised here once all threads have exited.
+    """
+    stop = threading.Event()
+    errors: List[BaseException] = []
+    queues = [queue.Queue(maxsize=max(queue_size, 1)) for _ in stages]
+
+    def put(q: "queue.Queue[Any]", item: Any) -> None:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=_POLL_SEC)
+                return
+            except queue.Full:
+                continue
+        raise _Stopped()
+
+    def get(q: "queue.Queue[Any]", stage: Stage, emit: Emit) -> Any:
+        try:
+            return q.get_nowait()
+        except queue.Empty:
+            stage.idle(emit)
+        while not stop.is_set():
+            try:
+                return q.get(timeout=_POLL_SEC)
+            except queue.Empty:
+                continue
+        raise _Stopped()
+
+    def fail(error: BaseException) -> None:
+        if not isinstance(error, _Stopped):
+            errors.append(error)
+        stop.set()
+
+    def run_source() -> None:
+        try:
+            for item in source:
+                put(queues[0], item)
+            put(queues[0], _END)
+        except Exception as e:
+            fail(e)
+        finally:
+            # Let generator sources release what they hold (e.g. an OCR process pool)
+            close = getattr(source, "close", None)
+            if close:
+                close()
+
+    def run_stage(index: int) -> None:
+        stage = stages[index]
+        downstream = queues[index + 1] if index + 1 < len(stages) else None
+
+        def emit(item: Any) -> None:
+            if downstream is not None:
+                put(downstream, item)
+
+        try:
+            while True:
+                item = get(queues[index], stage, emit)
+                if item is _END:
+                    stage.close(emit)
+                    if downstream is not None:
+                        put(downstream, _END)
+                    return
+                stage.process(item, emit)
+        except Exception as e:
+            fail(e)
+
+    threads = [threading.Thread(target=run_source, name="ingest-source", daemon=True)]
+    threads += [
+        threading.Thread(target=run_stage, args=(i,), name=f"ingest-{stage.name}", daemon=True)
+        for i, stage in enumerate(stages)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if errors:
+        raise errors[0]
+
+
+__all__ = ["Stage", "run_pipeline"]
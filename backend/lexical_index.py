@@ -0,0 +1,139 @@
+# backend/lexical_index.py
+import os
+import re
+import json
+import math
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from langchain_core.documents import Document
+from backend.logger import logger
+from backend.store_registry import directory_signature
+
+# BM25 index persisted next to the vectors of each DB
+INDEX_NAME = "bm25_index.json"
+
+# Lower-cased alphanumeric tokens; keeps years ("2022") and codes ("hra") intact
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Inverted-index Okapi BM25 over the chunks of one vector DB.
+    Stores the chunk texts and metadata so hits come back as Documents without
+    touching the vector store.
+    """
+    def __init__(self, texts: List[str], metadatas: List[Dict[str, Any]], postings: Dict[str, List[List[int]]],
+                 doc_lengths: List[int], k1: float = 1.5, b: float = 0.75):
+        self.texts = texts
+        self.metadatas = metadatas
+        self.postings = postings
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.avg_length = (sum(doc_lengths) / len(doc_lengths)) if doc_lengths else 0.0
+        n = len(texts)
+        # BM25+ style idf that never goes negative for very common terms
+        self.idf = {term: math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5)) for term, plist in postings.items()}
+
+    @classmethod
+    def build(cls, texts: Sequence[str], metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+              k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        texts = list(texts)
+        metadatas = list(metadatas) if metadatas else [{} for _ in texts]
+        postings: Dict[str, List[List[int]]] = defaultdict(list)
+        doc_lengths: List[int] = []
+        for i, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings[term].append([i, tf])
+        return cls(texts, [dict(m or {}) for m in metadatas], dict(postings), doc_lengths, k1, b)
+
+    def save(self, persist_directory: str) -> None:
+        payload = {
+            "texts": self.texts,
+            "metadatas": self.metadatas,
+            "postings": self.postings,
+            "doc_lengths": self.doc_lengths
+        }
+        tmp_path = os.path.join(persist_directory, INDEX_NAME + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(persist_directory, INDEX_NAME))
+
+    @classmethod
+    def load(cls, persist_directory: str, k1: float = 1.5, b: float = 0.75) -> Optional["BM25Index"]:
+        path = os.path.join(persist_directory, INDEX_NAME)
+        if not os.path.isfile(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+        return cls(payload["texts"], payload["metadatas"], payload["postings"], payload["doc_lengths"], k1, b)
+
+    def search(self, query: str, k: int) -> List[Tuple[Document, float]]:
+        """Returns the top-k (document, BM25 score) pairs for the query, best first."""
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            idf = self.idf[term]
+            for doc_idx, tf in plist:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_idx] / (self.avg_length or 1.0))
+                scores[doc_idx] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [
+            (Document(page_content=self.texts[i], metadata=dict(self.metadatas[i])), score)
+            for i, score in best
+        ]
+
+
+def build_lexical_index(persist_directory: str, documents: Sequence[Document], k1: float = 1.5, b: float = 0.75) -> BM25Index:
+    """Builds and saves the BM25 index for the chunks written to a vector DB."""
+    index = BM25Index.build([d.page_content for d in documents], [d.metadata for d in documents], k1, b)
+    index.save(persist_directory)
+    return index
+
+
+class LexicalIndexCache:
+    """
+    Process-wide cache of loaded BM25 indexes, keyed by DB directory signature.
+    Stores ingested before hybrid search existed have no index (dense results
+    only) until backfill_side_indexes runs at the next ingestion; nothing is
+    built or written on the query path.
+    """
+    def __init__(self, root: str, k1: float, b: float):
+        self.root = root
+        self.k1 = k1
+        self.b = b
+        self.indexes: Dict[str, Tuple[Optional[float], Optional[BM25Index]]] = {}
+        self.lock = threading.Lock()
+
+    def get(self, db_name: str, store: Any) -> Optional[BM25Index]:
+        db_path = os.path.join(self.root, db_name)
+        signature = directory_signature(db_path)
+        with self.lock:
+            cached = self.indexes.get(db_name)
+            if cached is not None and cached[0] == signature:
+                return cached[1]
+
+        index = None
+        try:
+            index = BM25Index.load(db_path, self.k1, self.b)
+            if index is None:
+                logger.info("No BM25 index for vector store '{}'; dense results only.", db_name)
+        except Exception as e:
+            logger.warning("BM25 index unavailable for '{}': {}", db_name, e)
+
+        with self.lock:
+            self.indexes[db_name] = (signature, index)
+        return index
+
+
+__all__ = ["BM25Index", "LexicalIndexCache", "build_lexical_index", "tokenize", "INDEX_NAME"]
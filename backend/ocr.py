@@ -1,14 +1,25 @@
 import os
 import datetime
 import re
-from pdf2image import convert_from_path
+import shutil
 import pytesseract
 from tqdm import tqdm
 from langchain_community.document_loaders import DirectoryLoader, TextLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import SentenceTransformerEmbeddings
 from langchain_community.vectorstores import Chroma
-import tempfile
+from langchain_core.documents import Document
+from typing import Callable, TypedDict
+from backend import settings
+from backend.flat_index import FlatVectorStore, is_flat_store, quantization_report
+from backend.store_router import write_store_summary, SUMMARY_NAME
+from backend.lexical_index import build_lexical_index, INDEX_NAME
+from backend.embedding_service import get_embedding_service
+from backend.parallel_ocr import ParallelOCREngine, TESSERACT_CONFIG
+from backend.ingest_cache import (
+    ingest_cache, CachedEmbeddings, file_hash, text_hash, pdf_page_hashes, read_manifest, write_manifest
+)
+from backend.ingest_pipeline import Stage, run_pipeline
+from backend.text_layer import extract_text_layer, has_usable_text_layer, EXTRACTION_TEXT_LAYER, EXTRACTION_OCR
 # Assuming resource_path is defined elsewhere, keeping the structure
 # from backend.path_resolver import resource_path 
 
@@ -25,34 +36,240 @@ except ImportError:
 POPPLER_BIN_PATH = resource_path('dependencies/poppler-25.07.0/Library/bin')
 pytesseract.pytesseract.tesseract_cmd = resource_path('dependencies/Tesseract-OCR/tesseract.exe')
 
+# Page-parallel OCR over a process pool (bounded by a memory ceiling)
+# poppler_path is passed to ensure compatibility with Windows environments
+ocr_engine = ParallelOCREngine(
+    workers=settings.OCR_WORKERS,
+    max_memory_mb=settings.OCR_MAX_MEMORY_MB,
+    dpi=settings.OCR_DPI,
+    poppler_path=POPPLER_BIN_PATH,
+    tesseract_cmd=pytesseract.pytesseract.tesseract_cmd,
+    raster_window=settings.RASTER_WINDOW_PAGES,
+    raster_to_disk=settings.RASTER_TO_DISK
+)
 
-# --- PART 1: OCR PROCESSING (Now processes a single file) ---
-def process_single_pdf_to_text(pdf_path: str, text_output_directory: str) -> str:
+
+# Stages reported through run_rag_pipeline's progress callback, in order.
+# Pages are rendered and OCR'd together in the worker processes, so rasterization
+# is reported as part of the OCR stage.
+STAGE_EXTRACT = "extract"   # hashing, page cache lookup, text-layer extraction
+STAGE_OCR = "ocr"           # rasterize + OCR of the pages that need it
+STAGE_CHUNK = "chunk"
+STAGE_EMBED = "embed"
+STAGE_PERSIST = "persist"
+STAGES = [STAGE_EXTRACT, STAGE_OCR, STAGE_CHUNK, STAGE_EMBED, STAGE_PERSIST]
+
+# start_index lets the context packer merge overlapping neighbours at query time
+text_splitter = RecursiveCharacterTextSplitter(chunk_size=1500, chunk_overlap=500, add_start_index=True)
+
+# (stage, done, total, detail)
+StageProgress = Callable[[str, int, int, str], None]
+
+
+class IngestCancelled(Exception):
+    """Raised inside the pipeline once its job has been cancelled."""
+
+
+def _tqdm_progress(desc: str):
+    """Returns (bar, callback) reporting per-page OCR progress through tqdm."""
+    bar = tqdm(desc=desc, unit="page")
+
+    def callback(done: int, total: int, filename: str, page: int) -> None:
+        bar.total = total
+        bar.set_postfix_str(f"{filename} p.{page}")
+        bar.update(done - bar.n)
+
+    return bar, callback
+
+
+# --- PART 1: TEXT EXTRACTION (text layer first, OCR for the rest) ---
+class PageRecord(TypedDict):
+    page: int          # 1-based page number
+    text: str
+    extraction: str    # EXTRACTION_TEXT_LAYER or EXTRACTION_OCR
+
+
+# Events yielded by iter_extracted_pages
+EVENT_PAGE = "page"        # (EVENT_PAGE, pdf_path, PageRecord)
+EVENT_END = "end"          # (EVENT_END, pdf_path, page_count): every page of the PDF has been yielded
+EVENT_FAILED = "failed"    # (EVENT_FAILED, pdf_path, error): no further events for that PDF
+
+
+def iter_extracted_pages(
+    pdf_paths: list[str],
+    progress=None,
+    cached_pages: dict[str, list[PageRecord | None]] | None = None
+):
+    """
+    Streams the text of every page of every PDF as soon as it is available.
+
+    Cached pages and pages with a usable embedded text layer (enough characters,
+    not garbled) are yielded first; only image-only or garbled pages are rasterized
+    and OCR'd, all PDFs together over the OCR process pool, and yielded as each
+    page finishes (so not necessarily in page order).
+
+    Args:
+        pdf_paths (list[str]): The PDF files to extract.
+        progress: Optional (done, total, filename, page) callback for the OCR pages.
+        cached_pages: Optional {pdf_path: [PageRecord or None per page]} of pages
+                      already extracted in an earlier run; those are reused as is.
+
+    Yields:
+        tuple: (EVENT_PAGE, pdf_path, PageRecord), (EVENT_END, pdf_path, page_count)
+               or (EVENT_FAILED, pdf_path, error).
+    """
+    cached_pages = cached_pages or {}
+    page_counts: dict[str, int] = {}
+    ocr_subsets: dict[str, list[int]] = {}
+    need_ocr: list[str] = []
+    sources: dict[str, dict[str, int]] = {p: {"cache": 0, EXTRACTION_TEXT_LAYER: 0, EXTRACTION_OCR: 0} for p in pdf_paths}
+
+    def end(pdf_path: str):
+        counts = sources[pdf_path]
+        print(
+            f"{os.path.basename(pdf_path)}: {counts['cache']} page(s) from the cache, "
+            f"{counts[EXTRACTION_TEXT_LAYER]} from the text layer, {counts[EXTRACTION_OCR]} OCR'd"
+        )
+        return EVENT_END, pdf_path, page_counts[pdf_path]
+
+    for pdf_path in pdf_paths:
+        known = cached_pages.get(pdf_path) or []
+        layer = None
+        if settings.TEXT_LAYER_ENABLED and not (known and all(record is not None for record in known)):
+            try:
+                layer = extract_text_layer(pdf_path)
+            except Exception as e:
+                print(f"Could not read the text layer of {os.path.basename(pdf_path)}, OCR'ing all pages: {e}")
+        if layer is None and not known:
+            need_ocr.append(pdf_path)  # OCR every page
+            continue
+
+        page_counts[pdf_path] = len(layer) if layer is not None else len(known)
+        subset = []
+        for page in range(1, page_counts[pdf_path] + 1):
+            if page <= len(known) and known[page - 1] is not None:
+                sources[pdf_path]["cache"] += 1
+                yield EVENT_PAGE, pdf_path, known[page - 1]
+            elif layer is not None and has_usable_text_layer(
+                layer[page - 1], settings.TEXT_LAYER_MIN_CHARS, settings.TEXT_LAYER_MIN_QUALITY
+            ):
+                sources[pdf_path][EXTRACTION_TEXT_LAYER] += 1
+                yield EVENT_PAGE, pdf_path, {"page": page, "text": layer[page - 1], "extraction": EXTRACTION_TEXT_LAYER}
+            else:
+                subset.append(page)
+        if subset:
+            ocr_subsets[pdf_path] = subset
+            need_ocr.append(pdf_path)
+        else:
+            # Text layer (or cache) covers every page: Poppler/Tesseract are never touched
+            yield end(pdf_path)
+
+    if not need_ocr:
+        return
+    counts, jobs, errors, page_bytes = ocr_engine.plan_jobs(need_ocr, pages=ocr_subsets)
+    for pdf_path, error in errors.items():
+        yield EVENT_FAILED, pdf_path, error
+    remaining = {pdf_path: 0 for pdf_path in counts}
+    for pdf_path, _ in jobs:
+        remaining[pdf_path] += 1
+    for pdf_path, count in counts.items():
+        page_counts.setdefault(pdf_path, count)
+        if not remaining[pdf_path]:
+            yield end(pdf_path)
+
+    failed = set()
+    done = 0
+    for pdf_path, page, text, error in ocr_engine.iter_results(jobs, page_bytes):
+        done += 1
+        if progress:
+            progress(done, len(jobs), os.path.basename(pdf_path), page)
+        if pdf_path in failed:
+            continue
+        if error is not None:
+            failed.add(pdf_path)
+            yield EVENT_FAILED, pdf_path, error
+            continue
+        sources[pdf_path][EXTRACTION_OCR] += 1
+        yield EVENT_PAGE, pdf_path, {"page": page, "text": text or "", "extraction": EXTRACTION_OCR}
+        remaining[pdf_path] -= 1
+        if not remaining[pdf_path]:
+            yield end(pdf_path)
+
+
+def extract_pdf_pages(
+    pdf_paths: list[str],
+    progress=None,
+    cached_pages: dict[str, list[PageRecord | None]] | None = None
+) -> tuple[dict[str, list[PageRecord]], dict[str, Exception]]:
+    """
+    Extracts the text of every page of every PDF (see iter_extracted_pages).
+
+    Returns:
+        tuple: ({pdf_path: [PageRecord in page order]}, {pdf_path: error}).
+    """
+    collected: dict[str, dict[int, PageRecord]] = {}
+    pages: dict[str, list[PageRecord]] = {}
+    errors: dict[str, Exception] = {}
+    for event, pdf_path, value in iter_extracted_pages(pdf_paths, progress=progress, cached_pages=cached_pages):
+        if event == EVENT_PAGE:
+            collected.setdefault(pdf_path, {})[value["page"]] = value
+        elif event == EVENT_FAILED:
+            errors[pdf_path] = value
+            collected.pop(pdf_path, None)
+        else:
+            records = collected.pop(pdf_path, {})
+            pages[pdf_path] = [
+                records.get(page, {"page": page, "text": "", "extraction": EXTRACTION_OCR})
+                for page in range(1, value + 1)
+            ]
+    return pages, errors
+
+
+def page_documents(pdf_path: str, pages: list[PageRecord]) -> list[Document]:
+    """One Document per page, tagged with its source file, page number and extraction path."""
+    filename = os.path.basename(pdf_path)
+    return [
+        Document(
+            page_content=f"--- Source File: {filename} | Page {record['page']} ---\n\n{record['text']}",
+            metadata={"source": filename, "page": record["page"], "extraction": record["extraction"]}
+        )
+        for record in pages
+    ]
+
+
+def process_single_pdf_to_text(pdf_path: str, text_output_directory: str, pages: list[PageRecord] | None = None) -> str:
     """
-    Converts a single PDF file to a text file using OCR.
+    Converts a single PDF file to a text file, using the embedded text layer where
+    it is usable and OCR for the remaining pages.
 
     Args:
         pdf_path (str): The path to the single PDF file.
         text_output_directory (str): The path where the extracted .txt file will be saved.
+        pages (list[PageRecord] | None): Already extracted pages (e.g. from a batch run
+                                         over all uploaded PDFs). When None, the pages
+                                         are extracted here.
         
     Returns:
         str: The full path to the generated .txt file.
     """
     filename = os.path.basename(pdf_path)
-    print(f"Starting OCR process for: {filename}")
+    print(f"Starting text extraction for: {filename}")
 
     try:
-        # Convert PDF to a list of PIL images
-        # poppler_path is passed to ensure compatibility with Windows environments
-        pil_pages = convert_from_path(pdf_path, dpi=300, poppler_path=POPPLER_BIN_PATH)
+        if pages is None:
+            bar, progress = _tqdm_progress(f"OCR for {filename}")
+            try:
+                results, errors = extract_pdf_pages([pdf_path], progress=progress)
+            finally:
+                bar.close()
+            if pdf_path in errors:
+                raise errors[pdf_path]
+            pages = results[pdf_path]
 
         all_text = []
-        # Process each page with OCR
-        for i, page_image in enumerate(tqdm(pil_pages, desc=f"OCR for {filename}")):
-            # Tesseract config for best results on a variety of documents
-            text = pytesseract.image_to_string(page_image, config='--oem 3 --psm 3')
-            all_text.append(f"\n\n--- Source File: {filename} | Page {i+1} ---\n\n")
-            all_text.append(text)
+        for record in pages:
+            all_text.append(f"\n\n--- Source File: {filename} | Page {record['page']} ---\n\n")
+            all_text.append(record["text"])
 
         # Save the extracted text to a .txt file
         txt_filename = os.path.splitext(filename)[0] + ".txt"
@@ -69,7 +286,6 @@ def process_single_pdf_to_text(pdf_path: str, text_output_directory: str) -> str
 
 # --- PART 2: EMBEDDING GENERATION ---
 def generate_embeddings(text_content_directory: str, vector_db_name: str) -> str:
-    BASE_VECTOR_DB_PATH = resource_path("dependencies/vector_db")
     """
     Loads text documents (expected to be a single file), splits them, 
     generates embeddings, and persists the vector store under the given name.
@@ -80,59 +296,555 @@ def generate_embeddings(text_content_directory: str, vector_db_name: str) -> str
         vector_db_name (str): The desired name for the persistence directory.
 
     Returns:
-        str: The path to the persisted Chroma vector store directory.
+        str: The path to the persisted vector store directory.
     """
-    print("Starting embedding generation...")
-    # 1. Load documents
     loader = DirectoryLoader(
         text_content_directory,
         glob="*.txt",
         loader_cls=TextLoader,
         loader_kwargs={"encoding": "utf-8"}
     )
-    data = loader.load()
-    if not data:
-        raise ValueError("No text documents were loaded. Check the input directory and file types.")
+    return generate_embeddings_from_documents(loader.load(), vector_db_name)
+
+
+def assign_chunk_ids(docs: list[Document]) -> list[str]:
+    """
+    Content-addressed chunk IDs (source, page and text), stored in metadata["chunk_id"].
+    Unchanged chunks keep their ID across re-ingestion, so only changed ones are written.
+    """
+    ids = []
+    seen: dict[str, int] = {}
+    for doc in docs:
+        base = text_hash(f"{doc.metadata.get('source')}\0{doc.metadata.get('page')}\0{doc.page_content}")
+        seen[base] = seen.get(base, 0) + 1
+        # Identical chunks on the same page (repeated boilerplate) still need distinct IDs
+        chunk_id = base if seen[base] == 1 else f"{base}-{seen[base]}"
+        doc.metadata["chunk_id"] = chunk_id
+        ids.append(chunk_id)
+    return ids
 
-    # 2. Split documents
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1500, chunk_overlap=500)
-    docs = text_splitter.split_documents(data)
 
-    # 3. Initialize Embeddings Model
+def _open_vector_store(persist_directory: str, embedding_function):
+    """Opens an existing store with the backend it was written with."""
+    if is_flat_store(persist_directory):
+        return FlatVectorStore(persist_directory, embedding_function, rerank_factor=settings.FLAT_INDEX_RERANK_FACTOR)
+    return Chroma(persist_directory=persist_directory, embedding_function=embedding_function)
+
+
+def _vector_db_directory(vector_db_name: str) -> str:
+    # Sanitizing again just in case, though it should be clean from the caller
+    safe_db_name = re.sub(r'[^\w\-]', '_', vector_db_name)
+    return os.path.join(resource_path("dependencies/vector_db"), safe_db_name)
+
+
+def _ingest_embeddings() -> CachedEmbeddings:
+    """
+    The shared embedding service (the model is loaded once per process), behind the
+    chunk-embedding cache so previously embedded texts are not re-embedded.
+    """
     model_path =resource_path('dependencies/embeddinggemma-300m')
     if not os.path.exists(model_path):
         raise FileNotFoundError(f"Embedding model not found at '{model_path}'. Please ensure the model is in the correct directory.")
-    embedding_function = SentenceTransformerEmbeddings(model_name=model_path)
+    return CachedEmbeddings(get_embedding_service(), ingest_cache, os.path.basename(model_path))
 
-    # 4. Define persistence directory using the generated name (unique per file)
-    # Sanitizing again just in case, though it should be clean from the caller
-    safe_db_name = re.sub(r'[^\w\-]', '_', vector_db_name)
-    persist_directory = os.path.join(BASE_VECTOR_DB_PATH, safe_db_name) 
-    
-    # 5. Create and persist the vector store
-    print(f"Creating vector store in '{persist_directory}'...")
-    vectorstore = Chroma.from_documents(
+
+def _create_vector_store(persist_directory: str, docs: list[Document], ids: list[str], embedding_function):
+    """Writes a new store with settings.VECTOR_BACKEND (Chroma or flat memory-mapped index)."""
+    print(f"Creating {settings.VECTOR_BACKEND} vector store in '{persist_directory}'...")
+    if settings.VECTOR_BACKEND == "flat":
+        vectorstore = FlatVectorStore.from_documents(
+            documents=docs,
+            embedding=embedding_function,
+            ids=ids,
+            persist_directory=persist_directory,
+            quantization=settings.FLAT_INDEX_QUANTIZATION,
+            rerank_factor=settings.FLAT_INDEX_RERANK_FACTOR
+        )
+        if vectorstore.codes is not None:
+            report = quantization_report(vectorstore)
+            print(
+                f"Quantization ({report['quantization']}): {report['bytes_saved'] / 2**20:.2f} MiB saved "
+                f"({report['quantized_bytes']} vs {report['float32_bytes']} bytes), "
+                f"recall@{report['k']} scan={report['recall_at_k_scan']:.3f} "
+                f"reranked={report['recall_at_k_reranked']:.3f}"
+            )
+        return vectorstore
+    return Chroma.from_documents(
         documents=docs,
         embedding=embedding_function,
+        ids=ids,
         persist_directory=persist_directory
     )
+
+
+def _finalize_vector_store(persist_directory: str, vectorstore, docs: list[Document], manifest: dict, changed: bool) -> None:
+    """Rebuilds the per-store side indexes when the contents changed, then records the manifest."""
     vectorstore.persist()
     print("Vector store persisted successfully.")
 
+    if changed:
+        # Persist the BM25 lexical index next to the vectors (hybrid retrieval)
+        try:
+            build_lexical_index(persist_directory, docs, k1=settings.BM25_K1, b=settings.BM25_B)
+        except Exception as e:
+            print(f"Warning: Could not write BM25 index for '{persist_directory}': {e}")
+
+        # Save the routing summary (centroid + medoids) used to skip irrelevant DBs
+        try:
+            write_store_summary(persist_directory, vectorstore, settings.ROUTER_MEDOIDS)
+        except Exception as e:
+            print(f"Warning: Could not write routing summary for '{persist_directory}': {e}")
+
+    # Record what the store now contains (written last: a crash leaves the old manifest)
+    write_manifest(persist_directory, {**manifest, "chunk_ids": [doc.metadata["chunk_id"] for doc in docs]})
+
+
+def generate_embeddings_from_documents(
+    data: list[Document],
+    vector_db_name: str,
+    manifest: dict | None = None,
+    progress: StageProgress | None = None
+) -> str:
+    """
+    Splits documents (e.g. one per PDF page), generates embeddings, and persists
+    the vector store under the given name. Chunk metadata (source, page,
+    extraction path) is carried over from the documents.
+
+    If the store already exists it is updated in place: chunks whose content-addressed
+    ID is already stored are left alone, stale ones are deleted and only new ones are
+    embedded (through the chunk-embedding cache) and added.
+
+    Args:
+        data (list[Document]): The documents to index.
+        vector_db_name (str): The desired name for the persistence directory.
+        manifest (dict | None): File-level details (file hash, page hashes) to record
+                                in the store's ingest manifest.
+        progress (StageProgress | None): Called with (stage, done, total, detail) for the
+                                         chunk, embed and persist stages; may raise
+                                         IngestCancelled to stop between batches.
+
+    Returns:
+        str: The path to the persisted vector store directory (Chroma or flat
+             memory-mapped index, depending on settings.VECTOR_BACKEND).
+    """
+    print("Starting embedding generation...")
+    # 1. Check the documents
+    if not data:
+        raise ValueError("No text documents were loaded. Check the input directory and file types.")
+
+    # 2. Split documents
+    docs = text_splitter.split_documents(data)
+    chunk_ids = assign_chunk_ids(docs)
+    if progress:
+        progress(STAGE_CHUNK, len(docs), len(docs), vector_db_name)
+
+    # 3. Embedding function and persistence directory (unique per file)
+    embedding_function = _ingest_embeddings()
+    persist_directory = _vector_db_directory(vector_db_name)
+    
+    # 4. Embed the chunks the store does not have yet, in batches. This only fills the
+    # embedding cache; the store writes below read the vectors back from it.
+    vectorstore = None
+    stored_ids: set[str] = set()
+    if os.path.isdir(persist_directory) and os.listdir(persist_directory):
+        vectorstore = _open_vector_store(persist_directory, embedding_function)
+        stored_ids = set(vectorstore.get(include=[])["ids"])
+    pending_texts = [doc.page_content for doc, doc_id in zip(docs, chunk_ids) if doc_id not in stored_ids]
+    batch = max(settings.INGEST_EMBED_BATCH, 1)
+    for start in range(0, len(pending_texts), batch):
+        embedding_function.embed_documents(pending_texts[start:start + batch])
+        if progress:
+            progress(STAGE_EMBED, min(start + batch, len(pending_texts)), len(pending_texts), vector_db_name)
+
+    # 5. Create the vector store, or apply only the changed chunks to the existing one
+    if progress:
+        progress(STAGE_PERSIST, 0, 1, vector_db_name)
+    if vectorstore is not None:
+        new_ids = set(chunk_ids)
+        stale = [doc_id for doc_id in stored_ids if doc_id not in new_ids]
+        added = [(doc, doc_id) for doc, doc_id in zip(docs, chunk_ids) if doc_id not in stored_ids]
+        print(f"Updating vector store in '{persist_directory}': {len(added)} chunk(s) to add, {len(stale)} to delete, "
+              f"{len(docs) - len(added)} unchanged.")
+        if stale:
+            vectorstore.delete(ids=stale)
+        if added:
+            vectorstore.add_documents([doc for doc, _ in added], ids=[doc_id for _, doc_id in added])
+        changed = bool(stale or added)
+    else:
+        vectorstore = _create_vector_store(persist_directory, docs, chunk_ids, embedding_function)
+        changed = True
+
+    # 6. BM25 index, routing summary and ingest manifest
+    _finalize_vector_store(persist_directory, vectorstore, docs, manifest or {}, changed)
+    if progress:
+        progress(STAGE_PERSIST, 1, 1, vector_db_name)
     return persist_directory
 
+
+def backfill_side_indexes() -> list[str]:
+    """
+    One-off migration for stores created before hybrid search or routing existed:
+    builds the missing BM25 index and routing summary from what the store holds.
+    Runs at the start of every ingestion (and via `python -m backend.ocr`), never
+    on the query path, because it reads every stored chunk and the new files
+    change the store's signature (registry reopen, answer cache invalidation).
+
+    Returns:
+        list[str]: The stores that were updated.
+    """
+    root = resource_path("dependencies/vector_db")
+    updated = []
+    for name in sorted(os.listdir(root)):
+        persist_directory = os.path.join(root, name)
+        if not os.path.isdir(persist_directory):
+            continue
+        missing_lexical = not os.path.isfile(os.path.join(persist_directory, INDEX_NAME))
+        missing_summary = not os.path.isfile(os.path.join(persist_directory, SUMMARY_NAME))
+        if not (missing_lexical or missing_summary):
+            continue
+        try:
+            store = _open_vector_store(persist_directory, None)
+            if missing_lexical:
+                contents = store.get(include=["documents", "metadatas"])
+                docs = [
+                    Document(page_content=text, metadata=meta or {})
+                    for text, meta in zip(contents.get("documents") or [], contents.get("metadatas") or [])
+                ]
+                build_lexical_index(persist_directory, docs, k1=settings.BM25_K1, b=settings.BM25_B)
+            if missing_summary:
+                write_store_summary(persist_directory, store, settings.ROUTER_MEDOIDS)
+            print(f"Backfilled side indexes of '{persist_directory}' (BM25: {missing_lexical}, routing: {missing_summary}).")
+            updated.append(persist_directory)
+        except Exception as e:
+            print(f"Warning: Could not backfill side indexes of '{persist_directory}': {e}")
+    return updated
+
+
+def _extraction_config() -> str:
+    """Settings that change extracted page text; cached pages are only reused under the same ones."""
+    return (
+        f"dpi={settings.OCR_DPI};tesseract={TESSERACT_CONFIG};text_layer={settings.TEXT_LAYER_ENABLED}:"
+        f"{settings.TEXT_LAYER_MIN_CHARS}:{settings.TEXT_LAYER_MIN_QUALITY}"
+    )
+
+
+def resolve_vector_db_name(pdf_path: str, digest: str, page_hashes: list[str] | None) -> tuple[str, dict | None]:
+    """
+    Picks the vector DB for a PDF and returns (name, existing manifest or None).
+
+    The sanitized file name is used unless a store of that name holds a different
+    document (no page in common); then the name gets the file hash appended so
+    neither overwrites the other, and the app flags the two as built from files
+    with the same name. A store built before incremental ingestion (no manifest)
+    is taken to be an older version of the file and is updated in place, so no
+    outdated twin is left selected next to the new one.
+    """
+    base_path = resource_path("dependencies/vector_db")
+    filename_base = os.path.splitext(os.path.basename(pdf_path))[0]
+    name = re.sub(r'[^\w\-]', '_', filename_base)
+    if not os.path.isdir(os.path.join(base_path, name)):
+        return name, None
+
+    manifest = read_manifest(os.path.join(base_path, name))
+    if manifest is None or (
+        manifest.get("file_hash") == digest
+        or set(manifest.get("page_hashes") or ()) & set(page_hashes or ())
+    ):
+        return name, manifest
+
+    print(f"'{name}' holds a different document with the same file name; "
+          f"{os.path.basename(pdf_path)} gets its own vector DB.")
+    name = f"{name}_{digest[:8]}"
+    return name, read_manifest(os.path.join(base_path, name))
+
+
+# --- PART 3: STREAMING INGESTION STAGES (extract -> chunk -> embed -> persist) ---
+class _IngestTarget:
+    """Per-PDF state shared by the streaming stages (each field is written by one stage only)."""
+    def __init__(self, pdf_path: str, plan: dict, embedding_function):
+        self.filename = os.path.basename(pdf_path)
+        self.name = plan["name"]
+        self.page_hashes = plan["page_hashes"]
+        self.manifest = {"source": self.filename, "file_hash": plan["file_hash"], "page_hashes": plan["page_hashes"]}
+        self.persist_directory = _vector_db_directory(self.name)
+        self.store = None
+        self.stored_ids: set[str] = set()
+        if os.path.isdir(self.persist_directory) and os.listdir(self.persist_directory):
+            self.store = _open_vector_store(self.persist_directory, embedding_function)
+            self.stored_ids = set(self.store.get(include=[])["ids"])
+        self.docs: list[Document] = []       # every chunk of the new version (chunk stage)
+        self.pending: list[Document] = []    # embedded chunks not yet written (persist stage)
+        self.added_ids: list[str] = []       # chunks written by this run, undone if it does not finish
+        self.created = False                 # the store did not exist before this run
+        self.failed = False
+        self.finished = False
+
+
+def _release_vector_store(store) -> None:
+    """
+    Closes the files behind a Chroma store before its directory is removed (Windows
+    cannot delete files that are still open). Chroma shares one system per path
+    between its clients; only that entry is stopped and dropped from its cache, so
+    stores of other directories stay open (clear_system_cache() would stop them
+    all, including those serving chat queries). Flat stores only hold
+    memory maps, which go away with the last reference.
+    """
+    identifier = getattr(getattr(store, "_client", None), "_identifier", None)
+    if identifier is None:
+        return
+    from chromadb.api.shared_system_client import SharedSystemClient
+    system = SharedSystemClient._identifier_to_system.pop(identifier, None)
+    if system is not None:
+        system.stop()
+
+
+def _rollback_target(target: _IngestTarget) -> None:
+    """
+    Undoes the writes of a PDF whose ingestion did not finish, so its store keeps
+    serving the previous version (stale chunks are only deleted once a PDF finishes).
+    A store created by this run is removed altogether.
+    """
+    if target.finished or not (target.added_ids or target.created):
+        return
+    try:
+        if target.created:
+            _release_vector_store(target.store)
+            target.store = None
+            shutil.rmtree(target.persist_directory, ignore_errors=True)
+            if os.path.exists(target.persist_directory):
+                print(f"Warning: '{target.persist_directory}' could not be removed completely; delete it by hand.")
+        else:
+            target.store.delete(ids=target.added_ids)
+            target.store.persist()
+        print(f"Rolled back {len(target.added_ids)} chunk(s) written to '{target.persist_directory}'.")
+    except Exception as e:
+        print(f"Warning: Could not roll back '{target.persist_directory}': {e}")
+    target.added_ids = []
+    target.created = False
+
+
+class _ChunkStage(Stage):
+    """Splits each page as soon as it is extracted and records it in the page cache."""
+    name = "chunk"
+
+    def __init__(self, targets: dict, extraction_config: str, report):
+        self.targets = targets
+        self.extraction_config = extraction_config
+        self.report = report
+        self.total_pages = sum(len(t.page_hashes or ()) for t in targets.values())
+        self.pages_done = 0
+        self.failed: set[str] = set()
+
+    def process(self, item, emit) -> None:
+        event, pdf_path, value = item
+        if pdf_path in self.failed:
+            return
+        if event != EVENT_PAGE:
+            emit(item)
+            return
+        target = self.targets[pdf_path]
+        try:
+            if target.page_hashes and value["page"] <= len(target.page_hashes):
+                key = ingest_cache.page_key(target.page_hashes[value["page"] - 1], self.extraction_config)
+                ingest_cache.put_pages({key: {"text": value["text"], "extraction": value["extraction"]}})
+
+            # One document per page so chunks keep their page number and extraction path
+            docs = text_splitter.split_documents(page_documents(pdf_path, [value]))
+            assign_chunk_ids(docs)
+        except Exception as e:
+            # Only this PDF fails; the persist stage undoes what was already written for it
+            self.failed.add(pdf_path)
+            emit((EVENT_FAILED, pdf_path, e))
+            return
+        target.docs.extend(docs)
+        self.pages_done += 1
+        self.report(STAGE_CHUNK, self.pages_done, max(self.total_pages, self.pages_done), target.filename)
+        emit(("chunks", pdf_path, docs))
+
+
+class _EmbedStage(Stage):
+    """
+    Embeds new chunks (those the target store does not hold yet) in batches of up to
+    batch_size, across PDFs. A partial batch is flushed whenever the stage would
+    otherwise wait for input, so a slow OCR stage does not hold chunks back.
+    """
+    name = "embed"
+
+    def __init__(self, targets: dict, embedding_function, batch_size: int, report):
+        self.targets = targets
+        self.embedding_function = embedding_function
+        self.batch_size = max(batch_size, 1)
+        self.report = report
+        self.buffer: list[tuple[str, Document]] = []
+        self.queued = 0
+        self.embedded = 0
+        self.failed: set[str] = set()
+
+    def process(self, item, emit) -> None:
+        event, pdf_path, value = item
+        if pdf_path in self.failed:
+            return
+        if event != "chunks":
+            # Keep ordering: everything embedded for this PDF goes out before its end/failure event
+            self.flush(emit)
+            emit(item)
+            return
+        stored_ids = self.targets[pdf_path].stored_ids
+        new_docs = [doc for doc in value if doc.metadata["chunk_id"] not in stored_ids]
+        self.buffer.extend((pdf_path, doc) for doc in new_docs)
+        self.queued += len(new_docs)
+        if len(self.buffer) >= self.batch_size:
+            self.flush(emit)
+
+    def flush(self, emit) -> None:
+        while self.buffer:
+            batch, self.buffer = self.buffer[:self.batch_size], self.buffer[self.batch_size:]
+            grouped: dict[str, list[Document]] = {}
+            for pdf_path, doc in batch:
+                if pdf_path not in self.failed:
+                    grouped.setdefault(pdf_path, []).append(doc)
+            # Fills the chunk-embedding cache; the persist stage reads the vectors back from it
+            errors = self._embed(grouped)
+            self.embedded += len(batch)
+            self.report(STAGE_EMBED, self.embedded, self.queued, "")
+            for pdf_path, docs in grouped.items():
+                if pdf_path in errors:
+                    # Only this PDF fails; the persist stage undoes what was already written for it
+                    self.failed.add(pdf_path)
+                    emit((EVENT_FAILED, pdf_path, errors[pdf_path]))
+                else:
+                    emit(("embedded", pdf_path, docs))
+
+    def _embed(self, grouped: dict[str, list[Document]]) -> dict[str, Exception]:
+        """Embeds the batch in one call; if that fails, PDF by PDF to find the ones at fault."""
+        try:
+            self.embedding_function.embed_documents([doc.page_content for docs in grouped.values() for doc in docs])
+            return {}
+        except Exception as e:
+            if len(grouped) == 1:
+                return {pdf_path: e for pdf_path in grouped}
+        errors = {}
+        for pdf_path, docs in grouped.items():
+            try:
+                self.embedding_function.embed_documents([doc.page_content for doc in docs])
+            except Exception as e:
+                errors[pdf_path] = e
+        return errors
+
+    def idle(self, emit) -> None:
+        self.flush(emit)
+
+    def close(self, emit) -> None:
+        self.flush(emit)
+
+
+class _PersistStage(Stage):
+    """
+    Upserts embedded chunks into each target store in batches of batch_size, then on
+    a PDF's end event deletes its stale chunks and rebuilds BM25, routing summary
+    and manifest. Flat stores rewrite their whole index on every write, so their
+    chunks are written once, at the end of the PDF. A PDF that fails has the chunks
+    written for it so far removed again (see _rollback_target).
+    """
+    name = "persist"
+
+    def __init__(self, targets: dict, embedding_function, batch_size: int, report, results: list):
+        self.targets = targets
+        self.embedding_function = embedding_function
+        self.batch_size = max(batch_size, 1)
+        self.report = report
+        self.results = results
+        self.finished = 0
+
+    def process(self, item, emit) -> None:
+        event, pdf_path, value = item
+        target = self.targets[pdf_path]
+        if target.failed:
+            return
+        try:
+            if event == "embedded":
+                target.pending.extend(value)
+                if len(target.pending) >= self.batch_size and self._writes_in_batches(target):
+                    self._write(target)
+            elif event == EVENT_END:
+                self._finalize(target)
+            elif event == EVENT_FAILED:
+                raise value
+        except IngestCancelled:
+            raise
+        except Exception as e:
+            # Log the error and skip this file, continuing with the rest
+            target.failed = True
+            print(f"Failed to process and embed {target.filename}: {e}")
+            _rollback_target(target)
+
+    @staticmethod
+    def _writes_in_batches(target: "_IngestTarget") -> bool:
+        if target.store is not None:
+            return not isinstance(target.store, FlatVectorStore)
+        return settings.VECTOR_BACKEND != "flat"
+
+    def _write(self, target: "_IngestTarget") -> None:
+        docs, target.pending = target.pending, []
+        if not docs:
+            return
+        ids = [doc.metadata["chunk_id"] for doc in docs]
+        if target.store is None:
+            target.created = True
+            target.store = _create_vector_store(target.persist_directory, docs, ids, self.embedding_function)
+            # Until the final manifest lands, a rerun must recognise this partial store as the same document
+            write_manifest(target.persist_directory, {**target.manifest, "file_hash": None, "chunk_ids": []})
+        else:
+            target.store.add_documents(docs, ids=ids)
+        target.added_ids.extend(ids)
+
+    def _finalize(self, target: "_IngestTarget") -> None:
+        print(f"\n--- Finishing RAG pipeline for file: {target.filename} ---")
+        self._write(target)
+        if target.store is None:
+            raise ValueError("No text documents were loaded. Check the input directory and file types.")
+        new_ids = {doc.metadata["chunk_id"] for doc in target.docs}
+        stale = [doc_id for doc_id in target.stored_ids if doc_id not in new_ids]
+        if stale:
+            target.store.delete(ids=stale)
+        added = len(target.added_ids)
+        print(f"'{target.persist_directory}': {added} chunk(s) added, {len(stale)} deleted, "
+              f"{len(target.docs) - added} unchanged.")
+
+        docs = sorted(target.docs, key=lambda d: (d.metadata.get("page", 0), d.metadata.get("start_index", 0)))
+        _finalize_vector_store(target.persist_directory, target.store, docs, target.manifest, bool(added or stale))
+        target.finished = True
+        self.results.append(target.persist_directory)
+        self.finished += 1
+        self.report(STAGE_PERSIST, self.finished, len(self.targets), target.filename)
+
+
 # --- MAIN PIPELINE FUNCTION (Iterates over files) ---
-def run_rag_pipeline(pdf_input_dir: str) -> list[str]:
+def run_rag_pipeline(pdf_input_dir: str, progress: StageProgress | None = None, cancel: Callable[[], bool] | None = None) -> list[str]:
     """
     Orchestrates the entire RAG data generation pipeline from PDF to vector store,
     creating a separate vector store for each PDF file found in the input directory.
+    Ingestion is content-addressed: an unchanged file is skipped, pages seen before
+    reuse their cached text and only changed chunks are embedded and written.
+    Pages are chunked as soon as they are extracted, chunks are embedded in batches
+    and batches are written to the stores incrementally.
 
     Args:
         pdf_input_dir (str): The directory containing the uploaded PDF files.
+        progress (StageProgress | None): Called with (stage, done, total, detail) as the
+                                         run moves through STAGES.
+        cancel (Callable[[], bool] | None): Polled at every progress report; when it
+                                            returns True the run stops with IngestCancelled.
 
     Returns:
         list[str]: A list of paths to the newly created and persisted vector stores.
     """
+    def report(stage: str, done: int, total: int, detail: str = "") -> None:
+        if cancel and cancel():
+            raise IngestCancelled()
+        if progress:
+            progress(stage, done, total, detail)
+
     # 1. Identify all PDF files
     pdf_files = [os.path.join(pdf_input_dir, f) 
                  for f in os.listdir(pdf_input_dir) 
@@ -141,31 +853,75 @@ def run_rag_pipeline(pdf_input_dir: str) -> list[str]:
     if not pdf_files:
         raise ValueError("No PDF files found in the input directory.")
 
+    # Stores from before hybrid search/routing get their side indexes here, off the query path
+    backfill_side_indexes()
+
     all_vector_store_paths = []
 
-    # 2. Loop through each PDF file
-    for pdf_path in pdf_files:
-        filename_base = os.path.splitext(os.path.basename(pdf_path))[0]
-        # Create a clean, unique name for the vector DB based on the file name
-        vector_db_name = re.sub(r'[^\w\-]', '_', filename_base)
-        
-        print(f"\n--- Starting RAG pipeline for file: {os.path.basename(pdf_path)} ---")
-        
-        # Create a temporary directory for the intermediate text file for this specific PDF
-        with tempfile.TemporaryDirectory() as text_output_dir:
-            try:
-                # Step 1: Convert single PDF to a single text file
-                process_single_pdf_to_text(pdf_path, text_output_dir)
+    # 2. Hash every file and page; unchanged files are a no-op, known pages skip extraction
+    extraction_config = _extraction_config()
+    plans: dict[str, dict] = {}
+    cached_pages: dict[str, list[PageRecord | None]] = {}
+    for index, pdf_path in enumerate(pdf_files):
+        report(STAGE_EXTRACT, index, len(pdf_files), os.path.basename(pdf_path))
+        digest = file_hash(pdf_path)
+        try:
+            page_hashes = pdf_page_hashes(pdf_path)
+        except Exception as e:
+            print(f"Could not hash the pages of {os.path.basename(pdf_path)}, page cache disabled for it: {e}")
+            page_hashes = None
+        vector_db_name, manifest = resolve_vector_db_name(pdf_path, digest, page_hashes)
 
-                # Step 2: Generate embeddings from the single text file, using the derived name
-                vector_store_path = generate_embeddings(text_output_dir, vector_db_name)
-                all_vector_store_paths.append(vector_store_path)
-            except Exception as e:
-                # Log the error and skip this file, continuing with the rest
-                print(f"Failed to process and embed {os.path.basename(pdf_path)}: {e}")
-                continue 
+        if manifest is not None and manifest.get("file_hash") == digest:
+            print(f"{os.path.basename(pdf_path)} is unchanged since the last ingestion; skipping.")
+            all_vector_store_paths.append(os.path.join(resource_path("dependencies/vector_db"), vector_db_name))
+            continue
+
+        plans[pdf_path] = {"name": vector_db_name, "file_hash": digest, "page_hashes": page_hashes}
+        if page_hashes:
+            keys = [ingest_cache.page_key(h, extraction_config) for h in page_hashes]
+            found = ingest_cache.get_pages(keys)
+            cached_pages[pdf_path] = [
+                {"page": i + 1, "text": found[key]["text"], "extraction": found[key]["extraction"]} if key in found else None
+                for i, key in enumerate(keys)
+            ]
+
+    # 3. Stream the remaining PDFs through extract -> chunk -> embed -> persist. Each stage
+    # runs in its own thread behind a bounded queue, so OCR (process pool), embedding
+    # and store writes overlap and a slow stage throttles the ones before it.
+    if plans:
+        embedding_function = _ingest_embeddings()
+        targets = {pdf_path: _IngestTarget(pdf_path, plan, embedding_function) for pdf_path, plan in plans.items()}
+        bar, tqdm_callback = _tqdm_progress("OCR")
+
+        def ocr_progress(done: int, total: int, filename: str, page: int) -> None:
+            tqdm_callback(done, total, filename, page)
+            report(STAGE_OCR, done, total, f"{filename} p.{page}")
+
+        try:
+            run_pipeline(
+                iter_extracted_pages(list(plans), progress=ocr_progress, cached_pages=cached_pages),
+                [
+                    _ChunkStage(targets, extraction_config, report),
+                    _EmbedStage(targets, embedding_function, settings.INGEST_EMBED_BATCH, report),
+                    _PersistStage(targets, embedding_function, settings.INGEST_PERSIST_BATCH, report, all_vector_store_paths)
+                ],
+                queue_size=settings.INGEST_QUEUE_SIZE
+            )
+        except BaseException:
+            # Cancelled or failed as a whole: PDFs that did not finish keep their previous version
+            for target in targets.values():
+                _rollback_target(target)
+            raise
+        finally:
+            bar.close()
 
     if not all_vector_store_paths:
         raise Exception("Failed to generate vector stores for any uploaded file.")
         
     return all_vector_store_paths
+
+
+if __name__ == "__main__":
+    # One-off migration: python -m backend.ocr
+    backfill_side_indexes()
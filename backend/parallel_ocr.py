@@ -0,0 +1,224 @@
+# backend/parallel_ocr.py
+# NOTE: worker processes import this module on their own (spawn on Windows and in
+# the PyInstaller build), so it must stay light: no Streamlit, no model loading.
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from pdf2image import pdfinfo_from_path
+import pytesseract
+from backend.rasterizer import iter_page_images
+
+TESSERACT_CONFIG = "--oem 3 --psm 3"
+
+# Bytes per rendered pixel (RGB) and a factor for Tesseract's own working copies
+_BYTES_PER_PIXEL = 3
+_OCR_MEMORY_FACTOR = 2.5
+# Used when pdfinfo does not report a page size (US letter, in points)
+_DEFAULT_PAGE_PTS = (612.0, 792.0)
+
+# (done_pages, total_pages, pdf_path, page_number)
+ProgressCallback = Callable[[int, int, str, int], None]
+
+
+def _ocr_page(pdf_path: str, page_number: int, dpi: int, poppler_path: Optional[str], tesseract_cmd: Optional[str]) -> str:
+    """Renders and OCRs one page. Runs in a worker process; the bitmap never leaves it."""
+    if tesseract_cmd:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    for _, image in iter_page_images(pdf_path, dpi, poppler_path, window=1, first_page=page_number, last_page=page_number):
+        return pytesseract.image_to_string(image, config=TESSERACT_CONFIG)
+    return ""
+
+
+def _page_size_pts(info: Dict) -> Tuple[float, float]:
+    match = re.match(r"\s*([\d.]+)\s*x\s*([\d.]+)", str(info.get("Page size", "")))
+    if not match:
+        return _DEFAULT_PAGE_PTS
+    return float(match.group(1)), float(match.group(2))
+
+
+def _page_runs(jobs: Sequence[Tuple[str, int]]) -> Iterator[Tuple[str, int, int]]:
+    """Groups (pdf_path, page) jobs into contiguous (pdf_path, first_page, last_page) runs."""
+    run = None
+    for pdf_path, page in jobs:
+        if run and run[0] == pdf_path and run[2] == page - 1:
+            run[2] = page
+            continue
+        if run:
+            yield tuple(run)
+        run = [pdf_path, page, page]
+    if run:
+        yield tuple(run)
+
+
+class ParallelOCREngine:
+    """
+    Spreads the pages of every PDF in an upload over a process pool.
+    Each task renders a single page and OCRs it, so at most `max_inflight` bitmaps
+    exist at once; max_inflight is derived from the memory ceiling and the page
+    size at the configured DPI. iter_results yields pages as they complete, in no
+    particular order (each result names its PDF and page); ocr_documents puts
+    every PDF back in page order.
+    """
+    def __init__(
+        self,
+        workers: int,
+        max_memory_mb: int,
+        dpi: int,
+        poppler_path: Optional[str],
+        tesseract_cmd: Optional[str],
+        raster_window: int = 4,
+        raster_to_disk: bool = True
+    ):
+        self.workers = max(workers, 1)
+        self.raster_window = max(raster_window, 1)
+        self.raster_to_disk = raster_to_disk
+        self.max_memory_bytes = max(max_memory_mb, 1) * 1024 * 1024
+        self.dpi = dpi
+        self.poppler_path = poppler_path
+        self.tesseract_cmd = tesseract_cmd
+
+    def page_info(self, pdf_path: str) -> Tuple[int, int]:
+        """Returns (page_count, estimated bytes needed to render and OCR one page)."""
+        info = pdfinfo_from_path(pdf_path, poppler_path=self.poppler_path)
+        width_pts, height_pts = _page_size_pts(info)
+        pixels = (width_pts / 72.0 * self.dpi) * (height_pts / 72.0 * self.dpi)
+        return int(info["Pages"]), int(pixels * _BYTES_PER_PIXEL * _OCR_MEMORY_FACTOR)
+
+    def max_inflight(self, page_bytes: int) -> int:
+        """Pages that may be in flight at once without exceeding the memory ceiling."""
+        return max(1, min(self.workers, self.max_memory_bytes // max(page_bytes, 1)))
+
+    def plan_jobs(
+        self,
+        pdf_paths: Sequence[str],
+        pages: Optional[Dict[str, Sequence[int]]] = None
+    ) -> Tuple[Dict[str, int], List[Tuple[str, int]], Dict[str, Exception], int]:
+        """
+        Returns ({pdf_path: page_count}, [(pdf_path, page) to OCR], {pdf_path: error},
+        estimated bytes per page). `pages` restricts a PDF to the given 1-based pages.
+        """
+        counts: Dict[str, int] = {}
+        errors: Dict[str, Exception] = {}
+        jobs: List[Tuple[str, int]] = []
+        page_bytes = 0
+
+        for pdf_path in pdf_paths:
+            try:
+                count, estimate = self.page_info(pdf_path)
+            except Exception as e:
+                errors[pdf_path] = e
+                continue
+            wanted = range(1, count + 1)
+            if pages is not None and pdf_path in pages:
+                wanted = sorted(p for p in set(pages[pdf_path]) if 1 <= p <= count)
+            counts[pdf_path] = count
+            jobs.extend((pdf_path, page) for page in wanted)
+            page_bytes = max(page_bytes, estimate)
+        return counts, jobs, errors, page_bytes
+
+    def iter_results(
+        self,
+        jobs: Sequence[Tuple[str, int]],
+        page_bytes: int
+    ) -> Iterator[Tuple[str, int, Optional[str], Optional[Exception]]]:
+        """
+        Yields (pdf_path, page, text, error) as pages finish, in completion order.
+        After an error the remaining pages of that PDF may be skipped. Stopping the
+        iteration early waits only for the pages already in flight.
+        """
+        if not jobs:
+            return
+        inflight_limit = self.max_inflight(page_bytes)
+
+        if inflight_limit == 1:
+            # Serial path: no pool start-up cost for single-core boxes or tiny ceilings.
+            # Pages are streamed a window at a time and each bitmap is freed after OCR.
+            failed = set()
+            for pdf_path, first, last in _page_runs(jobs):
+                if pdf_path in failed:
+                    continue
+                pages_iter = self.iter_ocr_pages(pdf_path, last, first_page=first)
+                next_page = first
+                while True:
+                    # Only OCR failures are per-PDF errors; the consumer may stop the run at any yield
+                    try:
+                        item = next(pages_iter, None)
+                    except Exception as e:
+                        failed.add(pdf_path)
+                        yield pdf_path, next_page, None, e
+                        break
+                    if item is None:
+                        break
+                    next_page = item[0] + 1
+                    yield pdf_path, item[0], item[1], None
+        else:
+            with ProcessPoolExecutor(max_workers=inflight_limit) as pool:
+                pending = {}
+                job_iter = iter(jobs)
+                while True:
+                    # Keep at most inflight_limit pages submitted (memory ceiling)
+                    while len(pending) < inflight_limit:
+                        job = next(job_iter, None)
+                        if job is None:
+                            break
+                        future = pool.submit(_ocr_page, job[0], job[1], self.dpi, self.poppler_path, self.tesseract_cmd)
+                        pending[future] = job
+                    if not pending:
+                        break
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        pdf_path, page = pending.pop(future)
+                        try:
+                            text, error = future.result(), None
+                        except Exception as e:
+                            text, error = None, e
+                        yield pdf_path, page, text, error
+
+    def ocr_documents(
+        self,
+        pdf_paths: Sequence[str],
+        progress: Optional[ProgressCallback] = None,
+        pages: Optional[Dict[str, Sequence[int]]] = None
+    ) -> Tuple[Dict[str, List[str]], Dict[str, Exception]]:
+        """
+        OCRs every page of every PDF. Returns ({pdf_path: [page texts in order]},
+        {pdf_path: error}) so one broken file does not fail the whole upload.
+        An exception raised by `progress` is not treated as a page error; it stops
+        the run (used for cancellation).
+        `pages` restricts a PDF to the given 1-based page numbers (e.g. the pages
+        without a usable text layer); pages that are skipped come back as "".
+        """
+        counts, jobs, errors, page_bytes = self.plan_jobs(pdf_paths, pages)
+        results: Dict[str, List[str]] = {pdf_path: [""] * count for pdf_path, count in counts.items()}
+        total = len(jobs)
+        done = 0
+
+        for pdf_path, page, text, error in self.iter_results(jobs, page_bytes):
+            done += 1
+            if error is not None:
+                errors.setdefault(pdf_path, error)
+            else:
+                results[pdf_path][page - 1] = text or ""
+            if progress:
+                progress(done, total, os.path.basename(pdf_path), page)
+
+        for pdf_path in errors:
+            results.pop(pdf_path, None)
+        return results, errors
+
+    def iter_ocr_pages(self, pdf_path: str, last_page: Optional[int] = None, first_page: int = 1) -> Iterator[Tuple[int, str]]:
+        """
+        Serial, streaming OCR of one PDF: yields (page_number, text) while the
+        rasterizer renders the next window, keeping peak memory at O(window).
+        """
+        if self.tesseract_cmd:
+            pytesseract.pytesseract.tesseract_cmd = self.tesseract_cmd
+        for page, image in iter_page_images(
+            pdf_path, self.dpi, self.poppler_path,
+            window=self.raster_window, first_page=first_page, last_page=last_page, to_disk=self.raster_to_disk
+        ):
+            yield page, pytesseract.image_to_string(image, config=TESSERACT_CONFIG)
+
+
+__all__ = ["ParallelOCREngine", "TESSERACT_CONFIG"]
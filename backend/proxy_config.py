@@ -1,29 +1,133 @@
-import requests
+import time
+import asyncio
+import threading
+from typing import Any, Dict
+import aiohttp
 from requests_kerberos import HTTPKerberosAuth
 from urllib3.util import parse_url
 from backend import settings
 
-class HTTPAdapterWithProxyKerberosAuth(requests.adapters.HTTPAdapter):
-    def proxy_headers(self, proxy):
-        headers = {}
-        auth = HTTPKerberosAuth()
-        negotiate_details = auth.generate_request_header(
-            None,
-            parse_url(proxy).host,
-            is_preemptive=True
-        )
-        headers["Proxy-Authorization"] = negotiate_details
-        return headers
-
-def get_proxy_session() -> requests.Session:
-    """Return a requests session configured with Kerberos proxy auth."""
-    session = requests.Session()
-    proxy_url = f"http://{settings.PROXY_IP}:{settings.PROXY_PORT}"
-    session.proxies = {
-        "http": proxy_url,
-        "https": proxy_url
-    }
-    session.mount("http://", HTTPAdapterWithProxyKerberosAuth())
-    session.mount("https://", HTTPAdapterWithProxyKerberosAuth())
-    session.verify = False  # disable SSL verification if proxy intercepts SSL
-    return session
+
+class _ProxyTokenCache:
+    """
+    SPNEGO proxy-auth headers per proxy host, reused until ttl_seconds have passed.
+    Generating a token means a round trip to the Kerberos library (and possibly the
+    KDC), so it is done once per TTL instead of once per connection, and off the
+    event loop (get_async) so that round trip never stalls the other requests.
+    """
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.tokens: Dict[str, tuple] = {}
+        self.lock = threading.Lock()
+        self.refreshes = 0
+
+    def get(self, proxy_host: str) -> tuple:
+        """Returns (header value, expiry)."""
+        now = time.monotonic()
+        with self.lock:
+            cached = self.tokens.get(proxy_host)
+            if cached is not None and cached[1] > now:
+                return cached
+            header = HTTPKerberosAuth().generate_request_header(None, proxy_host, is_preemptive=True)
+            cached = (header, now + self.ttl_seconds)
+            self.tokens[proxy_host] = cached
+            self.refreshes += 1
+            return cached
+
+    async def get_async(self, proxy_host: str) -> tuple:
+        """get() for the event loop: a cached header is returned inline, a new one is generated in a worker thread."""
+        cached = self.tokens.get(proxy_host)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached
+        return await asyncio.get_running_loop().run_in_executor(None, self.get, proxy_host)
+
+    def invalidate(self, proxy_host: str) -> None:
+        with self.lock:
+            self.tokens.pop(proxy_host, None)
+
+
+_token_cache = _ProxyTokenCache(settings.PROXY_AUTH_TOKEN_TTL_SEC)
+
+
+def _proxy_url() -> str:
+    return f"http://{settings.PROXY_IP}:{settings.PROXY_PORT}"
+
+
+class _ConnectionStats:
+    """
+    Requests sent and connections opened by the aiohttp sessions, from their trace
+    hooks, so keep-alive reuse through the proxy can be checked.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {"requests": 0, "connections_opened": 0, "connections_reused": 0}
+
+    def _incr(self, name: str) -> None:
+        with self.lock:
+            self.counts[name] += 1
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        trace = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params):
+            self._incr("requests")
+
+        async def on_connection_create_end(session, context, params):
+            self._incr("connections_opened")
+
+        async def on_connection_reuseconn(session, context, params):
+            self._incr("connections_reused")
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        trace.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace
+
+    def stats(self) -> Dict[str, float]:
+        with self.lock:
+            counts = dict(self.counts)
+        acquired = counts["connections_opened"] + counts["connections_reused"]
+        return {
+            **counts,
+            "connection_reuse_ratio": (counts["connections_reused"] / acquired) if acquired else 0.0,
+            "proxy_token_refreshes": _token_cache.refreshes
+        }
+
+
+_connection_stats = _ConnectionStats()
+
+
+def connection_stats() -> Dict[str, float]:
+    """Requests, connections opened/reused and the reuse ratio across the aiohttp sessions."""
+    return _connection_stats.stats()
+
+
+def new_async_proxy_session(limit: int) -> aiohttp.ClientSession:
+    """
+    aiohttp session with a keep-alive pool of up to `limit` connections.
+    Must be created (and used) on the event loop thread. The proxy and its
+    Kerberos header are passed per request via proxy_request_kwargs().
+    """
+    connector = aiohttp.TCPConnector(
+        limit=max(limit, 1),
+        ssl=False,  # disable SSL verification if proxy intercepts SSL
+        keepalive_timeout=settings.HTTP_KEEPALIVE_SEC
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=None,
+        sock_connect=settings.REQUEST_TIMEOUT,
+        sock_read=settings.REQUEST_TIMEOUT
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=timeout, trace_configs=[_connection_stats.trace_config()])
+
+
+async def proxy_request_kwargs() -> Dict[str, Any]:
+    """proxy/proxy_headers for an aiohttp request, reusing the cached Kerberos token."""
+    proxy_url = _proxy_url()
+    header, _ = await _token_cache.get_async(parse_url(proxy_url).host)
+    return {"proxy": proxy_url, "proxy_headers": {"Proxy-Authorization": header}}
+
+
+def invalidate_proxy_token() -> None:
+    """Forces a fresh proxy token for the next request (after a 407 or rejected CONNECT)."""
+    _token_cache.invalidate(parse_url(_proxy_url()).host)
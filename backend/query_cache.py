@@ -0,0 +1,64 @@
+# backend/query_cache.py
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+
+def normalize_query(query: str) -> str:
+    """Canonical form of a query used as the cache key (case and whitespace insensitive)."""
+    return " ".join(query.lower().split())
+
+
+class QueryEmbeddingCache:
+    """
+    Thread-safe, bounded LRU cache of query embeddings.
+    Repeated and regenerated questions reuse the stored vector instead of
+    running the embedding model again.
+    """
+    def __init__(self, max_size: int):
+        self.max_size = max(max_size, 1)
+        self.entries: "OrderedDict[str, List[float]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, query: str) -> Optional[List[float]]:
+        key = normalize_query(query)
+        with self.lock:
+            vector = self.entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, query: str, vector: List[float]) -> None:
+        key = normalize_query(query)
+        with self.lock:
+            self.entries[key] = vector
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def get_or_compute(self, query: str, compute: Callable[[str], List[float]]) -> List[float]:
+        """Returns the cached embedding for query, computing and storing it on a miss."""
+        vector = self.get(query)
+        if vector is None:
+            vector = compute(query)
+            self.put(query, vector)
+        return vector
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+            }
+
+
+__all__ = ["QueryEmbeddingCache", "normalize_query"]
@@ -1,12 +1,22 @@
 import os
-from typing import List, Tuple
+import hashlib
+import numpy as np
+from typing import Dict, List, Optional, Tuple, TypedDict
 from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from langchain_community.embeddings import SentenceTransformerEmbeddings
 from langchain_core.documents import Document
 from langchain_community.vectorstores import Chroma
+from langchain_core.vectorstores import VectorStore
 # Assuming backend.path_resolver is available for resource_path
 from backend.path_resolver import resource_path 
+from backend.store_registry import VectorStoreRegistry
+from backend.query_cache import QueryEmbeddingCache
+from backend.flat_index import FlatVectorStore, is_flat_store, search_flat_stores
+from backend.store_router import StoreRouter
+from backend.lexical_index import LexicalIndexCache
+from backend.context_packer import pack_context, db_header
+from backend.embedding_service import get_embedding_service
+from backend import settings
 
 # --- Configuration and Initialization ---
 # Define the root path where all vector store directories are located
@@ -15,8 +25,17 @@ VECTOR_DB_ROOT = resource_path("dependencies/vector_db")
 # Path to your local Sentence Transformer model
 MODEL_PATH = resource_path("dependencies/embeddinggemma-300m") 
 
-# Initialize the embedding model once using SentenceTransformerEmbeddings
-embedding_model = SentenceTransformerEmbeddings(model_name=MODEL_PATH)
+# Shared embedding service (one model in RAM for retrieval and ingestion,
+# concurrent requests from all sessions are micro-batched)
+embedding_model = get_embedding_service()
+
+# Bounded cache of query vectors so repeated/regenerated questions skip the model
+query_embedding_cache = QueryEmbeddingCache(max_size=settings.QUERY_EMBED_CACHE_SIZE)
+
+
+def embed_query(query: str) -> List[float]:
+    """Embeds the query once (or returns the cached vector) for fan-out to all stores."""
+    return query_embedding_cache.get_or_compute(query, embedding_model.embed_query)
 
 
 def init_chroma(persist_dir: str) -> Chroma:
@@ -26,11 +45,36 @@ def init_chroma(persist_dir: str) -> Chroma:
         embedding_function=embedding_model
     )
 
-def init_selected_vector_stores(vb_selection: List[str]) -> List[Tuple[str, Chroma]]:
+def init_store(persist_dir: str) -> VectorStore:
+    """Opens a vector store with the backend it was written with (flat memmap index or Chroma)."""
+    if is_flat_store(persist_dir):
+        return FlatVectorStore(
+            persist_dir,
+            embedding_function=embedding_model,
+            rerank_factor=settings.FLAT_INDEX_RERANK_FACTOR
+        )
+    return init_chroma(persist_dir)
+
+# Process-wide registry of open stores, shared by all Streamlit sessions.
+# Stores are reopened when their directory changes and dropped when deleted.
+store_registry = VectorStoreRegistry(
+    root=VECTOR_DB_ROOT,
+    opener=init_store,
+    max_size=settings.VECTOR_STORE_CACHE_SIZE
+)
+
+# Centroid/medoid routing shared by all sessions (summaries cached per DB signature)
+store_router = StoreRouter(root=VECTOR_DB_ROOT, n_medoids=settings.ROUTER_MEDOIDS)
+
+# BM25 indexes persisted next to each vector DB, loaded once and shared
+lexical_indexes = LexicalIndexCache(root=VECTOR_DB_ROOT, k1=settings.BM25_K1, b=settings.BM25_B)
+
+def init_selected_vector_stores(vb_selection: List[str]) -> List[Tuple[str, VectorStore]]:
     """
-    Initializes Chroma instances only for the directory names provided in vb_selection.
+    Returns vector store instances for the directory names provided in vb_selection,
+    reusing stores already opened by the shared registry.
     """
-    vector_stores: List[Tuple[str, Chroma]] = []
+    vector_stores: List[Tuple[str, VectorStore]] = []
     
     # Iterate through the selected database names
     for db_name in vb_selection:
@@ -39,50 +83,173 @@ def init_selected_vector_stores(vb_selection: List[str]) -> List[Tuple[str, Chro
         # Check if the path is a directory
         if db_path.is_dir():
             try:
-                # Initialize the Chroma store
-                store = init_chroma(db_path.as_posix())
-                vector_stores.append((db_name, store))
+                # Fetch (or lazily open) the store from the registry
+                store = store_registry.get(db_name)
+                if store is not None:
+                    vector_stores.append((db_name, store))
             except Exception as e:
                 # Log a warning if a selected database cannot be initialized
-                print(f"Warning: Could not initialize Chroma from selected DB '{db_name}': {e}")
+                print(f"Warning: Could not initialize vector store from selected DB '{db_name}': {e}")
         else:
             # Log a warning if the selected path is not found or not a directory
             print(f"Warning: Selected vector database path not found or not a directory: '{db_name}' at {db_path.as_posix()}")
 
     return vector_stores
 
+# --- Score normalization ---
+
+# Merge modes for combining results from several databases
+MERGE_PER_DB = "per_db"   # k chunks from every selected DB (original behaviour)
+MERGE_GLOBAL = "global"   # one global top-k ranked by normalized score
+
+
+def distance_to_relevance(distance: float) -> float:
+    """
+    Maps a store distance to a relevance score in [0, 1] so scores from
+    different stores can be compared and cut off with one threshold.
+    Chroma's default space (and FlatVectorStore) returns squared L2 distance; for unit-normalized
+    embeddings (embeddinggemma) that equals 2 - 2*cos, i.e. relevance = cos.
+    """
+    return max(0.0, min(1.0, 1.0 - distance / 2.0))
+
+
+def _tag_db(db_name: str, doc: Document, score: Optional[float] = None) -> Document:
+    """Returns a copy of doc tagged with its source DB (and score) in the metadata."""
+    metadata = dict(doc.metadata or {})
+    metadata["db_name"] = db_name
+    if score is not None:
+        metadata["score"] = score
+    return Document(page_content=doc.page_content, metadata=metadata)
+
+
+def reciprocal_rank_fusion(ranked_lists: List[List[Document]], rrf_k: int = settings.RRF_K) -> List[Document]:
+    """
+    Fuses several ranked lists with reciprocal-rank fusion: score = sum(1 / (rrf_k + rank)).
+    Chunks are matched by (db_name, content); the fused score is kept in metadata["rrf_score"].
+    """
+    fused: Dict[Tuple[str, str], float] = {}
+    docs: Dict[Tuple[str, str], Document] = {}
+    for ranked in ranked_lists:
+        for rank, doc in enumerate(ranked, start=1):
+            key = (doc.metadata.get("db_name", ""), doc.page_content)
+            fused[key] = fused.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            if key not in docs:
+                docs[key] = doc
+            else:
+                # Keep the union of bookkeeping metadata (e.g. dense score + lexical score)
+                docs[key].metadata.update({k: v for k, v in doc.metadata.items() if k not in docs[key].metadata})
+
+    ordered = sorted(fused, key=lambda key: fused[key], reverse=True)
+    for key in ordered:
+        docs[key].metadata["rrf_score"] = fused[key]
+    return [docs[key] for key in ordered]
+
+
+def _group_by_db(documents: List[Document]) -> Dict[str, List[Document]]:
+    grouped: Dict[str, List[Document]] = {}
+    for doc in documents:
+        grouped.setdefault(doc.metadata.get("db_name", ""), []).append(doc)
+    return grouped
+
 # --- ParallelRAGRetriever Class ---
 
 class ParallelRAGRetriever:
-    def __init__(self, stores: List[Tuple[str, Chroma]]):
+    def __init__(
+        self,
+        stores: List[Tuple[str, VectorStore]],
+        router: Optional[StoreRouter] = None,
+        route_top_m: int = settings.ROUTER_TOP_M,
+        route_min_score: float = settings.ROUTER_MIN_SCORE
+    ):
         self.stores = stores
+        self.router = router
+        self.route_top_m = route_top_m
+        self.route_min_score = route_min_score
 
-    def _search_single_db(self, db_name: str, vector_store: Chroma, query: str, k_per_db: int) -> List[Document]:
-        """Performs a similarity search on a single vector store."""
+    def _route(self, query_embedding: List[float]) -> List[Tuple[str, VectorStore]]:
+        """Narrows the fan-out to the most relevant stores when a router is configured."""
+        if self.router is None:
+            return self.stores
         try:
-            # Use similarity_search to retrieve k_per_db documents
-            results = vector_store.similarity_search(query, k=k_per_db)
-            
-            modified_results: List[Document] = []
-            
-            # String to prepend to the content
-            prefix_string = f"According to data from {db_name} the relevant context is :\n"
+            return self.router.route(query_embedding, self.stores, self.route_top_m, self.route_min_score)
+        except Exception as e:
+            print(f"Warning: Store routing failed, searching all stores: {e}")
+            return self.stores
+
+    def _search_single_db(self, db_name: str, vector_store: VectorStore, query_embedding: List[float], k_per_db: int) -> List[Document]:
+        """Performs a similarity search on a single vector store using a precomputed query vector."""
+        try:
+            # Search by vector so the query is not re-encoded for every store
+            results = vector_store.similarity_search_by_vector(query_embedding, k=k_per_db)
             
-            for doc in results:
-                new_page_content = prefix_string + doc.page_content
-                modified_doc = Document(
-                    page_content=new_page_content,
-                    metadata=doc.metadata
-                )
-                modified_results.append(modified_doc)
-                
-            return modified_results
+            # Tag each result with its source DB (the header is added when the context is assembled)
+            return [_tag_db(db_name, doc) for doc in results]
             
         except Exception as e:
             # Handle search errors gracefully
             print(f"Error during search in {db_name}: {e}")
             return []
 
+    def _search_single_db_with_scores(self, db_name: str, vector_store: VectorStore, query_embedding: List[float], k: int) -> List[Tuple[Document, float]]:
+        """Searches a single store and returns (document, normalized relevance) pairs."""
+        try:
+            results = vector_store.similarity_search_by_vector_with_relevance_scores(query_embedding, k=k)
+            scored: List[Tuple[Document, float]] = []
+            for doc, distance in results:
+                score = distance_to_relevance(distance)
+                scored.append((_tag_db(db_name, doc, score), score))
+            return scored
+        except Exception as e:
+            print(f"Error during scored search in {db_name}: {e}")
+            return []
+
+    def _search_single_db_lexical(self, db_name: str, vector_store: VectorStore, query: str, k: int) -> List[Document]:
+        """BM25 search over a single DB's persisted lexical index."""
+        try:
+            index = lexical_indexes.get(db_name, vector_store)
+            if index is None:
+                return []
+            results: List[Document] = []
+            for doc, score in index.search(query, k):
+                tagged = _tag_db(db_name, doc)
+                tagged.metadata["lexical_score"] = score
+                results.append(tagged)
+            return results
+        except Exception as e:
+            print(f"Error during lexical search in {db_name}: {e}")
+            return []
+
+    def get_lexical_context(self, query: str, k_per_db: int) -> List[Document]:
+        """
+        Runs BM25 retrieval over the same (routed) stores as dense retrieval.
+        Results are ordered by BM25 score normalized per DB, so lists from
+        differently sized DBs can be ranked together.
+        """
+        if not self.stores:
+            return []
+        stores = self._route(embed_query(query))
+
+        all_results: List[Document] = []
+        with ThreadPoolExecutor(max_workers=len(stores)) as executor:
+            futures = [
+                executor.submit(self._search_single_db_lexical, name, store, query, k_per_db)
+                for name, store in stores
+            ]
+            for future in futures:
+                try:
+                    results = future.result()
+                except Exception as e:
+                    print(f"Error retrieving lexical results from a thread: {e}")
+                    continue
+                if results:
+                    best = results[0].metadata["lexical_score"] or 1.0
+                    for doc in results:
+                        doc.metadata["lexical_norm"] = doc.metadata["lexical_score"] / best
+                    all_results.extend(results)
+
+        all_results.sort(key=lambda doc: doc.metadata["lexical_norm"], reverse=True)
+        return all_results
+
     def get_context(self, query: str, k_per_db: int) -> List[Document]:
         """
         Retrieves context from all initialized vector stores in parallel.
@@ -93,12 +260,16 @@ class ParallelRAGRetriever:
         if not self.stores:
             return all_results
 
+        # Embed the query once and fan the same vector out to every (routed) store
+        query_embedding = embed_query(query)
+        stores = self._route(query_embedding)
+
         # Use ThreadPoolExecutor for parallel execution
-        with ThreadPoolExecutor(max_workers=len(self.stores)) as executor:
+        with ThreadPoolExecutor(max_workers=len(stores)) as executor:
             future_to_db = {
                 # k_per_db is now passed from the calling function (rag_context)
-                executor.submit(self._search_single_db, name, store, query, k_per_db): name
-                for name, store in self.stores
+                executor.submit(self._search_single_db, name, store, query_embedding, k_per_db): name
+                for name, store in stores
             }
             
             for future in future_to_db:
@@ -110,40 +281,253 @@ class ParallelRAGRetriever:
                     
         return all_results
 
+    def get_global_context(self, query: str, top_k: int, per_db_cap: Optional[int] = None, min_score: float = 0.0) -> List[Document]:
+        """
+        Retrieves scored candidates from all stores in parallel and returns a
+        single global top-k ranked by normalized relevance.
+        top_k: Total number of documents to return across *all* databases.
+        per_db_cap: Optional maximum number of documents taken from any one database.
+        min_score: Candidates with a relevance below this value are discarded.
+        """
+        if not self.stores or top_k <= 0:
+            return []
+
+        query_embedding = embed_query(query)
+        stores = self._route(query_embedding)
+
+        # Flat stores can be ranked together in one batched pass over the mapped matrices
+        if not per_db_cap and all(isinstance(store, FlatVectorStore) for _, store in stores):
+            flat_results: List[Document] = []
+            for db_name, doc, distance in search_flat_stores(stores, query_embedding, top_k):
+                score = distance_to_relevance(distance)
+                if score < min_score:
+                    break
+                flat_results.append(_tag_db(db_name, doc, score))
+            return flat_results
+
+        # No store can contribute more than top_k (or its cap) to the final list
+        k_fetch = min(top_k, per_db_cap) if per_db_cap else top_k
+
+        candidates: List[Tuple[Document, float]] = []
+        with ThreadPoolExecutor(max_workers=len(stores)) as executor:
+            futures = [
+                executor.submit(self._search_single_db_with_scores, name, store, query_embedding, k_fetch)
+                for name, store in stores
+            ]
+            for future in futures:
+                try:
+                    candidates.extend(future.result())
+                except Exception as e:
+                    print(f"Error retrieving results from a thread: {e}")
+
+        candidates.sort(key=lambda pair: pair[1], reverse=True)
+
+        selected: List[Document] = []
+        taken_per_db = {}
+        for doc, score in candidates:
+            if score < min_score:
+                break
+            db_name = doc.metadata["db_name"]
+            if per_db_cap and taken_per_db.get(db_name, 0) >= per_db_cap:
+                continue
+            taken_per_db[db_name] = taken_per_db.get(db_name, 0) + 1
+            selected.append(doc)
+            if len(selected) >= top_k:
+                break
+
+        return selected
+
 # NOTE: The instantiation of the retriever object must now be done INSIDE
 # the rag_context function or at the top level with a default/empty selection, 
 # as it depends on the vb_selection parameter which comes from main.py.
 
 # The discovery and instantiation code block is removed from the global scope.
 
-# The main RAG function is updated to accept vb_selection and k
-def rag_context(query: str, vb_selection: List[str], k: int) -> str:
+def _apply_min_score(
+    retriever: ParallelRAGRetriever,
+    docs: List[Document],
+    query_embedding: List[float],
+    min_score: float
+) -> List[Document]:
+    """
+    Applies the relevance cutoff to fused results. Lexical-only hits carry no dense
+    score, so theirs is computed from the chunk vector stored in their DB; hits whose
+    vector cannot be looked up (stores without chunk IDs) cannot pass the cutoff.
+    """
+    if min_score <= 0:
+        return docs
+    missing: Dict[str, List[Document]] = {}
+    for doc in docs:
+        if "score" not in doc.metadata and doc.metadata.get("chunk_id"):
+            missing.setdefault(doc.metadata.get("db_name", ""), []).append(doc)
+
+    stores = dict(retriever.stores)
+    query = np.asarray(query_embedding, dtype=np.float32)
+    for db_name, pending in missing.items():
+        try:
+            found = stores[db_name].get(ids=[doc.metadata["chunk_id"] for doc in pending], include=["embeddings"])
+            vectors = dict(zip(found["ids"], found["embeddings"]))
+        except Exception as e:
+            print(f"Error looking up chunk vectors in {db_name}: {e}")
+            continue
+        for doc in pending:
+            vector = vectors.get(doc.metadata["chunk_id"])
+            if vector is not None:
+                distance = float(np.sum((np.asarray(vector, dtype=np.float32) - query) ** 2))
+                doc.metadata["score"] = distance_to_relevance(distance)
+
+    return [doc for doc in docs if doc.metadata.get("score", -1.0) >= min_score]
+
+
+def _hybrid_retrieve(
+    retriever: ParallelRAGRetriever,
+    query: str,
+    k: int,
+    merge_mode: str,
+    top_k: int,
+    per_db_cap: Optional[int],
+    min_score: float
+) -> List[Document]:
+    """
+    Runs dense and BM25 retrieval in parallel over deeper candidate lists and
+    fuses them with RRF, then applies the usual per-DB or global limits
+    (in global mode including min_score, for lexical hits too).
+    """
+    factor = max(settings.HYBRID_CANDIDATE_FACTOR, 1)
+    # Embed up front so both branches share the cached vector
+    query_embedding = embed_query(query)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        if merge_mode == MERGE_GLOBAL:
+            dense_future = executor.submit(
+                retriever.get_global_context, query, top_k * factor, per_db_cap and per_db_cap * factor, min_score
+            )
+            lexical_future = executor.submit(retriever.get_lexical_context, query, (per_db_cap or top_k) * factor)
+        else:
+            dense_future = executor.submit(retriever.get_context, query, k * factor)
+            lexical_future = executor.submit(retriever.get_lexical_context, query, k * factor)
+        dense_docs = dense_future.result()
+        lexical_docs = lexical_future.result()
+
+    if merge_mode == MERGE_GLOBAL:
+        selected: List[Document] = []
+        taken_per_db: Dict[str, int] = {}
+        fused = reciprocal_rank_fusion([dense_docs, lexical_docs])
+        for doc in _apply_min_score(retriever, fused, query_embedding, min_score):
+            db_name = doc.metadata.get("db_name", "")
+            if per_db_cap and taken_per_db.get(db_name, 0) >= per_db_cap:
+                continue
+            taken_per_db[db_name] = taken_per_db.get(db_name, 0) + 1
+            selected.append(doc)
+            if len(selected) >= top_k:
+                break
+        return selected
+
+    # Per-DB mode: fuse each DB's dense and lexical lists separately, keep k per DB
+    dense_by_db = _group_by_db(dense_docs)
+    lexical_by_db = _group_by_db(lexical_docs)
+    fused_docs: List[Document] = []
+    for db_name in list(dense_by_db) + [name for name in lexical_by_db if name not in dense_by_db]:
+        fused = reciprocal_rank_fusion([dense_by_db.get(db_name, []), lexical_by_db.get(db_name, [])])
+        fused_docs.extend(fused[:k])
+    return fused_docs
+
+class RetrievalResult(TypedDict):
+    context: str                  # formatted context for the prompt
+    chunk_ids: List[str]          # stable IDs of the retrieved chunks
+    query_embedding: List[float]  # the (cached) query vector used for retrieval
+    db_fingerprint: str           # changes whenever any selected DB changes on disk
+
+
+def chunk_id(doc: Document) -> str:
+    """Stable ID of a retrieved chunk: its stored chunk_id, else a hash of DB and content."""
+    stored = (doc.metadata or {}).get("chunk_id")
+    if stored:
+        return str(stored)
+    digest = hashlib.sha1(f"{doc.metadata.get('db_name', '')}\x00{doc.page_content}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def selection_fingerprint(vb_selection: List[str]) -> str:
+    """Hash of the on-disk signatures of the selected DBs (used to invalidate cached answers)."""
+    signatures = [(name, store_registry.signature(name)) for name in sorted(vb_selection)]
+    return hashlib.sha1(repr(signatures).encode("utf-8")).hexdigest()
+
+
+def rag_retrieve(
+    query: str,
+    vb_selection: List[str],
+    k: int,
+    merge_mode: str = settings.RAG_MERGE_MODE,
+    top_k: int = settings.RAG_GLOBAL_TOP_K,
+    per_db_cap: Optional[int] = settings.RAG_PER_DB_CAP,
+    min_score: float = settings.RAG_MIN_SCORE,
+    route: bool = settings.ROUTER_ENABLED,
+    hybrid: bool = settings.HYBRID_ENABLED,
+    token_budget: Optional[int] = settings.CONTEXT_TOKEN_BUDGET
+) -> RetrievalResult:
     """
     Initializes selected vector stores, performs parallel retrieval, 
-    and returns a concatenated string of the context.
+    and returns the formatted context together with what identifies it
+    (chunk IDs, query embedding, DB fingerprint) for the answer cache.
     
     query: The user's query string.
     vb_selection: List of vector database directory names to use.
-    k: The number of documents to retrieve from *each* selected database.
+    k: The number of documents to retrieve from *each* selected database (per_db mode).
+    merge_mode: MERGE_PER_DB, or MERGE_GLOBAL for a score-ranked global top-k.
+    top_k / per_db_cap / min_score: Global-mode limits (see get_global_context).
+    route: Search only the top ROUTER_TOP_M stores picked from their centroid summaries.
+    hybrid: Run BM25 alongside dense retrieval and fuse both with reciprocal-rank fusion.
+    token_budget: Pack the context (merge overlapping chunks, one header per DB) into at
+                  most this many tokens. None keeps the verbatim per-chunk format.
     """
-    # 1. Initialize ONLY the selected vector stores
+    result: RetrievalResult = {
+        "context": "",
+        "chunk_ids": [],
+        "query_embedding": [],
+        "db_fingerprint": selection_fingerprint(vb_selection)
+    }
+
+    # 1. Fetch ONLY the selected vector stores (opened once, shared across sessions)
     selected_stores = init_selected_vector_stores(vb_selection)
     
     if not selected_stores:
         print("Warning: No vector databases were initialized for retrieval.")
-        return ""
+        return result
         
-    # 2. Instantiate the parallel retriever object with selected stores
-    parallel_rag_retriever = ParallelRAGRetriever(selected_stores)
+    # 2. Instantiate the parallel retriever object with selected stores (and optional routing)
+    parallel_rag_retriever = ParallelRAGRetriever(selected_stores, router=store_router if route else None)
     
-    # 3. Perform retrieval with the specified k
-    context_documents: List[Document] = parallel_rag_retriever.get_context(query, k_per_db=k)
+    # 3. Perform retrieval with the specified k (or a global top-k)
+    if hybrid:
+        context_documents = _hybrid_retrieve(parallel_rag_retriever, query, k, merge_mode, top_k, per_db_cap, min_score)
+    elif merge_mode == MERGE_GLOBAL:
+        context_documents = parallel_rag_retriever.get_global_context(
+            query, top_k=top_k, per_db_cap=per_db_cap, min_score=min_score
+        )
+    else:
+        context_documents = parallel_rag_retriever.get_context(query, k_per_db=k)
     
     # 4. Format the result as a single string (as suggested by the main.py usage: rag_context_str)
-    # The documents are already formatted with the prefix in _search_single_db.
-    context_str = "\n---\n".join([doc.page_content for doc in context_documents])
-    
-    return context_str
+    if token_budget:
+        context_str = pack_context(context_documents, token_budget)
+    else:
+        context_str = "\n---\n".join(
+            [db_header(doc.metadata.get("db_name", "")) + doc.page_content for doc in context_documents]
+        )
+
+    result["context"] = context_str
+    result["chunk_ids"] = [chunk_id(doc) for doc in context_documents]
+    result["query_embedding"] = embed_query(query)
+    return result
+
+# The main RAG function is updated to accept vb_selection and k
+def rag_context(query: str, vb_selection: List[str], k: int, **kwargs) -> str:
+    """
+    Returns only the concatenated context string for the query.
+    Accepts the same keyword options as rag_retrieve.
+    """
+    return rag_retrieve(query, vb_selection, k, **kwargs)["context"]
 
 # IMPORTANT: The return type of rag_context is assumed to be a string (rag_context_str in main.py)
-# If you actually need List[Document], change the return type and the last few lines.
\ No newline at end of file
+# If you actually need List[Document], use rag_retrieve (or ParallelRAGRetriever directly).
\ No newline at end of file
@@ -0,0 +1,66 @@
+# backend/rasterizer.py
+import os
+import tempfile
+from typing import Iterator, Optional, Tuple
+from pdf2image import convert_from_path
+from PIL import Image
+
+
+def iter_page_images(
+    pdf_path: str,
+    dpi: int,
+    poppler_path: Optional[str],
+    window: int = 4,
+    first_page: int = 1,
+    last_page: Optional[int] = None,
+    to_disk: bool = True
+) -> Iterator[Tuple[int, Image.Image]]:
+    """
+    Streams (page_number, image) pairs for a page range, rendering `window` pages
+    per Poppler call instead of the whole document.
+
+    With to_disk=True each window is rendered to a temporary directory and only
+    the page being consumed is decoded into memory; otherwise a window of bitmaps
+    is held in RAM. Every image is closed (and its file removed) as soon as the
+    consumer moves on, so peak memory is O(window), not O(document).
+    last_page=None renders up to the end of the document.
+    """
+    window = max(window, 1)
+    with tempfile.TemporaryDirectory(prefix="raster_") as tmp_dir:
+        start = first_page
+        while last_page is None or start <= last_page:
+            end = start + window - 1 if last_page is None else min(start + window - 1, last_page)
+            if to_disk:
+                rendered = convert_from_path(
+                    pdf_path, dpi=dpi, first_page=start, last_page=end, poppler_path=poppler_path,
+                    output_folder=tmp_dir, paths_only=True, fmt="ppm"
+                )
+            else:
+                rendered = convert_from_path(pdf_path, dpi=dpi, first_page=start, last_page=end, poppler_path=poppler_path)
+            if not rendered:
+                # Past the end of the document
+                return
+            rendered_count = len(rendered)
+
+            # Pop as we go so consumed bitmaps are not kept alive by the window list
+            while rendered:
+                item = rendered.pop(0)
+                page_number = start + (rendered_count - len(rendered) - 1)
+                image = Image.open(item) if to_disk else item
+                try:
+                    yield page_number, image
+                finally:
+                    image.close()
+                    if to_disk:
+                        try:
+                            os.remove(item)
+                        except OSError:
+                            pass
+
+            if rendered_count < end - start + 1:
+                # Short window: that was the last page
+                return
+            start = end + 1
+
+
+__all__ = ["iter_page_images"]
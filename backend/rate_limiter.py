@@ -2,6 +2,7 @@
 import time
 import threading
 from collections import deque
+from typing import Any, Dict, Mapping, Optional, Tuple
 from backend import settings
 
 class SlidingWindowRateLimiter:
@@ -26,12 +27,161 @@ class SlidingWindowRateLimiter:
                 return True
             return False
 
+class Reservation:
+    """Capacity granted to one request; settle() corrects the token estimate once usage is known."""
+    def __init__(self, limiter: "TokenBucketLimiter", tokens: int):
+        self.limiter = limiter
+        self.tokens = tokens
+        self.settled = False
+
+    def observe(self, headers: Mapping[str, str], throttled: bool = False) -> Optional[float]:
+        """Feeds Azure's rate-limit headers back to the limiter; returns retry-after seconds, if any."""
+        return self.limiter.apply_headers(headers, throttled)
+
+    def settle(self, actual_tokens: int) -> None:
+        if self.settled:
+            return
+        self.settled = True
+        self.limiter.reconcile(self.tokens - actual_tokens)
+
+
+class TokenBucketLimiter:
+    """
+    Requests-per-minute and tokens-per-minute token buckets (Azure enforces both;
+    long RAG prompts usually hit the token limit first). A limit of 0 is not
+    enforced locally.
+
+    try_acquire() never blocks; AzureRouter.acquire() polls it on the chat
+    dispatcher's loop so callers wait, in arrival order, for capacity on any
+    backend instead of being refused outright. The token charge is an estimate
+    (prompt tokens + max_tokens, as Azure counts it on admission) that is
+    reconciled with the usage block of the response. Azure's retry-after and
+    x-ratelimit-remaining-* headers pause or drain the buckets so the local view
+    never runs ahead of the service's.
+    """
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.rpm = max(requests_per_minute, 0)
+        self.tpm = max(tokens_per_minute, 0)
+        self.request_level = float(self.rpm)
+        self.token_level = float(self.tpm)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+        self.counts = {"granted": 0, "throttled": 0}
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated
+        self.updated = now
+        if self.rpm:
+            self.request_level = min(float(self.rpm), self.request_level + elapsed * self.rpm / 60.0)
+        if self.tpm:
+            self.token_level = min(float(self.tpm), self.token_level + elapsed * self.tpm / 60.0)
+
+    def _try_take(self, tokens: int) -> float:
+        """Takes one request and `tokens` tokens and returns 0.0, or returns the seconds until they are available."""
+        now = time.monotonic()
+        with self.lock:
+            self._refill(now)
+            wait = max(self.blocked_until - now, 0.0)
+            if self.rpm and self.request_level < 1.0:
+                wait = max(wait, (1.0 - self.request_level) * 60.0 / self.rpm)
+            if self.tpm:
+                # A prompt larger than the whole bucket runs once the bucket is full
+                needed = min(tokens, self.tpm)
+                if self.token_level < needed:
+                    wait = max(wait, (needed - self.token_level) * 60.0 / self.tpm)
+            if wait > 0.0:
+                return max(wait, 0.001)
+            if self.rpm:
+                self.request_level -= 1.0
+            if self.tpm:
+                self.token_level -= tokens
+            return 0.0
+
+    def allow(self, tokens: int = 0) -> bool:
+        return self._try_take(tokens) == 0.0
+
+    def try_acquire(self, tokens: int) -> Tuple[Optional[Reservation], float]:
+        """Non-blocking acquire: (reservation, 0.0), or (None, seconds until capacity frees up)."""
+        wait = self._try_take(tokens)
+        if wait:
+            return None, wait
+        self._count("granted")
+        return Reservation(self, tokens), 0.0
+
+    def headroom(self) -> float:
+        """Fraction (0..1) of the scarcer bucket that is available right now; 1.0 when nothing is enforced."""
+        now = time.monotonic()
+        with self.lock:
+            self._refill(now)
+            if now < self.blocked_until:
+                return 0.0
+            fractions = []
+            if self.rpm:
+                fractions.append(self.request_level / self.rpm)
+            if self.tpm:
+                fractions.append(self.token_level / self.tpm)
+            return max(min(fractions), 0.0) if fractions else 1.0
+
+    def apply_headers(self, headers: Mapping[str, str], throttled: bool = False) -> Optional[float]:
+        """Applies retry-after(-ms) and x-ratelimit-remaining-requests/-tokens from an Azure response."""
+        retry_after = _header_float(headers, "retry-after-ms")
+        retry_after = retry_after / 1000.0 if retry_after is not None else _header_float(headers, "retry-after")
+        remaining_requests = _header_float(headers, "x-ratelimit-remaining-requests")
+        remaining_tokens = _header_float(headers, "x-ratelimit-remaining-tokens")
+        now = time.monotonic()
+        with self.lock:
+            self._refill(now)
+            if throttled:
+                self.counts["throttled"] += 1
+            if retry_after is not None:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+            if remaining_requests is not None and self.rpm:
+                self.request_level = min(self.request_level, remaining_requests)
+            if remaining_tokens is not None and self.tpm:
+                self.token_level = min(self.token_level, remaining_tokens)
+        return retry_after
+
+    def reconcile(self, token_delta: int) -> None:
+        """Returns (positive) or charges (negative) the difference between estimated and actual tokens."""
+        if not self.tpm or not token_delta:
+            return
+        with self.lock:
+            self._refill(time.monotonic())
+            self.token_level = min(float(self.tpm), self.token_level + token_delta)
+
+    def _count(self, name: str) -> None:
+        with self.lock:
+            self.counts[name] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            self._refill(time.monotonic())
+            return {
+                **self.counts,
+                "requests_available": self.request_level if self.rpm else None,
+                "tokens_available": self.token_level if self.tpm else None,
+                "blocked_for_sec": max(self.blocked_until - time.monotonic(), 0.0)
+            }
+
+
+def _header_float(headers: Mapping[str, str], name: str) -> Optional[float]:
+    value = headers.get(name)
+    try:
+        return float(value) if value is not None else None
+    except ValueError:  # e.g. an HTTP-date retry-after
+        return None
+
+
 # One global limiter for your single API key
-global_rate_limiter = SlidingWindowRateLimiter(
-    max_calls=settings.MAX_REQUESTS_PER_MINUTE,
-    window_seconds=60
+global_rate_limiter = TokenBucketLimiter(
+    requests_per_minute=settings.MAX_REQUESTS_PER_MINUTE,
+    tokens_per_minute=settings.MAX_TOKENS_PER_MINUTE
 )
 
 RATE_LIMIT_MESSAGE = "Too many requests right now. Please try again in a few seconds."
 
-__all__ = ["global_rate_limiter", "RATE_LIMIT_MESSAGE", "SlidingWindowRateLimiter"]
+__all__ = [
+    "global_rate_limiter", "RATE_LIMIT_MESSAGE", "SlidingWindowRateLimiter",
+    "TokenBucketLimiter", "Reservation"
+]
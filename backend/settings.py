@@ -8,20 +8,37 @@ AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
 AZURE_OPENAI_KEY = os.getenv("AZURE_OPENAI_KEY")
 AZURE_OPENAI_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT")
 AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2023-05-15")
+# Several deployments/keys to balance across, as a JSON list of objects with endpoint,
+# deployment, key (or key_env: name of the variable holding it) and optional name,
+# api_version, rpm, tpm. Empty = the single AZURE_OPENAI_* deployment above.
+AZURE_OPENAI_BACKENDS = os.getenv("AZURE_OPENAI_BACKENDS", "")
+AZURE_BACKEND_EWMA_ALPHA = float(os.getenv("AZURE_BACKEND_EWMA_ALPHA", "0.3"))   # weight of the newest latency sample
+AZURE_BACKEND_EJECT_AFTER = int(os.getenv("AZURE_BACKEND_EJECT_AFTER", "2"))     # consecutive failures before ejection
+AZURE_BACKEND_EJECT_SEC = float(os.getenv("AZURE_BACKEND_EJECT_SEC", "30"))      # ejection time (429s use retry-after)
 
 PROXY_IP = os.getenv("PROXY_IP")
 PROXY_PORT = os.getenv("PROXY_PORT")
 
 # --- Load control defaults ---
 MAX_REQUESTS_PER_MINUTE = int(os.getenv("MAX_REQUESTS_PER_MINUTE", "30"))
+MAX_TOKENS_PER_MINUTE = int(os.getenv("MAX_TOKENS_PER_MINUTE", "0"))  # deployment's TPM quota (0 = not enforced locally)
 
 # Queue
-QUEUE_WORKERS = int(os.getenv("QUEUE_WORKERS", "1"))     # number of worker threads
+# concurrent Azure requests (asyncio dispatcher); replaces QUEUE_WORKERS, which is no longer read
+AZURE_MAX_INFLIGHT = int(os.getenv("AZURE_MAX_INFLIGHT", "8"))
 QUEUE_MAXSIZE = int(os.getenv("QUEUE_MAXSIZE", "100"))   # max pending requests
 QUEUE_TASK_TIMEOUT = float(os.getenv("QUEUE_TASK_TIMEOUT", "90"))  # seconds
+COALESCE_ENABLED = os.getenv("COALESCE_ENABLED", "true").lower() == "true"  # identical in-flight requests share one call
 
 # HTTP call behavior
 REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", "60"))
+HTTP_KEEPALIVE_SEC = float(os.getenv("HTTP_KEEPALIVE_SEC", "15"))                # close idle connections after this (keep below the proxy's idle timeout)
+PROXY_AUTH_TOKEN_TTL_SEC = float(os.getenv("PROXY_AUTH_TOKEN_TTL_SEC", "300"))   # reuse a Kerberos proxy token this long
+
+# Streamed chat replies (SSE). Token usage comes from the final usage chunk when the
+# API version supports stream_options, otherwise it is estimated locally.
+CHAT_STREAMING = os.getenv("CHAT_STREAMING", "true").lower() == "true"
+AZURE_STREAM_INCLUDE_USAGE = os.getenv("AZURE_STREAM_INCLUDE_USAGE", "false").lower() == "true"
 
 # Retry policy (tenacity)
 RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "3"))
@@ -37,4 +54,88 @@ CB_COOLDOWN_SEC = int(os.getenv("CB_COOLDOWN_SEC", "30"))      # seconds open
 FALLBACK_MESSAGE = os.getenv(
     "FALLBACK_MESSAGE",
     "The service is busy right now. Please try again in a few moments."
-)
\ No newline at end of file
+)
+
+# Vector store registry (shared across Streamlit sessions)
+VECTOR_STORE_CACHE_SIZE = int(os.getenv("VECTOR_STORE_CACHE_SIZE", "64"))  # max open stores (LRU)
+
+# Query embedding cache (shared across Streamlit sessions)
+QUERY_EMBED_CACHE_SIZE = int(os.getenv("QUERY_EMBED_CACHE_SIZE", "512"))  # cached query vectors (LRU)
+
+# Retrieval merging: "per_db" (k per selected DB) or "global" (score-ranked top-k)
+RAG_MERGE_MODE = os.getenv("RAG_MERGE_MODE", "per_db")
+RAG_GLOBAL_TOP_K = int(os.getenv("RAG_GLOBAL_TOP_K", "8"))      # total chunks in global mode
+RAG_PER_DB_CAP = int(os.getenv("RAG_PER_DB_CAP", "0")) or None  # max chunks per DB (0 = no cap)
+RAG_MIN_SCORE = float(os.getenv("RAG_MIN_SCORE", "0.0"))        # min normalized relevance [0, 1]
+
+# Vector backend for new stores: "chroma" (per-PDF Chroma directory) or "flat"
+# (memory-mapped float32 matrix + text sidecar). Existing stores are opened with
+# whichever backend wrote them.
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+# Flat backend only: "none", "float16" or "int8" codes scanned before a float32 re-rank
+FLAT_INDEX_QUANTIZATION = os.getenv("FLAT_INDEX_QUANTIZATION", "none").lower()
+FLAT_INDEX_RERANK_FACTOR = int(os.getenv("FLAT_INDEX_RERANK_FACTOR", "4"))  # shortlist = k * factor
+
+# Store routing: score each selected DB by its centroid/medoids and search only the best ones
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "true").lower() == "true"
+ROUTER_TOP_M = int(os.getenv("ROUTER_TOP_M", "4"))             # DBs searched per query
+ROUTER_MIN_SCORE = float(os.getenv("ROUTER_MIN_SCORE", "0.3"))  # below this best score, search all DBs
+ROUTER_MEDOIDS = int(os.getenv("ROUTER_MEDOIDS", "4"))          # medoid vectors kept per DB
+
+# Hybrid retrieval: BM25 lexical search fused with dense search (reciprocal-rank fusion)
+HYBRID_ENABLED = os.getenv("HYBRID_ENABLED", "true").lower() == "true"
+HYBRID_CANDIDATE_FACTOR = int(os.getenv("HYBRID_CANDIDATE_FACTOR", "2"))  # candidates fetched per branch = k * factor
+RRF_K = int(os.getenv("RRF_K", "60"))
+BM25_K1 = float(os.getenv("BM25_K1", "1.5"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+# Context assembly: overlapping chunks are merged and the result trimmed to this
+# many prompt tokens (0 = no packing, join chunks verbatim)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000")) or None
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "o200k_base")  # tiktoken encoding of the chat model
+
+# Conversation history: recent turns are sent verbatim within this many tokens; older
+# turns are folded into a rolling summary by a background request
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "2000"))
+HISTORY_SUMMARY_ENABLED = os.getenv("HISTORY_SUMMARY_ENABLED", "true").lower() == "true"
+HISTORY_SUMMARY_MAX_TOKENS = int(os.getenv("HISTORY_SUMMARY_MAX_TOKENS", "300"))      # summary length
+HISTORY_SUMMARY_INPUT_TOKENS = int(os.getenv("HISTORY_SUMMARY_INPUT_TOKENS", "4000"))  # new turns folded per request
+
+# Answer cache in front of chat_with_azure (exact + embedding-similarity tiers)
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH")                              # default: dependencies/answer_cache.sqlite3
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2000"))   # LRU limit
+ANSWER_CACHE_TTL_SEC = float(os.getenv("ANSWER_CACHE_TTL_SEC", str(7 * 24 * 3600)))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))   # min cosine for a similar-question hit
+
+# Shared embedding service (micro-batching across sessions and ingestion)
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "32"))          # max texts per model call
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "10"))    # wait for a batch to fill
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "1"))               # threads calling the model
+EMBED_TORCH_THREADS = int(os.getenv("EMBED_TORCH_THREADS", "0"))   # torch intra-op threads (0 = torch default)
+
+# OCR (page-parallel process pool)
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 1)))  # worker processes
+OCR_MAX_MEMORY_MB = int(os.getenv("OCR_MAX_MEMORY_MB", "2048"))         # ceiling for page bitmaps in flight
+OCR_DPI = int(os.getenv("OCR_DPI", "300"))
+RASTER_WINDOW_PAGES = int(os.getenv("RASTER_WINDOW_PAGES", "4"))       # pages rendered per Poppler call (serial path)
+RASTER_TO_DISK = os.getenv("RASTER_TO_DISK", "true").lower() == "true"  # render windows to temp files, decode one page at a time
+
+# Text-layer fast path: pages with a usable embedded text layer skip rasterization + OCR
+TEXT_LAYER_ENABLED = os.getenv("TEXT_LAYER_ENABLED", "true").lower() == "true"
+TEXT_LAYER_MIN_CHARS = int(os.getenv("TEXT_LAYER_MIN_CHARS", "50"))          # fewer characters = treat as image-only
+TEXT_LAYER_MIN_QUALITY = float(os.getenv("TEXT_LAYER_MIN_QUALITY", "0.6"))   # text_quality() below this = garbled, OCR it
+
+# Incremental ingestion: content-addressed page-text and chunk-embedding caches
+INGEST_CACHE_PATH = os.getenv("INGEST_CACHE_PATH")  # default: dependencies/ingest_cache.sqlite3
+
+# Background ingestion jobs (uploads are spooled to disk and processed off the script thread)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "1"))          # jobs running at once (each already uses the OCR pool)
+INGEST_JOBS_PATH = os.getenv("INGEST_JOBS_PATH")                # default: dependencies/ingest_jobs.sqlite3
+INGEST_SPOOL_DIR = os.getenv("INGEST_SPOOL_DIR")                # default: dependencies/ingest_spool
+INGEST_POLL_SEC = float(os.getenv("INGEST_POLL_SEC", "2"))      # sidebar refresh interval while jobs are active
+
+# Streaming ingestion (extract -> chunk -> embed -> persist joined by bounded queues)
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "32"))        # items buffered between two stages (backpressure)
+INGEST_EMBED_BATCH = int(os.getenv("INGEST_EMBED_BATCH", "64"))      # chunks per embedding call
+INGEST_PERSIST_BATCH = int(os.getenv("INGEST_PERSIST_BATCH", "256")) # chunks per vector store upsert (Chroma)
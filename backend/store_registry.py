@@ -0,0 +1,123 @@
+# backend/store_registry.py
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from backend.logger import logger
+
+
+def directory_signature(db_path: str) -> Optional[float]:
+    """
+    Returns a cheap change signature for a vector DB directory: the newest mtime
+    of the directory itself and the files directly inside it (e.g. chroma.sqlite3).
+    Returns None if the directory no longer exists.
+    """
+    try:
+        latest = os.stat(db_path).st_mtime
+        with os.scandir(db_path) as entries:
+            for entry in entries:
+                try:
+                    latest = max(latest, entry.stat().st_mtime)
+                except OSError:
+                    continue
+        return latest
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
+
+class VectorStoreRegistry:
+    """
+    Process-wide, thread-safe LRU registry of open vector stores.
+    Shared by every Streamlit session so a store is opened once and reused
+    until it is evicted, modified on disk (mtime change) or deleted.
+    """
+    def __init__(self, root: str, opener: Callable[[str], Any], max_size: int):
+        self.root = root
+        self.opener = opener
+        self.max_size = max(max_size, 1)
+        self.stores: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self.lock = threading.Lock()
+        # One lock per DB name, held while it is opened: the same store is not opened
+        # twice, and opening one does not block lookups of the others
+        self.open_locks: Dict[str, threading.Lock] = {}
+
+    def _path(self, db_name: str) -> str:
+        return (Path(self.root) / db_name).as_posix()
+
+    def list_databases(self) -> List[str]:
+        """Names of all vector DB directories currently under the root."""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.isdir(os.path.join(self.root, name))
+        )
+
+    def signature(self, db_name: str) -> Optional[float]:
+        """Current on-disk signature of a DB (None if it does not exist)."""
+        return directory_signature(self._path(db_name))
+
+    def get(self, db_name: str) -> Optional[Any]:
+        """
+        Returns the open store for db_name, (re)opening it if it is not cached
+        or its directory changed since it was opened. Deleted DBs are dropped
+        and None is returned.
+        """
+        db_path = self._path(db_name)
+        current_sig = directory_signature(db_path)
+
+        with self.lock:
+            if current_sig is None:
+                if self.stores.pop(db_name, None) is not None:
+                    logger.info("Vector store '{}' removed from disk; dropped from registry.", db_name)
+                return None
+
+            store = self._cached(db_name, current_sig)
+            if store is not None:
+                return store
+            open_lock = self.open_locks.setdefault(db_name, threading.Lock())
+
+        with open_lock:
+            with self.lock:
+                # Opened by another thread while this one waited
+                store = self._cached(db_name, current_sig)
+                if store is not None:
+                    return store
+                if db_name in self.stores:
+                    logger.info("Vector store '{}' changed on disk; reopening.", db_name)
+
+            store = self.opener(db_path)
+
+            with self.lock:
+                self.stores[db_name] = (store, current_sig)
+                self.stores.move_to_end(db_name)
+
+                while len(self.stores) > self.max_size:
+                    evicted, _ = self.stores.popitem(last=False)
+                    logger.debug("Evicted vector store '{}' from registry (LRU).", evicted)
+
+            return store
+
+    def _cached(self, db_name: str, signature: float) -> Optional[Any]:
+        """The cached store if it was opened at this signature (caller holds self.lock)."""
+        cached = self.stores.get(db_name)
+        if cached is None or cached[1] != signature:
+            return None
+        self.stores.move_to_end(db_name)
+        return cached[0]
+
+    def invalidate(self, db_name: Optional[str] = None) -> None:
+        """Forgets one cached store (or all of them) so the next get() reopens it."""
+        with self.lock:
+            if db_name is None:
+                self.stores.clear()
+            else:
+                self.stores.pop(db_name, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {"open": list(self.stores.keys()), "max_size": self.max_size}
+
+
+__all__ = ["VectorStoreRegistry", "directory_signature"]
@@ -0,0 +1,160 @@
+# backend/store_router.py
+import os
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from backend.logger import logger
+from backend.store_registry import directory_signature
+
+# Per-DB routing summary stored next to the vectors
+SUMMARY_NAME = "route_summary.npz"
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def compute_store_summary(vectors: np.ndarray, n_medoids: int, iterations: int = 10) -> Dict[str, np.ndarray]:
+    """
+    Summarises a store's embeddings as a centroid plus up to n_medoids medoid
+    vectors (actual chunk vectors closest to small spherical k-means centres),
+    so a query can be scored against a DB without searching it.
+    """
+    vectors = _normalize_rows(np.asarray(vectors, dtype=np.float32))
+    centroid = vectors.mean(axis=0)
+    centroid /= (np.linalg.norm(centroid) or 1.0)
+
+    m = min(n_medoids, vectors.shape[0])
+    if m <= 0:
+        return {"centroid": centroid, "medoids": np.zeros((0, vectors.shape[1]), dtype=np.float32)}
+
+    # Deterministic farthest-point seeding, starting from the vector nearest the centroid
+    seeds = [int(np.argmax(vectors @ centroid))]
+    closest = vectors @ vectors[seeds[0]]
+    while len(seeds) < m:
+        seeds.append(int(np.argmin(closest)))
+        closest = np.maximum(closest, vectors @ vectors[seeds[-1]])
+    centres = vectors[seeds].copy()
+
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centres.T, axis=1)
+        for c in range(m):
+            members = vectors[assignment == c]
+            if len(members):
+                centre = members.mean(axis=0)
+                centres[c] = centre / (np.linalg.norm(centre) or 1.0)
+
+    # Snap each centre to the nearest real vector (medoid)
+    medoid_rows = np.argmax(vectors @ centres.T, axis=0)
+    medoids = vectors[np.unique(medoid_rows)]
+    return {"centroid": centroid.astype(np.float32), "medoids": medoids.astype(np.float32)}
+
+
+def store_vectors(store: Any) -> np.ndarray:
+    """Reads every embedding from a Chroma or flat store via the shared get() API."""
+    embeddings = store.get(include=["embeddings"]).get("embeddings")
+    if embeddings is None or len(embeddings) == 0:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+def write_store_summary(persist_directory: str, store: Any, n_medoids: int) -> Optional[Dict[str, np.ndarray]]:
+    """Computes and saves the routing summary for a store. Returns None for empty stores."""
+    vectors = store_vectors(store)
+    if vectors.shape[0] == 0:
+        return None
+    summary = compute_store_summary(vectors, n_medoids)
+    tmp_path = os.path.join(persist_directory, SUMMARY_NAME + ".tmp.npz")
+    np.savez(tmp_path, **summary)
+    os.replace(tmp_path, os.path.join(persist_directory, SUMMARY_NAME))
+    return summary
+
+
+def load_store_summary(persist_directory: str) -> Optional[Dict[str, np.ndarray]]:
+    path = os.path.join(persist_directory, SUMMARY_NAME)
+    if not os.path.isfile(path):
+        return None
+    with np.load(path) as data:
+        return {"centroid": data["centroid"], "medoids": data["medoids"]}
+
+
+class StoreRouter:
+    """
+    Picks the top-M databases for a query from their centroid/medoid summaries
+    before the retrieval fan-out. Summaries are cached per DB signature. Stores
+    without a summary (created before routing existed, until backfill_side_indexes
+    runs at the next ingestion) are always searched; nothing is computed or
+    written on the query path.
+    """
+    def __init__(self, root: str, n_medoids: int):
+        self.root = root
+        self.n_medoids = n_medoids
+        self.summaries: Dict[str, Tuple[Optional[float], Optional[Dict[str, np.ndarray]]]] = {}
+        self.lock = threading.Lock()
+
+    def _summary(self, db_name: str, store: Any) -> Optional[Dict[str, np.ndarray]]:
+        db_path = os.path.join(self.root, db_name)
+        signature = directory_signature(db_path)
+        with self.lock:
+            cached = self.summaries.get(db_name)
+            if cached is not None and cached[0] == signature:
+                return cached[1]
+
+        summary = None
+        try:
+            summary = load_store_summary(db_path)
+            if summary is None:
+                logger.info("No routing summary for vector store '{}'; it is always searched.", db_name)
+        except Exception as e:
+            logger.warning("Routing summary unavailable for '{}': {}", db_name, e)
+
+        with self.lock:
+            self.summaries[db_name] = (signature, summary)
+        return summary
+
+    def score(self, query_embedding: Sequence[float], db_name: str, store: Any) -> Optional[float]:
+        """Best cosine similarity between the query and the DB's centroid/medoids (None if unknown)."""
+        summary = self._summary(db_name, store)
+        if summary is None:
+            return None
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        representatives = np.vstack([summary["centroid"][None, :], summary["medoids"]])
+        return float(np.max(representatives @ query))
+
+    def route(self, query_embedding: Sequence[float], stores: List[Tuple[str, Any]], top_m: int, min_score: float) -> List[Tuple[str, Any]]:
+        """
+        Returns the stores worth searching: the top_m best-scoring DBs plus any DB
+        without a summary. Falls back to every store when the best score is below
+        min_score (low routing confidence).
+        """
+        if top_m <= 0 or len(stores) <= top_m:
+            return stores
+
+        scored: List[Tuple[float, str, Any]] = []
+        unscored: List[Tuple[str, Any]] = []
+        for name, store in stores:
+            value = self.score(query_embedding, name, store)
+            if value is None:
+                unscored.append((name, store))
+            else:
+                scored.append((value, name, store))
+
+        if not scored:
+            return stores
+        scored.sort(key=lambda item: item[0], reverse=True)
+        if scored[0][0] < min_score:
+            logger.info("Routing confidence low (best={:.3f}); searching all {} stores.", scored[0][0], len(stores))
+            return stores
+
+        chosen = [(name, store) for _, name, store in scored[:top_m]] + unscored
+        logger.debug("Routed query to {}", [name for name, _ in chosen])
+        return chosen
+
+
+__all__ = [
+    "StoreRouter", "compute_store_summary", "write_store_summary",
+    "load_store_summary", "store_vectors", "SUMMARY_NAME"
+]
@@ -1,111 +1,433 @@
 # backend/task_queue.py
 
+import json
+import time
+import asyncio
+import hashlib
+import functools
+import itertools
 import threading
-import queue
 import traceback
-from typing import Any, Dict, List, Callable, Optional, TypedDict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, TypedDict
 from backend.logger import logger
 from backend import settings
-from backend.rate_limiter import global_rate_limiter, RATE_LIMIT_MESSAGE
+from backend.rate_limiter import RATE_LIMIT_MESSAGE
+from backend.circuit_breaker import azure_breaker
 
 # ----------------- CHANGE 1: REMOVE THIS LINE -----------------
 # from backend.azure_client import _call_with_retry_sync  <-- DELETE THIS
 
+# Priority classes: lower values are dispatched first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_VISUALIZATION = 1
+PRIORITY_BACKGROUND = 2
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_VISUALIZATION: "visualization",
+    PRIORITY_BACKGROUND: "background"
+}
+
+
+class TaskCancelled(Exception):
+    """Raised to consumers of a task handle that was cancelled."""
+
+
+class TaskHandle:
+    """
+    Result of a queued chat request. The dispatcher push()es reply deltas as they
+    arrive (streaming) and then resolves or rejects the handle. Any number of
+    consumers can iterate over the deltas, each from the first one, or wait for
+    the whole reply with result(). cancel() settles the handle immediately; a
+    queued task is then dropped before dispatch and a running one is interrupted.
+    A handle shared by coalesced callers is only cancelled by the last of them.
+    """
+    def __init__(self):
+        self.deltas: List[str] = []
+        self.cond = threading.Condition()
+        self.done = False
+        self.cancelled = False
+        self.value: Optional[str] = None
+        self.error: Optional[Exception] = None
+        self.subscribers = 1
+        # Set by the dispatcher while the task is running
+        self.on_cancel: Optional[Callable[[], None]] = None
+
+    def push(self, delta: str) -> None:
+        with self.cond:
+            if self.done:
+                return
+            self.deltas.append(delta)
+            self.cond.notify_all()
+
+    def resolve(self, value: str) -> None:
+        with self.cond:
+            if self.done:
+                return
+            # Non-streamed replies (and RATE_LIMIT_MESSAGE) are delivered as a single delta
+            if not self.deltas and value:
+                self.deltas.append(value)
+            self.value = value
+            self.done = True
+            self.cond.notify_all()
+
+    def reject(self, exc: Exception) -> None:
+        with self.cond:
+            if self.done:
+                return
+            self.error = exc
+            self.done = True
+            self.cond.notify_all()
+
+    def attach(self) -> bool:
+        """Adds a caller to a pending handle (single-flight); False if it already finished."""
+        with self.cond:
+            if self.done:
+                return False
+            self.subscribers += 1
+            return True
+
+    def cancel(self) -> bool:
+        """Cancels the request unless it already finished. Returns True if it was cancelled."""
+        with self.cond:
+            if self.done:
+                return False
+            if self.subscribers > 1:
+                # Other callers are still waiting for this reply
+                self.subscribers -= 1
+                return False
+            self.cancelled = True
+            self.error = TaskCancelled("Request was cancelled.")
+            self.done = True
+            self.cond.notify_all()
+            on_cancel = self.on_cancel
+        if on_cancel is not None:
+            on_cancel()
+        return True
+
+    def result(self, timeout: Optional[float] = None) -> str:
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.done, timeout):
+                raise TimeoutError("Request timed out waiting for result from queue worker.")
+            if self.error is not None:
+                raise self.error
+            return self.value
+
+    def iter_deltas(self, idle_timeout: Optional[float] = None) -> Iterator[str]:
+        """Yields reply deltas as they arrive; raises TimeoutError if none arrives within idle_timeout."""
+        index = 0
+        while True:
+            with self.cond:
+                ready = self.cond.wait_for(lambda: index < len(self.deltas) or self.done, idle_timeout)
+            if not ready:
+                # Nobody will read a reply that stalled this long; free its queue/in-flight slot
+                self.cancel()
+                raise TimeoutError("Request timed out waiting for result from queue worker.")
+            with self.cond:
+                pending = self.deltas[index:]
+                index = len(self.deltas)
+                finished, error = self.done, self.error
+            yield from pending
+            if finished:
+                if error is not None:
+                    raise error
+                return
+
+    def __iter__(self) -> Iterator[str]:
+        return self.iter_deltas(settings.QUEUE_TASK_TIMEOUT)
+
+
 # Define a more specific type for the task
 class Task(TypedDict):
     messages: List[Dict[str, str]]
     temperature: float
     max_tokens: int
-    resolve: Callable[[Any], None]
-    reject: Callable[[Exception], None]
+    stream: bool
+    priority: int
+    deadline: float   # time.monotonic() after which the task is dropped instead of dispatched
+    enqueued: float
+    key: str
+    handle: TaskHandle
+
+
+def request_key(messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> str:
+    """Canonical hash of everything that determines a completion (single-flight key)."""
+    canonical = json.dumps(
+        {
+            # Only what is sent: chat history entries may also carry UI objects (e.g. a "figure")
+            "messages": [[m["role"], m["content"]] for m in messages],
+            "temperature": float(temperature),
+            "max_tokens": int(max_tokens),
+            "deployment": settings.AZURE_OPENAI_DEPLOYMENT
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class QueueMetrics:
+    """Drop counts and queue wait per priority class (updated on the loop, read from any thread)."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts: Dict[str, int] = {
+            "enqueued": 0, "coalesced": 0, "dispatched": 0, "dropped_expired": 0,
+            "dropped_cancelled": 0, "cancelled_running": 0
+        }
+        self.waits: Dict[int, Dict[str, float]] = {
+            p: {"count": 0, "total_sec": 0.0, "max_sec": 0.0} for p in PRIORITY_NAMES
+        }
+
+    def incr(self, name: str) -> None:
+        with self.lock:
+            self.counts[name] += 1
+
+    def record_wait(self, priority: int, waited: float) -> None:
+        with self.lock:
+            wait = self.waits.setdefault(priority, {"count": 0, "total_sec": 0.0, "max_sec": 0.0})
+            wait["count"] += 1
+            wait["total_sec"] += waited
+            wait["max_sec"] = max(wait["max_sec"], waited)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            stats: Dict[str, Any] = dict(self.counts)
+            for priority, wait in self.waits.items():
+                name = PRIORITY_NAMES.get(priority, str(priority))
+                stats[f"wait_avg_sec_{name}"] = (wait["total_sec"] / wait["count"]) if wait["count"] else 0.0
+                stats[f"wait_max_sec_{name}"] = wait["max_sec"]
+            return stats
+
 
+class ChatQueue:
+    """
+    Synchronous facade over an asyncio dispatcher. A background thread runs an
+    event loop that takes tasks off a priority queue and runs up to max_inflight
+    Azure calls concurrently on one shared aiohttp session, so a slow completion
+    only occupies one semaphore slot instead of a whole worker thread. Streamlit
+    code keeps calling submit()/enqueue() from its own threads.
 
-class ChatWorker(threading.Thread):
-    daemon = True
+    A task is taken off the queue only once an in-flight slot is free, so the
+    highest-priority task waiting at that moment goes first. Tasks that were
+    cancelled or whose deadline passed while queued are dropped at that point
+    and never reach the rate limiter or Azure.
 
-    def __init__(self, q: "queue.Queue[Task]"):
-        super().__init__(name="chat-worker")
-        self.q = q
+    Identical requests (same request_key) are coalesced: while one is queued or
+    running, duplicates attach to its handle instead of being dispatched again.
+    This only spans the request's lifetime; it is not a cache.
+    """
+    def __init__(self, max_inflight: int = 1):
+        self.max_inflight = max(max_inflight, 1)
+        self.loop = asyncio.new_event_loop()
+        self.running: Set["asyncio.Task[None]"] = set()
+        self.metrics = QueueMetrics()
+        # Tie-breaker: FIFO within a priority class
+        self.sequence = itertools.count()
+        # Single-flight: request_key -> task that is queued or running
+        self.pending: Dict[str, Task] = {}
+        self.pending_lock = threading.Lock()
+        ready = threading.Event()
+        self.thread = threading.Thread(target=self._run_loop, args=(ready,), name="chat-dispatcher", daemon=True)
+        self.thread.start()
+        ready.wait()
 
-    def run(self):
-        # ----------------- FIX THE TYPO HERE -----------------
-        # The correct name is _call_with_retry_sync
-        from backend.azure_client import _call_with_retry_sync
+    def _run_loop(self, ready: threading.Event) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.q: "asyncio.PriorityQueue[tuple]" = asyncio.PriorityQueue(maxsize=settings.QUEUE_MAXSIZE)
+        self.inflight = asyncio.Semaphore(self.max_inflight)
+        self.loop.create_task(self._dispatch())
+        ready.set()
+        self.loop.run_forever()
 
+    async def _dispatch(self) -> None:
+        from backend.proxy_config import new_async_proxy_session
+        # Created on the loop: aiohttp sessions are bound to the loop they were made on
+        self.session = new_async_proxy_session(self.max_inflight)
         while True:
-            task: Task = self.q.get()
-            try:
-                if not global_rate_limiter.allow():
-                    logger.warning("Rate limit exceeded; returning friendly message.")
-                    task["resolve"](RATE_LIMIT_MESSAGE)
-                    continue
-
-                messages = task["messages"]
-                temperature = task["temperature"]
-                max_tokens = task["max_tokens"]
-                
-                # --- AND FIX THE FUNCTION CALL HERE ---
-                # Use the correct name when calling the function
-                reply = _call_with_retry_sync(messages, temperature, max_tokens)
-                
-                logger.info(
-                    "Chat success | prompt={} | response={}", 
-                    messages[-1]["content"], 
-                    reply[:50] + "..." if len(reply) > 50 else reply
+            await self.inflight.acquire()
+            _, _, task = await self.q.get()
+            self.q.task_done()
+            if not self._admit(task):
+                self.inflight.release()
+                continue
+            running = self.loop.create_task(self._execute(task))
+            self.running.add(running)
+            running.add_done_callback(self.running.discard)
+            # A cancel() from another thread interrupts the call on the loop (bound now: `running` is reassigned next turn)
+            task["handle"].on_cancel = functools.partial(self.loop.call_soon_threadsafe, running.cancel)
+            if task["handle"].cancelled:
+                running.cancel()
+
+    def _admit(self, task: Task) -> bool:
+        """Drops cancelled and expired tasks; records the queue wait of the rest."""
+        handle = task["handle"]
+        now = time.monotonic()
+        if handle.cancelled:
+            self._forget(task)
+            self.metrics.incr("dropped_cancelled")
+            logger.debug("QUEUE | dropped cancelled {} task", PRIORITY_NAMES.get(task["priority"]))
+            return False
+        if now > task["deadline"]:
+            self._forget(task)
+            self.metrics.incr("dropped_expired")
+            logger.warning("QUEUE | dropped {} task that expired after {:.1f}s in queue", PRIORITY_NAMES.get(task["priority"]), now - task["enqueued"])
+            handle.reject(TimeoutError("Request expired in the queue before it could be sent."))
+            return False
+        self.metrics.incr("dispatched")
+        self.metrics.record_wait(task["priority"], now - task["enqueued"])
+        return True
+
+    async def _execute(self, task: Task) -> None:
+        from backend.azure_client import (
+            _call_with_retry, _call_with_retry_stream, StreamInterrupted, RateLimitExhausted, is_outage_error
+        )
+
+        handle = task["handle"]
+        admitted = None
+        try:
+            messages = task["messages"]
+            temperature = task["temperature"]
+            max_tokens = task["max_tokens"]
+
+            # Open circuit: Azure/proxy is down, answer at once instead of waiting out retries
+            admitted = azure_breaker.allow_request()
+            if admitted is None:
+                logger.warning("Circuit open; returning fallback message.")
+                handle.resolve(settings.FALLBACK_MESSAGE)
+                return
+
+            # The router holds the task until a backend has RPM/TPM capacity, but never past its deadline
+            if task["stream"]:
+                reply = await _call_with_retry_stream(
+                    self.session, messages, temperature, max_tokens, on_delta=handle.push, deadline=task["deadline"]
                 )
-                task["resolve"](reply)
-            except Exception as e:
-                logger.error("Chat failure: {} \n{}", e, traceback.format_exc())
-                task["reject"](e)
-            finally:
-                self.q.task_done()
+            else:
+                reply = await _call_with_retry(self.session, messages, temperature, max_tokens, deadline=task["deadline"])
+            azure_breaker.record_success()
 
-class ChatQueue:
-    def __init__(self, num_workers: int = 1):
-        self.q: "queue.Queue[Task]" = queue.Queue(maxsize=settings.QUEUE_MAXSIZE)
-        self.workers = [ChatWorker(self.q) for _ in range(max(num_workers, 1))]
-        for w in self.workers:
-            w.start()
+            logger.info(
+                "Chat success | prompt={} | response={}", 
+                messages[-1]["content"], 
+                reply[:50] + "..." if len(reply) > 50 else reply
+            )
+            handle.resolve(reply)
+        except asyncio.CancelledError:
+            self.metrics.incr("cancelled_running")
+            logger.info("Chat request cancelled while in flight.")
+            # No-op after TaskHandle.cancel(); anything else must not leave its callers waiting
+            handle.reject(TaskCancelled("Request was cancelled."))
+        except RateLimitExhausted:
+            logger.warning("Rate limit exceeded; returning friendly message.")
+            handle.resolve(RATE_LIMIT_MESSAGE)
+        except StreamInterrupted as e:
+            logger.error("Chat stream interrupted after partial reply: {}", e.__cause__)
+            handle.reject(e.__cause__ or e)
+        except Exception as e:
+            logger.error("Chat failure: {} \n{}", e, traceback.format_exc())
+            if azure_breaker.is_open() and is_outage_error(e):
+                # The outage just opened the circuit: degrade like the requests refused after it
+                handle.resolve(settings.FALLBACK_MESSAGE)
+            else:
+                handle.reject(e)
+        finally:
+            self._forget(task)
+            # Frees the half-open probe slot if this request neither succeeded nor counted as a failure
+            azure_breaker.release(admitted)
+            handle.on_cancel = None
+            self.inflight.release()
 
-    def submit(self, messages: List[Dict[str, str]], temperature: float, max_tokens: int, timeout: Optional[float] = None) -> str:
+    def enqueue(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        stream: bool = False,
+        priority: int = PRIORITY_INTERACTIVE,
+        timeout: Optional[float] = None
+    ) -> TaskHandle:
         """
-        Synchronous helper: enqueue request and wait for result.
-        Now accepts temperature and max_tokens.
+        Enqueues a request and returns its handle without waiting (blocks only while the queue is full).
+        With stream=True the dispatcher pushes reply deltas to the handle as they arrive.
+        If the request has not been dispatched within timeout (default QUEUE_TASK_TIMEOUT)
+        it is dropped and the handle fails with TimeoutError.
+        An identical request already in flight is joined instead (its handle is returned).
         """
-        result_holder: Dict[str, Any] = {}
-        done = threading.Event()
-
-        def resolve(value: Any):
-            result_holder["value"] = value
-            done.set()
-
-        def reject(exc: Exception):
-            result_holder["error"] = exc
-            done.set()
+        now = time.monotonic()
+        deadline = now + (timeout or settings.QUEUE_TASK_TIMEOUT)
+        key = request_key(messages, temperature, max_tokens)
+        if settings.COALESCE_ENABLED:
+            with self.pending_lock:
+                current = self.pending.get(key)
+                if current is not None and current["handle"].attach():
+                    # Still queued: keep it alive for the latest caller and stream if anyone wants deltas
+                    current["deadline"] = max(current["deadline"], deadline)
+                    current["stream"] = current["stream"] or stream
+                    self.metrics.incr("coalesced")
+                    logger.debug("QUEUE | coalesced duplicate request {}", key[:12])
+                    return current["handle"]
 
-        # Build the task dictionary with all necessary parameters
+        handle = TaskHandle()
         task: Task = {
-            "messages": messages, 
-            "temperature": temperature, 
-            "max_tokens": max_tokens, 
-            "resolve": resolve, 
-            "reject": reject
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": stream,
+            "priority": priority,
+            "deadline": deadline,
+            "enqueued": now,
+            "key": key,
+            "handle": handle
         }
+        if settings.COALESCE_ENABLED:
+            with self.pending_lock:
+                self.pending[key] = task
+        item = (priority, next(self.sequence), task)
+        asyncio.run_coroutine_threadsafe(self.q.put(item), self.loop).result()
+        self.metrics.incr("enqueued")
+        return handle
+
+    def _forget(self, task: Task) -> None:
+        with self.pending_lock:
+            if self.pending.get(task["key"]) is task:
+                del self.pending[task["key"]]
+
+    def submit(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        timeout: Optional[float] = None,
+        priority: int = PRIORITY_INTERACTIVE
+    ) -> str:
+        """
+        Synchronous helper: enqueue request and wait for result.
+        On timeout the request is cancelled, so it is never sent (or stops
+        occupying an in-flight slot) once nobody is waiting for it.
+        """
+        timeout = timeout or settings.QUEUE_TASK_TIMEOUT
+        handle = self.enqueue(messages, temperature, max_tokens, priority=priority, timeout=timeout)
+        try:
+            return handle.result(timeout)
+        except TimeoutError:
+            handle.cancel()
+            raise
 
-        self.q.put(task)
-        ok = done.wait(timeout or settings.QUEUE_TASK_TIMEOUT)
-        
-        if not ok:
-            # If the request is still in the queue when the timeout hits, 
-            # we can't easily remove it, but we can tell the client it failed.
-            raise TimeoutError("Request timed out waiting for result from queue worker.")
-        
-        if "error" in result_holder:
-            raise result_holder["error"]
-            
-        return result_holder.get("value")
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, in-flight calls, drop counts, queue wait per priority class, backends, connection reuse and circuit state."""
+        stats = self.metrics.snapshot()
+        stats["queued"] = self.q.qsize()
+        stats["in_flight"] = len(self.running)
+        from backend.azure_client import azure_router
+        from backend.proxy_config import connection_stats
+        stats["router"] = azure_router.stats()
+        stats["connections"] = connection_stats()
+        stats["circuit_breaker"] = azure_breaker.stats()
+        return stats
 
 # Global singleton
-chat_queue = ChatQueue(num_workers=settings.QUEUE_WORKERS)
+chat_queue = ChatQueue(max_inflight=settings.AZURE_MAX_INFLIGHT)
 
-__all__ = ["chat_queue"]
+__all__ = [
+    "chat_queue", "ChatQueue", "TaskHandle", "TaskCancelled", "request_key",
+    "PRIORITY_INTERACTIVE", "PRIORITY_VISUALIZATION", "PRIORITY_BACKGROUND"
+]
@@ -0,0 +1,58 @@
+# backend/text_layer.py
+import re
+from typing import List
+import pypdfium2 as pdfium
+
+# Extraction paths recorded in chunk metadata ("extraction")
+EXTRACTION_TEXT_LAYER = "text_layer"
+EXTRACTION_OCR = "ocr"
+
+_WORD_RE = re.compile(r"\S+")
+# Glyphs without a Unicode mapping usually come out as U+FFFD, private-use
+# characters or "(cid:123)" sequences
+_GARBAGE_RE = re.compile(r"[\ufffd\ue000-\uf8ff]|\(cid:\d+\)")
+
+
+def extract_text_layer(pdf_path: str) -> List[str]:
+    """Returns the embedded text of every page (empty string for image-only pages)."""
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        texts = []
+        for index in range(len(pdf)):
+            page = pdf[index]
+            textpage = page.get_textpage()
+            try:
+                texts.append(textpage.get_text_bounded())
+            finally:
+                textpage.close()
+                page.close()
+        return texts
+    finally:
+        pdf.close()
+
+
+def text_quality(text: str) -> float:
+    """
+    Share of the page that looks like real text, in [0, 1]: penalises unmapped
+    glyphs and "words" that are mostly symbols (typical of broken font encodings).
+    """
+    stripped = text.strip()
+    if not stripped:
+        return 0.0
+    garbage_chars = sum(len(m) for m in _GARBAGE_RE.findall(stripped))
+    words = _WORD_RE.findall(stripped)
+    wordlike = sum(1 for w in words if sum(c.isalnum() for c in w) >= len(w) / 2)
+    glyph_score = 1.0 - garbage_chars / len(stripped)
+    word_score = wordlike / len(words) if words else 0.0
+    return max(0.0, min(glyph_score, word_score))
+
+
+def has_usable_text_layer(text: str, min_chars: int, min_quality: float) -> bool:
+    """True when the page's text layer can be used as is; False means OCR the page."""
+    return len(text.strip()) >= min_chars and text_quality(text) >= min_quality
+
+
+__all__ = [
+    "extract_text_layer", "text_quality", "has_usable_text_layer",
+    "EXTRACTION_TEXT_LAYER", "EXTRACTION_OCR"
+]
@@ -0,0 +1,79 @@
+# backend/token_counter.py
+import os
+import threading
+from typing import Dict, List
+from backend.logger import logger
+from backend import settings
+from backend.path_resolver import resource_path
+
+# tiktoken gives exact counts for the Azure OpenAI models. It is optional: when it
+# is missing (or its BPE file cannot be loaded on an air-gapped server, see
+# TIKTOKEN_CACHE_DIR / dependencies/tiktoken_cache) we fall back to a ~4
+# characters/token estimate and log a warning.
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - depends on the install
+    tiktoken = None
+
+# Chat format overhead per message (role/name/separators) and per reply priming
+_TOKENS_PER_MESSAGE = 4
+_TOKENS_PER_REPLY = 3
+
+_encoding = None
+_encoding_failed = False
+_lock = threading.Lock()
+
+
+def _get_encoding():
+    global _encoding, _encoding_failed
+    if _encoding is not None or _encoding_failed:
+        return _encoding
+    with _lock:
+        if tiktoken is None and not _encoding_failed:
+            _encoding_failed = True
+            logger.warning("tiktoken is not installed, estimating tokens at ~4 characters each")
+        if _encoding is None and not _encoding_failed:
+            if "TIKTOKEN_CACHE_DIR" not in os.environ:
+                # Air-gapped servers: the BPE file ships in dependencies/ instead of being downloaded
+                try:
+                    os.environ["TIKTOKEN_CACHE_DIR"] = resource_path("dependencies/tiktoken_cache")
+                except FileNotFoundError:
+                    pass
+            try:
+                _encoding = tiktoken.get_encoding(settings.TOKENIZER_ENCODING)
+            except Exception as e:
+                _encoding_failed = True
+                logger.warning("tiktoken encoding '{}' unavailable, estimating tokens: {}", settings.TOKENIZER_ENCODING, e)
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Number of model tokens in text (exact with tiktoken, estimated otherwise)."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return max(1, (len(text) + 3) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cuts text down to at most max_tokens tokens."""
+    if max_tokens <= 0:
+        return ""
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def count_message_tokens(messages: List[Dict[str, str]], reply_priming: bool = True) -> int:
+    """Approximate prompt tokens for a chat request (content plus per-message overhead)."""
+    total = sum(_TOKENS_PER_MESSAGE + count_tokens(m.get("content", "")) for m in messages)
+    return total + (_TOKENS_PER_REPLY if reply_priming else 0)
+
+
+__all__ = ["count_tokens", "truncate_to_tokens", "count_message_tokens"]
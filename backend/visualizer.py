@@ -1,7 +1,7 @@
 import altair as alt # New import for Altair
 import pandas as pd # Explicitly imported for the example
 import re
-from backend.azure_client import chat_with_azure
+from backend.azure_client import chat_with_azure, PRIORITY_VISUALIZATION
 import matplotlib.pyplot as plt 
 
 
@@ -97,7 +97,7 @@ def generate_visualization_code(user_input: str) -> str:
     )
     """
     messages = [{"role": "system", "content": system_prompt}]
-    response = chat_with_azure(messages, temperature=0, max_tokens=1000)
+    response = chat_with_azure(messages, temperature=0, max_tokens=1000, priority=PRIORITY_VISUALIZATION)
     return response
 
 def generate_visualization(user_input: str):
@@ -1,6 +1,7 @@
 import os
 import sys
 import warnings
+import multiprocessing
 from streamlit.web import cli as stcli
 import streamlit.config as _config
 
@@ -9,6 +10,8 @@ warnings.filterwarnings("ignore")
 
 
 def main():
+    # Required for the OCR process pool in the frozen (PyInstaller) build
+    multiprocessing.freeze_support()
     app_path = resource_path(os.path.join("ui", "app.py"))
 
     # disable dev mode so port/address work
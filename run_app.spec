@@ -27,6 +27,33 @@ manual_hiddenimports = [
     # Add other high-level langchain or chromadb submodules if you use them
      'langchain.vectorstores', 
      'chromadb.utils.embedding_functions.onnx_mini_lm_l6_v2', # If you use default Chroma embeddings
+
+    # backend/ is shipped as data, so PyInstaller never sees its imports: the backend
+    # modules added alongside the original ones and the third-party packages they use
+    'numpy',
+    'backend.store_registry',
+    'backend.query_cache',
+    'backend.store_router',
+    'backend.lexical_index',
+    'backend.context_packer',
+    'backend.token_counter',
+    'backend.answer_cache',
+    'backend.embedding_service',
+    'backend.flat_index',
+    'backend.parallel_ocr',  # imported by OCR worker processes
+    'backend.rasterizer',
+    'backend.text_layer',
+    'backend.ingest_cache',
+    'backend.ingest_jobs',
+    'backend.ingest_pipeline',
+    'backend.circuit_breaker',
+    'backend.history',
+    'pypdf',                 # page content hashes for the OCR cache
+    'pypdfium2',             # native text-layer extraction (skips OCR for digital PDFs)
+    'aiohttp',               # async Azure client used by the chat dispatcher
+    'tiktoken',              # exact token budgets (BPE file: dependencies/tiktoken_cache)
+    'tiktoken_ext',
+    'tiktoken_ext.openai_public',  # registers the o200k_base/cl100k_base encodings
 ]
 a = Analysis(
     ['build/app_entry.py'],   # entrypoint
@@ -0,0 +1,74 @@
+import sys
+import time
+import types
+import asyncio
+import pytest
+
+pytest.importorskip("requests_kerberos")  # backend.proxy_config (dispatcher session)
+
+from backend.task_queue import ChatQueue, TaskCancelled
+
+
+@pytest.fixture
+def azure_calls(monkeypatch):
+    """Replaces backend.azure_client with a stub whose calls take a while and are recorded."""
+    calls = {"started": [], "finished": []}
+
+    async def _call_with_retry(session, messages, temperature, max_tokens, deadline):
+        prompt = messages[-1]["content"]
+        calls["started"].append(prompt)
+        await asyncio.sleep(0.3)
+        calls["finished"].append(prompt)
+        return f"reply {prompt}"
+
+    stub = types.ModuleType("backend.azure_client")
+    stub._call_with_retry = _call_with_retry
+    stub._call_with_retry_stream = None
+    stub.StreamInterrupted = type("StreamInterrupted", (Exception,), {})
+    stub.RateLimitExhausted = type("RateLimitExhausted", (Exception,), {})
+    stub.is_outage_error = lambda e: False
+    monkeypatch.setitem(sys.modules, "backend.azure_client", stub)
+    return calls
+
+
+def _wait_for(predicate, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < end, "timed out"
+        time.sleep(0.01)
+
+
+def test_cancel_interrupts_only_its_own_call_while_several_are_in_flight(azure_calls):
+    queue = ChatQueue(max_inflight=4)
+    handle_a = queue.enqueue([{"role": "user", "content": "A"}], 0, 5)
+    handle_b = queue.enqueue([{"role": "user", "content": "B"}], 0, 5)
+    _wait_for(lambda: len(azure_calls["started"]) == 2)
+
+    assert handle_a.cancel()
+
+    assert handle_b.result(timeout=5) == "reply B"
+    with pytest.raises(TaskCancelled):
+        handle_a.result(timeout=0)
+    _wait_for(lambda: not queue.running)
+    assert azure_calls["finished"] == ["B"]
+    assert queue.metrics.snapshot()["cancelled_running"] == 1
+
+
+def test_identical_requests_share_one_call(azure_calls):
+    queue = ChatQueue(max_inflight=4)
+    messages = [{"role": "user", "content": "same"}]
+    handles = [queue.enqueue(messages, 0, 5) for _ in range(3)]
+
+    assert [h.result(timeout=5) for h in handles] == ["reply same"] * 3
+    assert azure_calls["started"] == ["same"]
+    assert queue.metrics.snapshot()["coalesced"] == 2
+
+
+def test_cancelling_one_subscriber_keeps_the_shared_call(azure_calls):
+    queue = ChatQueue(max_inflight=4)
+    messages = [{"role": "user", "content": "shared"}]
+    first = queue.enqueue(messages, 0, 5)
+    second = queue.enqueue(messages, 0, 5)
+
+    assert not first.cancel()
+    assert second.result(timeout=5) == "reply shared"